@@ -0,0 +1,10 @@
+"""
+ASGI entry point: async chat endpoints, everything else served by the Flask app
+(see async_api.py)
+
+Usage:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+from async_api import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,257 @@
+"""
+AL-Chat Backend - async serving path
+ASGI application where /api/chat and /api/chat/stream run on the event loop with
+AsyncOpenAI: an in-flight chat holds a coroutine and a pooled connection instead
+of a worker thread, so one process can serve thousands of concurrent chats.
+Every other endpoint, and multipart uploads to the chat endpoints, are served by
+the Flask app (main.py) from a thread pool.
+
+Blocking work of a chat request (conversation store and session updates, token
+counting, the response cache's SQLite tier, usage accounting) runs on the thread
+pool too. Papita has no async client: credentials are looked up when the service
+is built (off the loop) and cached, and usage records are queued for the
+background PapitaUsageLogger, so no Papita call is made on the event loop.
+
+Production: uvicorn asgi:app --host 0.0.0.0 --port 5000 (see asgi.py)
+"""
+import os
+import json
+import math
+import time
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route, Mount, request_response
+from a2wsgi import WSGIMiddleware
+import main
+from service.async_openai_service import AsyncOpenAIService
+from service.resilience import UpstreamError
+from service.startup import LazyService
+from service import http_clients
+from service import metrics
+
+# Threads serving the Flask app (every endpoint except the async chat endpoints)
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', '32'))
+
+# Built in the background at startup (see lifespan), sharing the Flask app's cache,
+# context window trimming, request coalescing and credentials
+async_openai_service_loader = LazyService(
+    "openai_async",
+    lambda: AsyncOpenAIService(main.credential_manager, response_cache=main.response_cache,
+                               context_manager=main.context_manager, coalescer=main.request_coalescer),
+    retry_interval=main.credential_manager.negative_cache_ttl
+)
+
+async def get_async_openai_service():
+    """Get the async OpenAI service. Returns None if it is not configured. A build (credential lookup) runs off the event loop."""
+    return async_openai_service_loader.peek() or await run_in_threadpool(async_openai_service_loader.get)
+
+def upstream_error_response(error):
+    """JSONResponse for a failed OpenAI call, with a Retry-After header when known (see main.upstream_error_body)"""
+    body, status = main.upstream_error_body(error)
+    headers = {"Retry-After": str(math.ceil(body["retry_after"]))} if "retry_after" in body else {}
+    return JSONResponse(body, status, headers)
+
+async def read_chat_body(request: Request):
+    """
+    Get the JSON fields of a chat request
+
+    Returns:
+        Tuple of (fields, error response). The error response is None when the body is valid.
+    """
+    if int(request.headers.get('content-length') or 0) > main.MAX_REQUEST_BYTES:
+        return None, JSONResponse({"error": f"Request is larger than {main.MAX_REQUEST_BYTES} bytes"}, 413)
+    body = await request.body()
+    if len(body) > main.MAX_REQUEST_BYTES:
+        return None, JSONResponse({"error": f"Request is larger than {main.MAX_REQUEST_BYTES} bytes"}, 413)
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None, JSONResponse({"error": "Request body must be JSON"}, 400)
+    if not isinstance(data, dict):
+        return None, JSONResponse({"error": "Request body must be a JSON object"}, 400)
+    return data, None
+
+async def build_chat_request(data, headers):
+    """main.build_chat_request off the event loop (attachments read from disk and searched, conversation history)"""
+    return await run_in_threadpool(main.build_chat_request, data, headers)
+
+async def route_chat(openai_service, chat_request):
+    """main.route_chat, counting prompt tokens and waiting for rate limit capacity without blocking the event loop"""
+    candidates, reason, estimated_tokens = await run_in_threadpool(main.choose_models, openai_service, chat_request)
+    ticket = None
+    if main.admission_controller is not None:
+        ticket = await main.admission_controller.admit_async(chat_request["username"], chat_request["is_guest"],
+                                                             chat_request["session_id"], candidates[0], estimated_tokens)
+    return candidates, reason, ticket
+
+async def complete_chat(openai_service, chat_request):
+    """
+    main.complete_chat with an AsyncOpenAIService
+
+    Returns:
+        /api/chat response body
+
+    Raises:
+        AdmissionRejected: If the request is over its rate limits
+        Exception: If the OpenAI call fails
+    """
+    candidates, reason, ticket = await route_chat(openai_service, chat_request)
+    used_tokens = 0
+    try:
+        if main.model_router is not None:
+            ai_response_data = await main.model_router.send_message_async(
+                openai_service, chat_request["effective_message"], chat_request["history"], candidates, reason,
+                use_cache=chat_request["use_cache"]
+            )
+        else:
+            ai_response_data = await openai_service.send_message_async(
+                chat_request["effective_message"], chat_request["history"], model=candidates[0], use_cache=chat_request["use_cache"]
+            )
+        used_tokens = ai_response_data.get("usage", {}).get("total_tokens", 0)
+    finally:
+        main.settle_chat(ticket, used_tokens)
+    return await run_in_threadpool(main.finish_chat, chat_request, ai_response_data)
+
+async def chat(request: Request):
+    """Handle chat requests to OpenAI (same request and response as the Flask /api/chat)"""
+    data, error_response = await read_chat_body(request)
+    if error_response is not None:
+        return error_response
+    try:
+        chat_request, error = await build_chat_request(data, request.headers)
+        if error:
+            return JSONResponse({"error": error}, 400)
+
+        openai_service = await get_async_openai_service()
+        if not openai_service:
+            return JSONResponse({"error": main.OPENAI_NOT_CONFIGURED}, 500)
+
+        try:
+            response = await complete_chat(openai_service, chat_request)
+        except UpstreamError as openai_error:
+            return upstream_error_response(openai_error)
+        return JSONResponse(response)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+
+async def chat_stream(request: Request):
+    """Handle chat requests to OpenAI, streaming the response as Server-Sent Events (same events as the Flask /api/chat/stream)"""
+    data, error_response = await read_chat_body(request)
+    if error_response is not None:
+        return error_response
+    try:
+        chat_request, error = await build_chat_request(data, request.headers)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, 500)
+    if error:
+        return JSONResponse({"error": error}, 400)
+
+    openai_service = await get_async_openai_service()
+    if not openai_service:
+        return JSONResponse({"error": main.OPENAI_NOT_CONFIGURED}, 500)
+
+    # Wait for rate limit capacity before the stream starts, so rejections get a 429 status
+    try:
+        candidates, reason, ticket = await route_chat(openai_service, chat_request)
+    except UpstreamError as e:
+        return upstream_error_response(e)
+
+    async def generate():
+        used_tokens = 0
+        if main.model_router is not None:
+            chunks = main.model_router.stream_message_async(openai_service, chat_request["effective_message"], chat_request["history"],
+                                                            candidates, reason, use_cache=chat_request["use_cache"])
+        else:
+            chunks = openai_service.stream_message_async(chat_request["effective_message"], chat_request["history"],
+                                                         model=candidates[0], use_cache=chat_request["use_cache"])
+        try:
+            async for chunk in chunks:
+                if "delta" in chunk:
+                    yield main.format_sse("delta", chunk)
+                    continue
+                used_tokens = chunk.get("usage", {}).get("total_tokens", 0)
+                yield main.format_sse("done", await run_in_threadpool(main.finish_chat, chat_request, chunk))
+        except Exception as e:
+            body, status = main.upstream_error_body(e)
+            yield main.format_sse("error", {**body, "status": status})
+        finally:
+            # Client went away - close the upstream stream now rather than when garbage collected
+            await chunks.aclose()
+            main.settle_chat(ticket, used_tokens)
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
+class AsyncRoute:
+    """
+    ASGI app of an async endpoint
+
+    Counts the request and observes its latency like the Flask app does for its
+    own endpoints (streamed responses are timed until their last chunk).
+    multipart/form-data requests (file uploads, spooled to disk) go to the Flask app.
+    """
+
+    def __init__(self, rule, endpoint, flask_app):
+        self.rule = rule
+        self.app = request_response(endpoint)
+        self.flask_app = flask_app
+
+    async def __call__(self, scope, receive, send):
+        if Headers(scope=scope).get('content-type', '').startswith('multipart/form-data'):
+            await self.flask_app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            labels = {"endpoint": self.rule, "method": scope["method"], "status": status}
+            metrics.http_requests_total.inc(**labels)
+            metrics.http_request_duration.observe(time.perf_counter() - start, **labels)
+
+@asynccontextmanager
+async def lifespan(app):
+    """Build the async OpenAI service in the background at startup; close async HTTP clients at shutdown"""
+    async_openai_service_loader.start()
+    yield
+    await http_clients.aclose_async()
+
+def create_asgi_app():
+    """
+    Create the ASGI application
+
+    /api/chat and /api/chat/stream (JSON bodies) are async; every other request is
+    passed to the Flask app (main.create_app, which starts deferred service
+    initialization) on ASGI_WSGI_THREADS threads (default 32).
+    """
+    flask_app = WSGIMiddleware(main.create_app(), workers=WSGI_THREADS)
+    return Starlette(
+        routes=[
+            Route('/api/chat', AsyncRoute('/api/chat', chat, flask_app), methods=['POST']),
+            Route('/api/chat/stream', AsyncRoute('/api/chat/stream', chat_stream, flask_app), methods=['POST']),
+            Mount('/', app=flask_app)
+        ],
+        # Allow CORS from all origins (for local development and integration), as the Flask app does
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+        lifespan=lifespan
+    )
@@ -3,21 +3,28 @@ Credential Manager
 Handles loading and validation of API credentials from Papita API or environment variables
 """
 import os
+import time
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Optional
-import httpx
+from service.http_clients import get_papita_client
+from service.resilience import get_breaker, CircuitOpenError
+from service import metrics
 
 
 class CredentialManager:
     """Manages API credentials for OpenAI and other services"""
     
-    def __init__(self, env_file: Optional[str] = None):
+    def __init__(self, env_file: Optional[str] = None, cache_ttl: Optional[float] = None, negative_cache_ttl: Optional[float] = None):
         """
         Initialize credential manager
         
         Args:
             env_file: Path to .env file. If None, looks for .env in Backend directory
+            cache_ttl: Seconds to cache a key fetched from Papita API (env CREDENTIAL_CACHE_TTL, default 300)
+            negative_cache_ttl: Seconds to remember that Papita API had no key or was unreachable
+                (env CREDENTIAL_NEGATIVE_CACHE_TTL, default 30)
         """
         if env_file is None:
             # Default to Backend/.env
@@ -27,6 +34,11 @@ class CredentialManager:
         self.env_file = Path(env_file)
         self.papita_api_url = os.getenv('PAPITA_API_URL', 'http://localhost:3000')
         self._credential_source = None  # Track which source was used
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv('CREDENTIAL_CACHE_TTL', '300'))
+        self.negative_cache_ttl = negative_cache_ttl if negative_cache_ttl is not None else float(os.getenv('CREDENTIAL_NEGATIVE_CACHE_TTL', '30'))
+        self._cache_lock = threading.Lock()
+        self._cached_papita_key = None
+        self._cache_expires_at = 0.0  # monotonic time; 0 means nothing cached
         self._load_credentials()
     
     def _load_credentials(self):
@@ -41,30 +53,47 @@ class CredentialManager:
         """
         Fetch OpenAI API key from Papita API
         
+        Goes through the "papita" circuit breaker: while Papita is known to be down
+        this returns None at once instead of waiting for the timeout.
+        
         Returns:
             API key string if successful, None otherwise
         """
+        breaker = get_breaker("papita")
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            return None
+        
         try:
             url = f"{self.papita_api_url}/api/credentials/global/openai"
             # Use a shorter timeout and catch all connection errors
-            with httpx.Client(timeout=2.0) as client:
-                response = client.get(url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    # Handle different response formats
-                    if isinstance(data, dict):
-                        # Try common response formats
-                        # Papita API format: data.credentials.credentials.api_key
-                        api_key = (
-                            data.get('credentials', {}).get('credentials', {}).get('api_key') or
-                            data.get('credentials', {}).get('api_key') or
-                            data.get('api_key') or
-                            data.get('value') or
-                            data.get('credential_value')
-                        )
-                        if api_key and api_key.strip():
-                            return api_key.strip()
+            try:
+                with metrics.credential_fetch_duration.time():
+                    response = get_papita_client().get(url, timeout=2.0)
+            except Exception:
+                breaker.record_failure()
+                raise
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            
+            if response.status_code == 200:
+                data = response.json()
+                # Handle different response formats
+                if isinstance(data, dict):
+                    # Try common response formats
+                    # Papita API format: data.credentials.credentials.api_key
+                    api_key = (
+                        data.get('credentials', {}).get('credentials', {}).get('api_key') or
+                        data.get('credentials', {}).get('api_key') or
+                        data.get('api_key') or
+                        data.get('value') or
+                        data.get('credential_value')
+                    )
+                    if api_key and api_key.strip():
+                        return api_key.strip()
             
             return None
         except Exception as e:
@@ -77,16 +106,50 @@ class CredentialManager:
                     pass  # Suppress connection errors in dev mode too
             return None
     
+    def _get_papita_api_key(self) -> Optional[str]:
+        """
+        Get OpenAI API key from Papita API, using the in-memory cache
+        
+        A fetched key is cached for cache_ttl seconds. A missing key (Papita down or
+        not configured) is cached for negative_cache_ttl seconds so callers don't wait
+        on the Papita timeout every time.
+        """
+        if time.monotonic() < self._cache_expires_at:
+            return self._cached_papita_key
+        
+        with self._cache_lock:
+            # Another thread may have refreshed the cache while we waited
+            if time.monotonic() < self._cache_expires_at:
+                return self._cached_papita_key
+            
+            api_key = self._fetch_from_papita_api()
+            ttl = self.cache_ttl if api_key else self.negative_cache_ttl
+            self._cached_papita_key = api_key
+            self._cache_expires_at = time.monotonic() + ttl
+            return api_key
+    
+    def refresh(self) -> Optional[str]:
+        """
+        Drop cached credentials and fetch them again
+        
+        Returns:
+            The current OpenAI API key (same as get_openai_api_key)
+        """
+        with self._cache_lock:
+            self._cached_papita_key = None
+            self._cache_expires_at = 0.0
+        return self.get_openai_api_key()
+    
     def get_openai_api_key(self) -> Optional[str]:
         """
         Get OpenAI API key from Papita API or environment
         
         Priority:
-        1. Try Papita API (for production/integration)
+        1. Try Papita API (for production/integration, cached - see _get_papita_api_key)
         2. Fallback to local .env file (for local development)
         """
         # First, try fetching from Papita API
-        api_key = self._fetch_from_papita_api()
+        api_key = self._get_papita_api_key()
         
         if api_key and api_key.strip():
             self._credential_source = "papita_api"
@@ -133,5 +196,6 @@ class CredentialManager:
             "env_file_path": str(self.env_file),
             "env_file_exists": self.env_file.exists(),
             "papita_api_url": self.papita_api_url,
-            "credential_source": self._credential_source or "none"
+            "credential_source": self._credential_source or "none",
+            "credential_cache_ttl": self.cache_ttl
         }
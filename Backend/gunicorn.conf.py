@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for AL-Chat Backend
+All settings can be overridden from the environment
+
+Chat requests spend most of their time waiting on OpenAI, so the default is
+a single process with many threads (gthread). Threads share the in-memory
+conversation store and response cache; with GUNICORN_WORKERS > 1 each worker
+has its own copy (clients that send "history" are unaffected) and usage stats
+are merged across workers through USAGE_STATE_DIR.
+
+For very high concurrency, install gevent and set GUNICORN_WORKER_CLASS=gevent,
+or run the async server instead: uvicorn asgi:app (see async_api.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '64'))
+# Max simultaneous clients per gevent worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# OpenAI completions can take a while - don't kill workers mid-response
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '180'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers periodically (0 disables)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# Background threads (usage logging, log writers) are started per worker, so
+# the app must be loaded after fork
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Usage stats are merged across workers through this directory
+if workers > 1:
+    os.environ.setdefault('USAGE_STATE_DIR', '/tmp/al-chat-usage')
+
+
+def on_starting(server):
+    """Start usage stats from zero, as a single process does: remove the previous run's state files"""
+    state_dir = os.environ.get('USAGE_STATE_DIR')
+    if not state_dir or not os.path.isdir(state_dir):
+        return
+    for name in os.listdir(state_dir):
+        if name.startswith('usage_') and name.endswith(('.json', '.tmp')):
+            try:
+                os.remove(os.path.join(state_dir, name))
+            except OSError:
+                pass
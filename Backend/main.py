@@ -1,20 +1,61 @@
 """
 AL-Chat Backend
 Main entry point for the Python backend server
+
+Development: python main.py (Flask development server)
+Production: gunicorn -c gunicorn.conf.py wsgi:app (see gunicorn.conf.py)
 """
 import os
-from flask import Flask, request, jsonify
+import math
+import time
+from flask import Flask, Blueprint, Response, request, jsonify, stream_with_context, g
 from flask_cors import CORS
 from datetime import datetime
 import json
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tempfile import SpooledTemporaryFile
+from werkzeug.exceptions import RequestEntityTooLarge
 from session_logger import SessionLogger
 from service.openai_service import OpenAIService
+from service.papita_usage_logger import PapitaUsageLogger
+from service.response_cache import ResponseCache
+from service.conversation_store import ConversationStore
+from service.request_coalescer import RequestCoalescer
+from service.context_window import ContextWindowManager
+from service.usage_aggregator import UsageAggregator
+from service.attachment_store import AttachmentStore, AttachmentTooLarge, build_attachment_message, attachment_reference
+from service.attachment_retrieval import AttachmentRetriever
+from service import http_clients
+from service import metrics
+from service import token_counter
+from service.startup import LazyService, start_all
+from service.resilience import UpstreamError, UpstreamAuthError, get_breaker, get_breaker_states
+from service.admission import AdmissionController, AdmissionRejected
+from service.model_router import ModelRouter
 from credentials.credential_manager import CredentialManager
 
-app = Flask(__name__)
-# Allow CORS from all origins (for local development and integration)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+api = Blueprint('api', __name__)
+
+@api.before_app_request
+def start_request_timer():
+    """Record when request handling started (for latency metrics)"""
+    g.request_start = time.perf_counter()
+
+@api.after_app_request
+def record_request_metrics(response):
+    """Count the request and observe its latency once the response body has been sent"""
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    method = request.method
+    status = str(response.status_code)
+    start = g.get('request_start')
+    metrics.http_requests_total.inc(endpoint=endpoint, method=method, status=status)
+    if start is not None:
+        # Runs after the full body is sent, so streamed responses are timed end to end
+        response.call_on_close(lambda: metrics.http_request_duration.observe(
+            time.perf_counter() - start, endpoint=endpoint, method=method, status=status
+        ))
+    return response
 
 # Initialize session logger
 session_logger = SessionLogger()
@@ -46,41 +87,136 @@ project_criteria = {
     }
 }
 
-# Log project initialization criteria
-session_logger.log_project_init(project_criteria)
-
 # Initialize credential manager
 credential_manager = CredentialManager()
 
-# Initialize OpenAI service
-openai_service = None
-openai_service_info = None
-try:
-    openai_service = OpenAIService(credential_manager)
-    openai_service_info = openai_service.get_service_info()
-    print("[OK] OpenAI service initialized successfully")
-except ValueError as e:
-    print(f"[WARNING] {e}. OpenAI features will not be available.")
-    openai_service_info = {
-        "error": str(e),
+# Initialize response cache (opt-in)
+response_cache = None
+if os.environ.get('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true':
+    response_cache = ResponseCache()
+
+# Identical concurrent chat requests share one OpenAI call (disable with REQUEST_COALESCING_ENABLED=false)
+request_coalescer = None
+if os.environ.get('REQUEST_COALESCING_ENABLED', 'true').lower() == 'true':
+    request_coalescer = RequestCoalescer()
+
+# Server-side conversation histories (clients can send just the new turn plus a conversation_id)
+conversation_store = ConversationStore()
+
+# Uploaded attachments, stored on disk by content hash
+attachment_store = AttachmentStore()
+
+# Send only the chunks of large attachments relevant to the message (disable with ATTACHMENT_RETRIEVAL_ENABLED=false)
+attachment_retriever = None
+if os.environ.get('ATTACHMENT_RETRIEVAL_ENABLED', 'true').lower() == 'true':
+    attachment_retriever = AttachmentRetriever(attachment_store)
+
+# Trim history to each model's context window (disable with CONTEXT_WINDOW_ENABLED=false)
+context_manager = None
+if os.environ.get('CONTEXT_WINDOW_ENABLED', 'true').lower() == 'true':
+    context_manager = ContextWindowManager()
+
+# Choose models by rules and fail over while a model is slow or erroring (disable with MODEL_ROUTER_ENABLED=false)
+model_router = None
+if os.environ.get('MODEL_ROUTER_ENABLED', 'true').lower() == 'true':
+    model_router = ModelRouter()
+
+# Rate limit chat requests per user, session and model (disable with ADMISSION_CONTROL_ENABLED=false)
+admission_controller = None
+if os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true':
+    admission_controller = AdmissionController()
+
+# Completion tokens reserved per request until its actual usage is known
+ADMISSION_COMPLETION_TOKENS = int(os.environ.get('ADMISSION_COMPLETION_TOKENS', '512'))
+
+# OpenAI service is built on first use or in the background by init_services(),
+# so importing this module never waits on Papita API. A failed build is retried
+# on use after the credential negative cache expires.
+openai_service_loader = LazyService(
+    "openai",
+    lambda: OpenAIService(credential_manager, response_cache=response_cache, context_manager=context_manager,
+                          coalescer=request_coalescer),
+    retry_interval=credential_manager.negative_cache_ttl
+)
+
+# Load the tokenizer encoding (may be downloaded on first use) off the request path
+tokenizer_loader = LazyService("tokenizer", lambda: token_counter.preload(os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')))
+
+OPENAI_NOT_CONFIGURED = "OpenAI service not configured. Please set OPENAI_API_KEY in .env file or ensure Papita API is running."
+
+def get_openai_service():
+    """Get the OpenAI service, building it if needed. Returns None if it is not configured."""
+    return openai_service_loader.get()
+
+def get_openai_service_info():
+    """Get OpenAI service configuration info, or the reason it is not available"""
+    openai_service = get_openai_service()
+    if openai_service:
+        return openai_service.get_service_info()
+    return {
+        "error": str(openai_service_loader.error),
         "credentials_info": credential_manager.get_credentials_info()
     }
 
-# Track cumulative OpenAI usage statistics
-usage_stats = {
-    "total_prompt_tokens": 0,
-    "total_completion_tokens": 0,
-    "total_tokens": 0,
-    "request_count": 0,
-    "model": openai_service_info.get("model", "unknown") if openai_service_info else "unknown"
-}
+# Track cumulative OpenAI usage statistics (per model, per user and per session)
+usage_aggregator = UsageAggregator()
+
+# Max size of a request body, including all uploaded attachments (default 100MB)
+MAX_REQUEST_BYTES = int(os.environ.get('ATTACHMENT_MAX_REQUEST_BYTES', str(100 * 1024 * 1024)))
 
 # Papita API URL for logging usage
 PAPITA_API_URL = os.environ.get('PAPITA_API_URL', 'http://localhost:3000')
 
+# Usage records are delivered to Papita API in the background
+papita_usage_logger = PapitaUsageLogger(PAPITA_API_URL)
+
+# Startup report of the last init_services() call
+startup_report = None
+_startup_lock = threading.Lock()
+
+def init_services():
+    """
+    Start deferred initialization (once per process, later calls return the first report)
+    
+    Builds the OpenAI service and tokenizer concurrently, waiting at most
+    STARTUP_BUDGET seconds (default 2); anything slower finishes in the background.
+    Also logs project_init (once per day per criteria), starts session log archiving
+    and warms up HTTP connections.
+    
+    Returns:
+        Startup timing report
+    """
+    global startup_report
+    with _startup_lock:
+        if startup_report is not None:
+            return startup_report
+        
+        start = time.perf_counter()
+        session_logger.log_project_init(project_criteria)
+        session_logger.start_archiving()
+        
+        # Open pooled connections to Papita and OpenAI before the first chat request
+        if os.environ.get('HTTP_WARM_UP', 'true').lower() == 'true':
+            threading.Thread(target=http_clients.warm_up, args=(PAPITA_API_URL,), name="http-warm-up", daemon=True).start()
+        
+        budget = float(os.environ.get('STARTUP_BUDGET', '2.0'))
+        report = start_all([openai_service_loader, tokenizer_loader], budget)
+        report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        startup_report = report
+    
+    openai_status = report["services"]["openai"]
+    if openai_status["state"] == "ready":
+        print(f"[OK] OpenAI service initialized successfully ({openai_status['init_ms']} ms)")
+    elif openai_status["state"] == "failed":
+        print(f"[WARNING] {openai_status['error']}. OpenAI features will not be available.")
+    else:
+        print(f"[WARNING] OpenAI service still initializing after {report['budget_ms']} ms startup budget, continuing in background")
+    print(f"[OK] Startup completed in {report['elapsed_ms']} ms")
+    return report
+
 def log_usage_to_papita(username, is_guest, session_id, model, input_tokens, output_tokens, total_tokens):
     """
-    Log usage to Papita API
+    Queue usage for logging to Papita API (returns immediately)
     
     Args:
         username: Username (or 'guest' for guests)
@@ -107,37 +243,53 @@ def log_usage_to_papita(username, is_guest, session_id, model, input_tokens, out
             'totalTokens': total_tokens
         }
         
-        response = requests.post(
-            f'{PAPITA_API_URL}/api/usage/log',
-            json=log_data,
-            timeout=5  # 5 second timeout
-        )
-        
-        if response.status_code == 200:
-            print(f"[OK] Usage logged to Papita API: {total_tokens} tokens")
-        else:
-            print(f"[WARNING] Failed to log usage to Papita API: {response.status_code}")
+        papita_usage_logger.log(log_data)
     except Exception as e:
         # Don't fail the request if logging fails
         print(f"[WARNING] Error logging usage to Papita API: {str(e)}")
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "openai_configured": openai_service is not None
+        "openai_configured": openai_service_loader.peek() is not None,
+        "usage_logging": papita_usage_logger.get_stats(),
+        "session_log": {**session_logger.writer.get_stats(), **session_logger.get_open_sessions()},
+        "upstream": {**get_breaker_states(), "papita": get_breaker("papita").get_status()},
+        "attachments": {
+            **attachment_store.get_stats(),
+            "retrieval": attachment_retriever.get_stats() if attachment_retriever else None
+        },
+        "startup": {
+            **(startup_report or {}),
+            "services": {
+                "openai": openai_service_loader.get_status(),
+                "tokenizer": tokenizer_loader.get_status()
+            }
+        }
     })
 
-@app.route('/api/openai/test', methods=['GET'])
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request counters and latency histograms (Prometheus text exposition format)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/http/stats', methods=['GET'])
+def http_pool_stats():
+    """Get outbound HTTP connection pool statistics"""
+    return jsonify(http_clients.get_pool_stats())
+
+@api.route('/api/openai/test', methods=['GET'])
 def test_openai_connection():
     """Test OpenAI connection"""
+    openai_service = get_openai_service()
     if not openai_service:
         return jsonify({
             "status": "error",
             "message": "OpenAI service not configured",
-            "info": openai_service_info
+            "info": get_openai_service_info()
         }), 500
     
     try:
@@ -149,106 +301,594 @@ def test_openai_connection():
             "message": str(e)
         }), 500
 
-@app.route('/api/openai/info', methods=['GET'])
+@api.route('/api/openai/info', methods=['GET'])
 def get_openai_info():
     """Get OpenAI service configuration info"""
-    return jsonify(openai_service_info if openai_service_info else {
-        "status": "not_configured",
-        "message": "OpenAI service not initialized"
-    })
+    return jsonify(get_openai_service_info())
+
+class ChatRequest(Flask.request_class):
+    """Request that spools multipart file uploads to disk above ATTACHMENT_SPOOL_BYTES (default 512KB)"""
+    spool_bytes = int(os.environ.get('ATTACHMENT_SPOOL_BYTES', str(512 * 1024)))
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=self.spool_bytes, mode='rb+')
+
+def get_chat_body():
+    """
+    Get the fields of a /api/chat request
+    
+    JSON bodies are returned as-is. multipart/form-data requests carry the same
+    fields as form fields (history as a JSON string) and attachments as files
+    named "files", which are stored in the attachment store and referenced by id.
+    
+    Raises:
+        AttachmentTooLarge: If an uploaded file is larger than ATTACHMENT_MAX_BYTES
+    """
+    if request.mimetype != 'multipart/form-data':
+        return request.json
+    
+    data = request.form.to_dict()
+    if data.get('history'):
+        data['history'] = json.loads(data['history'])
+    for flag in ('isGuest', 'cache'):
+        if flag in data:
+            data[flag] = data[flag].lower() == 'true'
+    data['attached_files'] = [attachment_store.put(f.stream, f.filename) for f in request.files.getlist('files')]
+    return data
+
+def build_chat_request(data, headers=None):
+    """
+    Parse a /api/chat request body
+    
+    Args:
+        data: Request fields (see get_chat_body)
+        headers: Request headers (default: the current Flask request's)
+    
+    Returns:
+        Tuple of (chat request dict, error message). Error message is None when the request is valid.
+    """
+    message = data.get('message', '')
+    model = data.get('model')  # Get model from request (sent by frontend)
+    attached_files = data.get('attached_files') or []
+    if not attached_files and data.get('attached_content'):
+        attached_files = [{'name': data.get('attached_filename') or 'file', 'content': data.get('attached_content')}]
+
+    if not message and not attached_files:
+        return None, "Message or attachment is required"
+
+    conversation_id = data.get('conversation_id')
+    conversation_history = data.get('history')
+    conversation_reset = False
+    if conversation_id:
+        if conversation_history:
+            # Client sent its full history - it becomes the server-side history
+            conversation_store.replace(conversation_id, conversation_history)
+        else:
+            conversation_history = conversation_store.get_history(conversation_id)
+            # Unknown, expired or evicted - the turn goes without history and the response says so
+            conversation_reset = conversation_history is None
+    conversation_history = conversation_history or []
+
+    attachments = None
+    if attached_files:
+        # Attachments are inlined up to ATTACHMENT_PROMPT_MAX_CHARS (large ones searched for the
+        # message instead, see AttachmentRetriever); stored ones are read from disk
+        try:
+            built = build_attachment_message(attached_files, message, store=attachment_store, retriever=attachment_retriever)
+        except KeyError as e:
+            return None, f"Attachment not found: {e.args[0]}"
+        effective_message = built["message"]
+        attachments = built["attachments"]
+        # The conversation keeps the message and attachment references, not the inlined content
+        history_message = attachment_reference(message, attachments)
+    else:
+        effective_message = history_message = message
+
+    # Get user information from request
+    username = data.get('username', 'guest')
+    is_guest = data.get('isGuest', True)
+    
+    # Get session ID from request headers or body. Not guessed from other users'
+    # sessions: with concurrent sessions the most recent one is not necessarily ours.
+    session_id = (headers if headers is not None else request.headers).get('X-Session-ID') or data.get('sessionId')
+    if session_id:
+        session_logger.touch_session(session_id)
+    
+    # If username is not provided or is 'guest', treat as guest
+    if not username or username == 'guest':
+        is_guest = True
+        username = 'guest'
+    
+    return {
+        "effective_message": effective_message,
+        "history_message": history_message,
+        "history": conversation_history,
+        "conversation_id": conversation_id,
+        "conversation_reset": conversation_reset,
+        "model": model,
+        "username": username,
+        "is_guest": is_guest,
+        "session_id": session_id,
+        "attachments": attachments,
+        "use_cache": data.get('cache', True)
+    }, None
+
+def save_conversation_turn(chat_request, reply):
+    """
+    Append the user message and assistant reply to the server-side conversation (if any)
+
+    Attachments are inlined only for the turn that sends them: the saved user message
+    names them instead (see attachment_reference), so later turns don't resend their content.
+    """
+    if not chat_request["conversation_id"]:
+        return
+    conversation_store.append(chat_request["conversation_id"], [
+        {"role": "user", "content": chat_request["history_message"]},
+        {"role": "assistant", "content": reply}
+    ])
+
+def upstream_error_body(error):
+    """
+    Get the error body and HTTP status for a failed OpenAI call
+    
+    Typed errors map to their status (401 invalid key, 429 rate limited, 503 unavailable
+    or circuit open, ...) and report retry_after when the upstream gave one.
+    """
+    if isinstance(error, UpstreamAuthError):
+        return {
+            "error": "Invalid OpenAI API key. Please check your credentials in Papita API or .env file.",
+            "details": "The OpenAI API key is invalid or expired. If using Papita API, ensure it's running and has valid credentials."
+        }, 401
+    if isinstance(error, UpstreamError):
+        body = {"error": str(error)}
+        if error.retry_after is not None:
+            body["retry_after"] = round(error.retry_after, 1)
+        return body, error.http_status
+    return {"error": str(error)}, 500
+
+def upstream_error_response(error):
+    """Flask response for a failed OpenAI call, with a Retry-After header when known"""
+    body, status = upstream_error_body(error)
+    headers = {"Retry-After": str(math.ceil(body["retry_after"]))} if "retry_after" in body else {}
+    return jsonify(body), status, headers
+
+def estimate_prompt_tokens(chat_request, model):
+    """Estimate the prompt tokens of a chat request (history is trimmed to the model's budget when sent)"""
+    messages = chat_request["history"] + [{"role": "user", "content": chat_request["effective_message"]}]
+    prompt_tokens = sum(token_counter.count_message_tokens(m, model) for m in messages)
+    if context_manager is not None:
+        prompt_tokens = min(prompt_tokens, context_manager.get_budget(model))
+    return prompt_tokens
+
+def choose_models(openai_service, chat_request):
+    """
+    Choose the models to try for a chat request (see ModelRouter)
+    
+    Returns:
+        Tuple of (models in the order to try, routing reason, estimated prompt + completion tokens).
+        Without a router the only model is the requested or default one.
+    """
+    model = chat_request["model"] or openai_service.model
+    prompt_tokens = estimate_prompt_tokens(chat_request, model)
+    candidates, reason = [model], None
+    if model_router is not None:
+        candidates, reason = model_router.route(
+            openai_service.model, requested_model=chat_request["model"], prompt_tokens=prompt_tokens,
+            has_attachments=bool(chat_request["attachments"]), tier="guest" if chat_request["is_guest"] else "user"
+        )
+    return candidates, reason, prompt_tokens + ADMISSION_COMPLETION_TOKENS
+
+def route_chat(openai_service, chat_request):
+    """
+    Choose the models to try for a chat request (see choose_models) and wait for rate limit capacity
+    (see AdmissionController)
+    
+    Returns:
+        Tuple of (models in the order to try, routing reason, AdmissionTicket to settle with settle_chat).
+        Without admission control the ticket is None.
+    
+    Raises:
+        AdmissionRejected: If the request's user, session or model is over its limits
+    """
+    candidates, reason, estimated_tokens = choose_models(openai_service, chat_request)
+    ticket = None
+    if admission_controller is not None:
+        ticket = admission_controller.admit(chat_request["username"], chat_request["is_guest"], chat_request["session_id"],
+                                            candidates[0], estimated_tokens)
+    return candidates, reason, ticket
+
+def settle_chat(ticket, used_tokens):
+    """Correct an admitted request's token reservation to the tokens it used"""
+    if ticket is not None:
+        admission_controller.settle(ticket, used_tokens)
+
+def record_usage(chat_request, usage):
+    """
+    Update cumulative usage statistics and log usage to Papita API
+    
+    Args:
+        chat_request: Chat request dict from build_chat_request
+        usage: Usage dict returned by OpenAIService
+    """
+    model_used = usage.get("model") or chat_request["model"] or credential_manager.get_openai_model()
+    usage_aggregator.record(model_used, chat_request["username"], chat_request["session_id"], usage)
+    
+    if usage.get("cached") or usage.get("coalesced"):
+        # Served from the response cache, or shared with an identical in-flight request
+        # (logged by the request that made the call) - nothing was sent to OpenAI
+        return
+    
+    # Log usage to Papita API
+    log_usage_to_papita(
+        username=chat_request["username"],
+        is_guest=chat_request["is_guest"],
+        session_id=chat_request["session_id"],
+        model=model_used,
+        input_tokens=usage.get("prompt_tokens", 0),
+        output_tokens=usage.get("completion_tokens", 0),
+        total_tokens=usage.get("total_tokens", 0)
+    )
+
+def complete_chat(openai_service, chat_request, route=None):
+    """
+    Send a chat request to OpenAI, record its usage and save the turn
+    
+    Args:
+        openai_service: OpenAIService instance
+        chat_request: Chat request dict from build_chat_request
+        route: (models, routing reason, AdmissionTicket or None) when already chosen and admitted
+            (batch items, see admit_batch); default route_chat
+    
+    Returns:
+        /api/chat response body
+    
+    Raises:
+        AdmissionRejected: If the request is over its rate limits
+        Exception: If the OpenAI call fails
+    """
+    candidates, reason, ticket = route or route_chat(openai_service, chat_request)
+    used_tokens = 0
+    try:
+        if model_router is not None:
+            ai_response_data = model_router.send_message(openai_service, chat_request["effective_message"], chat_request["history"],
+                                                         candidates, reason, use_cache=chat_request["use_cache"])
+        else:
+            ai_response_data = openai_service.send_message(chat_request["effective_message"], chat_request["history"], model=candidates[0], use_cache=chat_request["use_cache"])
+        used_tokens = ai_response_data.get("usage", {}).get("total_tokens", 0)
+    finally:
+        settle_chat(ticket, used_tokens)
+    return finish_chat(chat_request, ai_response_data)
+
+def finish_chat(chat_request, ai_response_data):
+    """
+    Record the usage of a completed chat request and save the turn
+    
+    Args:
+        chat_request: Chat request dict from build_chat_request
+        ai_response_data: OpenAIService result ({"message", "usage"})
+    
+    Returns:
+        /api/chat response body
+    """
+    # Update cumulative usage statistics
+    if "usage" in ai_response_data:
+        record_usage(chat_request, ai_response_data["usage"])
+    
+    save_conversation_turn(chat_request, ai_response_data["message"])
+    
+    response = {
+        "message": ai_response_data["message"],
+        "usage": ai_response_data.get("usage", {}),
+        "timestamp": datetime.now().isoformat()
+    }
+    if chat_request["conversation_id"]:
+        response["conversation_id"] = chat_request["conversation_id"]
+        if chat_request["conversation_reset"]:
+            response["conversation_reset"] = True
+    if chat_request["attachments"]:
+        response["attachments"] = chat_request["attachments"]
+    return response
 
-@app.route('/api/chat', methods=['POST'])
+@api.route('/api/chat', methods=['POST'])
 def chat():
     """Handle chat requests to OpenAI"""
     try:
-        data = request.json
-        message = data.get('message', '')
-        conversation_history = data.get('history', [])
-        model = data.get('model')  # Get model from request (sent by frontend)
-        attached_files = data.get('attached_files') or []
-        if not attached_files and data.get('attached_content'):
-            attached_files = [{'name': data.get('attached_filename') or 'file', 'content': data.get('attached_content')}]
-
-        if not message and not attached_files:
-            return jsonify({"error": "Message or attachment is required"}), 400
-
-        if attached_files:
-            parts = [f"[Attached file {i+1}: {f.get('name', 'file')}]\n\n{f.get('content', '')}" for i, f in enumerate(attached_files)]
-            default_msg = 'Please compare and analyze the attached files.' if len(attached_files) > 1 else 'Please analyze the attached file.'
-            effective_message = "\n\n---\n\n".join(parts) + "\n\n---\n\n" + (message or default_msg)
-        else:
-            effective_message = message
+        chat_request, error = build_chat_request(get_chat_body())
+        if error:
+            return jsonify({"error": error}), 400
 
+        openai_service = get_openai_service()
         if not openai_service:
-            return jsonify({
-                "error": "OpenAI service not configured. Please set OPENAI_API_KEY in .env file or ensure Papita API is running."
-            }), 500
-        
-        # Get user information from request
-        username = data.get('username', 'guest')
-        is_guest = data.get('isGuest', True)
-        
-        # Get session ID from request headers or body
-        session_id = request.headers.get('X-Session-ID') or data.get('sessionId')
-        if not session_id:
-            # Try to get from session logger if available
-            if hasattr(session_logger, 'current_session_id') and session_logger.current_session_id:
-                session_id = session_logger.current_session_id
-        
-        # If username is not provided or is 'guest', treat as guest
-        if not username or username == 'guest':
-            is_guest = True
-            username = 'guest'
+            return jsonify({"error": OPENAI_NOT_CONFIGURED}), 500
         
         # Get response from OpenAI using the service (now returns dict with message and usage)
         try:
-            # Use model from request if provided, otherwise use default
-            model_to_use = model or openai_service.model
-            ai_response_data = openai_service.send_message(effective_message, conversation_history, model=model_to_use)
-        except Exception as openai_error:
-            # Check if it's an API key error
-            error_msg = str(openai_error)
-            if "401" in error_msg or "invalid_api_key" in error_msg or "Incorrect API key" in error_msg:
-                return jsonify({
-                    "error": "Invalid OpenAI API key. Please check your credentials in Papita API or .env file.",
-                    "details": "The OpenAI API key is invalid or expired. If using Papita API, ensure it's running and has valid credentials."
-                }), 401
-            # Re-raise other errors
-            raise
+            response = complete_chat(openai_service, chat_request)
+        except UpstreamError as openai_error:
+            return upstream_error_response(openai_error)
         
-        # Update cumulative usage statistics
-        if "usage" in ai_response_data:
-            usage = ai_response_data["usage"]
-            usage_stats["total_prompt_tokens"] += usage.get("prompt_tokens", 0)
-            usage_stats["total_completion_tokens"] += usage.get("completion_tokens", 0)
-            usage_stats["total_tokens"] += usage.get("total_tokens", 0)
-            usage_stats["request_count"] += 1
-            if usage.get("model"):
-                usage_stats["model"] = usage["model"]
-            
-            # Log usage to Papita API
-            model_used = model or usage.get("model") or openai_service.model
-            log_usage_to_papita(
-                username=username,
-                is_guest=is_guest,
-                session_id=session_id,
-                model=model_used,
-                input_tokens=usage.get("prompt_tokens", 0),
-                output_tokens=usage.get("completion_tokens", 0),
-                total_tokens=usage.get("total_tokens", 0)
-            )
+        return jsonify(response)
+    except (AttachmentTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({"error": attachment_error_message(e)}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Batch chat items are sent to OpenAI from one process-wide pool, so BATCH_CONCURRENCY
+# bounds concurrent upstream calls across all batches (threads start on first use)
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '16'))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '500'))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="chat-batch")
+
+# Batch-level fields used for items that don't set them
+BATCH_DEFAULT_FIELDS = ('model', 'username', 'isGuest', 'sessionId', 'cache')
+
+def admit_batch(openai_service, parsed):
+    """
+    Route the valid items of a batch and admit them as one unit per user, session and model
+    
+    Each group waits for (or is rejected by) the rate limits once, before any of its items
+    is sent, so large batches neither get most items rejected nor hold batch_executor
+    threads while waiting (see AdmissionController).
+    
+    Args:
+        openai_service: OpenAIService instance
+        parsed: (index, chat request, error) of each item
+    
+    Returns:
+        Tuple of (index -> (models, routing reason) of admitted items, results of rejected items,
+        [(AdmissionTicket, item indices)] to settle with settle_batch)
+    """
+    routes = {}
+    groups = {}
+    for index, chat_request, error in parsed:
+        if error:
+            continue
+        candidates, reason, estimated_tokens = choose_models(openai_service, chat_request)
+        routes[index] = (candidates, reason)
+        key = (chat_request["username"], chat_request["is_guest"], chat_request["session_id"], candidates[0])
+        group = groups.setdefault(key, {"indices": [], "tokens": 0})
+        group["indices"].append(index)
+        group["tokens"] += estimated_tokens
+    
+    rejected, tickets = [], []
+    if admission_controller is None:
+        return routes, rejected, tickets
+    for (username, is_guest, session_id, model), group in groups.items():
+        try:
+            ticket = admission_controller.admit(username, is_guest, session_id, model, group["tokens"],
+                                                requests=len(group["indices"]))
+        except AdmissionRejected as e:
+            body, status = upstream_error_body(e)
+            for index in group["indices"]:
+                del routes[index]
+                rejected.append({"index": index, **body, "status": status})
+            continue
+        tickets.append((ticket, group["indices"]))
+    return routes, rejected, tickets
+
+def settle_batch(tickets, results):
+    """Correct each batch admission's token reservation to the tokens its items used"""
+    used_tokens = {r["index"]: r.get("usage", {}).get("total_tokens", 0) for r in results}
+    for ticket, indices in tickets:
+        settle_chat(ticket, sum(used_tokens.get(index, 0) for index in indices))
+
+def run_batch_item(openai_service, index, chat_request, route):
+    """Complete one admitted batch item. Returns its result (with "index"; "error" and "status" if it failed)."""
+    try:
+        return {"index": index, **complete_chat(openai_service, chat_request, route=(*route, None))}
+    except Exception as e:
+        body, status = upstream_error_body(e)
+        return {"index": index, **body, "status": status}
+
+def summarize_batch(results):
+    """Count, errors and summed token usage of batch results"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for result in results:
+        for field in usage:
+            usage[field] += result.get("usage", {}).get(field, 0)
+    return {
+        "count": len(results),
+        "errors": sum(1 for r in results if "error" in r),
+        "usage": usage,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@api.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Handle a list of independent chat requests, sent to OpenAI concurrently
+    
+    Body: {"requests": [<same body as /api/chat>, ...], "stream": false}. Top-level
+    model, username, isGuest, sessionId and cache apply to items that don't set them.
+    
+    Returns results in request order, or with "stream": true as Server-Sent Events
+    in completion order:
+        result: {"index": ..., <same body as /api/chat>} or {"index": ..., "error": ..., "status": ...}
+        done: {"count", "errors", "usage", "timestamp"}
+    """
+    try:
+        data = request.json or {}
+        items = data.get('requests')
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "requests must be a non-empty list"}), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"A batch can have at most {BATCH_MAX_ITEMS} requests"}), 400
         
-        response = {
-            "message": ai_response_data["message"],
-            "usage": ai_response_data.get("usage", {}),
-            "timestamp": datetime.now().isoformat()
+        # Items are parsed here (needs the request context); only the OpenAI calls run in the pool
+        defaults = {field: data[field] for field in BATCH_DEFAULT_FIELDS if field in data}
+        parsed = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                parsed.append((index, None, "Request must be an object"))
+                continue
+            chat_request, error = build_chat_request({**defaults, **item})
+            parsed.append((index, chat_request, error))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    openai_service = get_openai_service()
+    if not openai_service:
+        return jsonify({"error": OPENAI_NOT_CONFIGURED}), 500
+    
+    try:
+        routes, rejected, tickets = admit_batch(openai_service, parsed)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    # Invalid and rate-limited items are answered without calling OpenAI
+    unsent = sorted([{"index": index, "error": error, "status": 400} for index, _, error in parsed if error] + rejected,
+                    key=lambda r: r["index"])
+    futures = [batch_executor.submit(run_batch_item, openai_service, index, chat_request, routes[index])
+               for index, chat_request, _ in parsed if index in routes]
+    
+    if not data.get('stream'):
+        sent = [f.result() for f in futures]
+        settle_batch(tickets, sent)
+        results = sorted(unsent + sent, key=lambda r: r["index"])
+        return jsonify({"results": results, **summarize_batch(results)})
+    
+    def generate():
+        results = list(unsent)
+        try:
+            for result in unsent:
+                yield format_sse("result", result)
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                yield format_sse("result", result)
+            yield format_sse("done", summarize_batch(results))
+        finally:
+            # Client went away - don't send items that haven't started
+            for future in futures:
+                future.cancel()
+            settle_batch(tickets, results)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
         }
-        
-        return jsonify(response)
+    )
+
+def attachment_error_message(error):
+    """Error message for an upload over the size limits"""
+    if isinstance(error, RequestEntityTooLarge):
+        return f"Request is larger than {MAX_REQUEST_BYTES} bytes"
+    return str(error)
+
+@api.route('/api/attachments', methods=['POST'])
+def upload_attachments():
+    """
+    Upload attachments (multipart/form-data, files named "files") to reference
+    from /api/chat as attached_files: [{"id": ..., "name": ...}]
+    """
+    try:
+        attachments = [attachment_store.put(f.stream, f.filename) for f in request.files.getlist('files')]
+    except (AttachmentTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({"error": attachment_error_message(e)}), 413
+    if not attachments:
+        return jsonify({"error": "No files uploaded (use multipart/form-data with files named 'files')"}), 400
+    return jsonify({
+        "attachments": attachments,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def format_sse(event, data):
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@api.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle chat requests to OpenAI, streaming the response as Server-Sent Events
+    
+    Events:
+        delta: {"delta": "..."} for each chunk of response text
+        done: {"message": ..., "usage": ..., "timestamp": ...} (same body as /api/chat)
+        error: {"error": ...}
+    """
+    try:
+        chat_request, error = build_chat_request(get_chat_body())
+    except (AttachmentTooLarge, RequestEntityTooLarge) as e:
+        return jsonify({"error": attachment_error_message(e)}), 413
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    if error:
+        return jsonify({"error": error}), 400
+
+    openai_service = get_openai_service()
+    if not openai_service:
+        return jsonify({"error": OPENAI_NOT_CONFIGURED}), 500
+
+    # Wait for rate limit capacity before the stream starts, so rejections get a 429 status
+    try:
+        candidates, reason, ticket = route_chat(openai_service, chat_request)
+    except UpstreamError as e:
+        return upstream_error_response(e)
+
+    def generate():
+        used_tokens = 0
+        if model_router is not None:
+            chunks = model_router.stream_message(openai_service, chat_request["effective_message"], chat_request["history"],
+                                                 candidates, reason, use_cache=chat_request["use_cache"])
+        else:
+            chunks = openai_service.stream_message(chat_request["effective_message"], chat_request["history"], model=candidates[0], use_cache=chat_request["use_cache"])
+        try:
+            for chunk in chunks:
+                if "delta" in chunk:
+                    yield format_sse("delta", chunk)
+                    continue
+                
+                used_tokens = chunk.get("usage", {}).get("total_tokens", 0)
+                yield format_sse("done", finish_chat(chat_request, chunk))
+        except Exception as e:
+            body, status = upstream_error_body(e)
+            yield format_sse("error", {**body, "status": status})
+        finally:
+            settle_chat(ticket, used_tokens)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
+@api.route('/api/conversation', methods=['POST'])
+def create_conversation():
+    """Create a server-side conversation"""
+    conversation_id = conversation_store.create()
+    return jsonify({
+        "conversation_id": conversation_id,
+        "timestamp": datetime.now().isoformat()
+    })
+
+@api.route('/api/conversation/<conversation_id>', methods=['GET'])
+def get_conversation(conversation_id):
+    """Get a server-side conversation"""
+    info = conversation_store.get_info(conversation_id)
+    if info is None:
+        return jsonify({"error": "Conversation not found"}), 404
+    return jsonify({
+        **info,
+        "messages": conversation_store.get_history(conversation_id)
+    })
 
-@app.route('/api/session/start', methods=['POST'])
+@api.route('/api/conversation/<conversation_id>', methods=['DELETE'])
+def delete_conversation(conversation_id):
+    """Delete a server-side conversation"""
+    if not conversation_store.delete(conversation_id):
+        return jsonify({"error": "Conversation not found"}), 404
+    return jsonify({
+        "status": "deleted",
+        "timestamp": datetime.now().isoformat()
+    })
+
+@api.route('/api/session/start', methods=['POST'])
 def start_session():
     """Start a new session"""
     try:
@@ -260,7 +900,7 @@ def start_session():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/session/stop', methods=['POST'])
+@api.route('/api/session/stop', methods=['POST'])
 def stop_session():
     """Stop the current session"""
     try:
@@ -276,37 +916,71 @@ def stop_session():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/openai/usage', methods=['GET'])
-def get_usage_stats():
-    """Get cumulative OpenAI usage statistics"""
-    # Calculate estimated cost based on model pricing
-    # Pricing as of 2024 (approximate, may vary)
-    cost_per_1k_tokens = {
-        "gpt-4": {"prompt": 0.03, "completion": 0.06},
-        "gpt-4-turbo": {"prompt": 0.01, "completion": 0.03},
-        "gpt-4-turbo-preview": {"prompt": 0.01, "completion": 0.03},
-        "gpt-4-0125-preview": {"prompt": 0.01, "completion": 0.03},
-        "gpt-3.5-turbo": {"prompt": 0.0015, "completion": 0.002},
-        "gpt-3.5-turbo-16k": {"prompt": 0.003, "completion": 0.004},
-    }
+def parse_date_arg(name):
+    """Get a YYYY-MM-DD query argument. Returns (value, error)."""
+    value = request.args.get(name)
+    if value:
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return None, f"{name} must be a date in YYYY-MM-DD format"
+    return value, None
+
+@api.route('/api/session/<session_id>/events', methods=['GET'])
+def get_session_events(session_id):
+    """
+    Get a session's logged events (oldest first)
+    
+    Optional query args: event (session_start, session_stop, metric), limit
+    """
+    limit = request.args.get('limit', type=int)
+    events = session_logger.get_session_events(session_id, event=request.args.get('event'), limit=limit)
+    if not events:
+        return jsonify({"error": "Session not found"}), 404
+    return jsonify({
+        "session_id": session_id,
+        "events": events,
+        "count": len(events)
+    })
+
+@api.route('/api/session/events', methods=['GET'])
+def get_session_log_events():
+    """
+    Get logged events between two dates, inclusive (oldest first)
     
-    model = usage_stats.get("model", "gpt-3.5-turbo")
-    # Handle model name variations
-    model_key = model
-    if "gpt-4" in model and "turbo" in model:
-        model_key = "gpt-4-turbo"
-    elif "gpt-3.5" in model and "16k" in model:
-        model_key = "gpt-3.5-turbo-16k"
-    elif "gpt-3.5" in model:
-        model_key = "gpt-3.5-turbo"
-    elif "gpt-4" in model:
-        model_key = "gpt-4"
+    Optional query args: start_date, end_date (YYYY-MM-DD), event, limit (default 1000, max 10000), offset
+    """
+    start_date, error = parse_date_arg('start_date')
+    if not error:
+        end_date, error = parse_date_arg('end_date')
+    if error:
+        return jsonify({"error": error}), 400
     
-    pricing = cost_per_1k_tokens.get(model_key, cost_per_1k_tokens["gpt-3.5-turbo"])
+    limit = min(request.args.get('limit', 1000, type=int), 10000)
+    offset = request.args.get('offset', 0, type=int)
+    events = session_logger.get_events(start_date, end_date, event=request.args.get('event'), limit=limit, offset=offset)
+    return jsonify({
+        "start_date": start_date,
+        "end_date": end_date,
+        "events": events,
+        "count": len(events),
+        "offset": offset
+    })
+
+@api.route('/api/openai/usage', methods=['GET'])
+def get_usage_stats():
+    """
+    Get cumulative OpenAI usage statistics
     
-    prompt_cost = (usage_stats["total_prompt_tokens"] / 1000) * pricing["prompt"]
-    completion_cost = (usage_stats["total_completion_tokens"] / 1000) * pricing["completion"]
-    total_cost = prompt_cost + completion_cost
+    Costs are estimated per model. Pass ?session_id=... to include that session's usage.
+    """
+    openai_service = get_openai_service()
+    default_model = openai_service.model if openai_service else "unknown"
+    stats = usage_aggregator.snapshot(default_model=default_model)
+    
+    session_id = request.args.get('session_id')
+    if session_id:
+        stats["session"] = usage_aggregator.get_session_usage(session_id)
     
     # Get account info if available
     account_info = {}
@@ -323,10 +997,11 @@ def get_usage_stats():
             pass
     
     return jsonify({
-        **usage_stats,
-        "estimated_cost_usd": round(total_cost, 4),
-        "prompt_cost_usd": round(prompt_cost, 4),
-        "completion_cost_usd": round(completion_cost, 4),
+        **stats,
+        "response_cache": response_cache.get_stats() if response_cache else None,
+        "request_coalescing": request_coalescer.get_stats() if request_coalescer else None,
+        "admission": admission_controller.get_stats() if admission_controller else None,
+        "model_router": model_router.get_stats() if model_router else None,
         "account_info": account_info,
         "billing_credit_balance": billing_credit_balance,  # None = not available via API
         "usage_dashboard_url": "https://platform.openai.com/account/usage",
@@ -334,8 +1009,25 @@ def get_usage_stats():
         "note": "For full account usage and billing credit balance, visit the OpenAI Billing Dashboard"
     })
 
+def create_app():
+    """
+    Create the Flask application
+    
+    Services (OpenAI, session logger, usage stats) are per process and shared by
+    every app created in it. See gunicorn.conf.py for running multiple workers.
+    Starts deferred service initialization (see init_services).
+    """
+    init_services()
+    app = Flask(__name__)
+    app.request_class = ChatRequest
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+    # Allow CORS from all origins (for local development and integration)
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    app.register_blueprint(api)
+    return app
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     # Only enable debug mode in development
     debug_mode = os.environ.get('FLASK_ENV', 'production') == 'development'
-    app.run(host='0.0.0.0', port=port, debug=debug_mode)
+    create_app().run(host='0.0.0.0', port=port, debug=debug_mode, threaded=True)
@@ -0,0 +1,256 @@
+"""
+Admission Control
+Token-bucket rate limits on chat requests (requests/min and tokens/min) per user,
+per session and per model, so one user or a burst of guests can't use up the
+shared OpenAI quota. Requests wait a bounded time for capacity or are rejected
+with a Retry-After.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
+from service.resilience import UpstreamRateLimitError
+from service import metrics
+
+
+class AdmissionRejected(UpstreamRateLimitError):
+    """A local rate limit is exhausted - the request was not sent to OpenAI"""
+    retryable = False
+    trips_circuit = False
+
+
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity. Takes may overdraw it, reserving future capacity."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def get_wait(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (amounts over capacity only need a full bucket)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+    def give_back(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdmissionTicket:
+    """Capacity reserved for one admitted request"""
+
+    def __init__(self, reservations: List[Tuple[TokenBucket, str, float]], estimated_tokens: int, waited: float):
+        # (bucket, "requests" or "tokens", amount taken)
+        self.reservations = reservations
+        self.estimated_tokens = estimated_tokens
+        self.waited = waited
+        self.settled = False
+
+
+class AdmissionController:
+    """
+    Token buckets keyed by username, session ID and model
+
+    Each request takes one request and its estimated tokens from its user's buckets
+    (all guests share the "guest" user), its session's request bucket and its model's
+    buckets (the shared upstream quota). If any bucket is short, the request waits
+    until all have capacity, at most max_wait seconds; longer waits are rejected
+    with retry_after. Waiting requests reserve capacity in order, so they are
+    admitted first-come, first-served. Token reservations are corrected to the
+    actual usage when the request finishes (settle).
+
+    A batch is admitted as one unit (admit with requests > 1): it waits or is
+    rejected once, and a batch larger than a bucket only needs a full bucket,
+    overdrawing it so the user's next requests wait for the capacity it used.
+    """
+
+    def __init__(self, user_rpm: Optional[float] = None, user_tpm: Optional[float] = None,
+                 guest_rpm: Optional[float] = None, guest_tpm: Optional[float] = None,
+                 session_rpm: Optional[float] = None, model_rpm: Optional[float] = None,
+                 model_tpm: Optional[float] = None, model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_wait: Optional[float] = None, max_keys: Optional[int] = None):
+        """
+        Initialize admission controller. A limit of 0 disables it.
+
+        Args:
+            user_rpm / user_tpm: Requests and tokens per minute per signed-in user
+                (env ADMISSION_USER_RPM, default 30; ADMISSION_USER_TPM, default 60000)
+            guest_rpm / guest_tpm: Limits shared by all guests
+                (env ADMISSION_GUEST_RPM, default 60; ADMISSION_GUEST_TPM, default 100000)
+            session_rpm: Requests per minute per session (env ADMISSION_SESSION_RPM, default 20)
+            model_rpm / model_tpm: Limits per model across all users, set below the provider's limits
+                (env ADMISSION_MODEL_RPM, default 3000; ADMISSION_MODEL_TPM, default 250000)
+            model_limits: Model -> {"rpm": ..., "tpm": ...} overrides (env ADMISSION_MODEL_LIMITS,
+                JSON object, e.g. '{"gpt-4": {"rpm": 500, "tpm": 30000}}'). Longest matching prefix wins.
+            max_wait: Longest a request waits for capacity before it is rejected
+                (env ADMISSION_MAX_WAIT, default 10 seconds)
+            max_keys: Buckets kept per kind, least recently used dropped first
+                (env ADMISSION_MAX_KEYS, default 10000)
+        """
+        def limit(value, env, default):
+            return value if value is not None else float(os.getenv(env, default))
+
+        self.user_rpm = limit(user_rpm, 'ADMISSION_USER_RPM', '30')
+        self.user_tpm = limit(user_tpm, 'ADMISSION_USER_TPM', '60000')
+        self.guest_rpm = limit(guest_rpm, 'ADMISSION_GUEST_RPM', '60')
+        self.guest_tpm = limit(guest_tpm, 'ADMISSION_GUEST_TPM', '100000')
+        self.session_rpm = limit(session_rpm, 'ADMISSION_SESSION_RPM', '20')
+        self.model_rpm = limit(model_rpm, 'ADMISSION_MODEL_RPM', '3000')
+        self.model_tpm = limit(model_tpm, 'ADMISSION_MODEL_TPM', '250000')
+        if model_limits is None and os.getenv('ADMISSION_MODEL_LIMITS'):
+            model_limits = json.loads(os.getenv('ADMISSION_MODEL_LIMITS'))
+        self.model_limits = model_limits or {}
+        self.max_wait = limit(max_wait, 'ADMISSION_MAX_WAIT', '10')
+        self.max_keys = max_keys or int(os.getenv('ADMISSION_MAX_KEYS', '10000'))
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0, "wait_seconds": 0.0}
+
+    def _get_model_limits(self, model: str) -> Tuple[float, float]:
+        """(rpm, tpm) of a model"""
+        matches = [name for name in self.model_limits if model == name or model.startswith(name + "-")]
+        if not matches:
+            return self.model_rpm, self.model_tpm
+        limits = self.model_limits[max(matches, key=len)]
+        return limits.get("rpm", self.model_rpm), limits.get("tpm", self.model_tpm)
+
+    def _get_bucket(self, key: Tuple[str, str, str], rate: float) -> TokenBucket:
+        """Get (or create) a bucket. Called with the lock held."""
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.capacity != rate:
+            bucket = self._buckets[key] = TokenBucket(rate)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _get_limits(self, username: str, is_guest: bool, session_id: Optional[str], model: str):
+        """(scope, key, unit, per-minute rate) of every limit that applies to a request"""
+        user_rpm, user_tpm = (self.guest_rpm, self.guest_tpm) if is_guest else (self.user_rpm, self.user_tpm)
+        model_rpm, model_tpm = self._get_model_limits(model)
+        limits = [
+            ("user", username, "requests", user_rpm),
+            ("user", username, "tokens", user_tpm),
+            ("model", model, "requests", model_rpm),
+            ("model", model, "tokens", model_tpm)
+        ]
+        if session_id:
+            limits.append(("session", session_id, "requests", self.session_rpm))
+        return [limit for limit in limits if limit[3] > 0]
+
+    def admit(self, username: str, is_guest: bool, session_id: Optional[str], model: str,
+              estimated_tokens: int, requests: int = 1) -> AdmissionTicket:
+        """
+        Reserve capacity for a request, waiting for it if needed
+
+        Args:
+            username: Username ("guest" for all guests)
+            is_guest: Whether the guest limits apply
+            session_id: Session ID, or None
+            model: Model the request is sent to
+            estimated_tokens: Expected prompt + completion tokens (of all requests)
+            requests: Number of requests admitted together (the items of a batch)
+
+        Returns:
+            AdmissionTicket to settle when the request finishes
+
+        Raises:
+            AdmissionRejected: If capacity isn't available within max_wait (retry_after says when it will be)
+        """
+        ticket = self._reserve(username, is_guest, session_id, model, estimated_tokens, requests)
+        if ticket.waited > 0:
+            time.sleep(ticket.waited)
+        return ticket
+
+    async def admit_async(self, username: str, is_guest: bool, session_id: Optional[str], model: str,
+                          estimated_tokens: int, requests: int = 1) -> AdmissionTicket:
+        """admit for the event loop: waits for capacity without blocking it"""
+        ticket = self._reserve(username, is_guest, session_id, model, estimated_tokens, requests)
+        if ticket.waited > 0:
+            await asyncio.sleep(ticket.waited)
+        return ticket
+
+    def _reserve(self, username: str, is_guest: bool, session_id: Optional[str], model: str,
+                 estimated_tokens: int, requests: int = 1) -> AdmissionTicket:
+        """
+        Reserve capacity for a request (see admit); the caller waits ticket.waited seconds before sending it
+        """
+        amounts = {"requests": requests, "tokens": estimated_tokens}
+        with self._lock:
+            now = time.monotonic()
+            reservations = []
+            wait, blocking = 0.0, None
+            for scope, key, unit, rate in self._get_limits(username, is_guest, session_id, model):
+                bucket = self._get_bucket((scope, key, unit), rate)
+                bucket_wait = bucket.get_wait(amounts[unit], now)
+                if bucket_wait > wait:
+                    wait, blocking = bucket_wait, (scope, key, unit)
+                reservations.append((bucket, unit, amounts[unit]))
+
+            if wait > self.max_wait:
+                self._stats["rejected"] += requests
+            else:
+                for bucket, unit, amount in reservations:
+                    bucket.take(amount, now)
+                self._stats["admitted"] += requests
+                if wait > 0:
+                    self._stats["queued"] += requests
+                    self._stats["wait_seconds"] += wait
+
+        if wait > self.max_wait:
+            scope, key, unit = blocking
+            metrics.admission_rejections_total.inc(scope=scope, unit=unit)
+            raise AdmissionRejected(
+                "admission", f"Rate limit exceeded: {unit} per minute for {scope} {key}. Retry in {wait:.1f}s",
+                status=429, retry_after=wait
+            )
+        return AdmissionTicket(reservations, estimated_tokens, wait)
+
+    def settle(self, ticket: AdmissionTicket, used_tokens: int):
+        """
+        Correct a ticket's token reservation to what the request used
+
+        Args:
+            ticket: Ticket from admit
+            used_tokens: Tokens the request used upstream (0 if it failed or was served from cache)
+        """
+        if ticket.settled:
+            return
+        ticket.settled = True
+        difference = ticket.estimated_tokens - used_tokens
+        if difference == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for bucket, unit, _ in ticket.reservations:
+                if unit != "tokens":
+                    continue
+                if difference > 0:
+                    bucket.give_back(difference, now)
+                else:
+                    bucket.take(-difference, now)
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get admission statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            stats["buckets"] = len(self._buckets)
+        stats["max_wait"] = self.max_wait
+        return stats
@@ -0,0 +1,187 @@
+"""
+Async OpenAI Service
+OpenAIService for the event loop: sends chat requests with AsyncOpenAI, so one
+process can have thousands of completions in flight without a thread each
+"""
+import time
+import asyncio
+from openai import AsyncOpenAI
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, List, Dict, AsyncIterator
+from service.openai_service import OpenAIService, NO_RETRY, classify_openai_error
+from service.http_clients import get_async_openai_http_client
+from service.response_cache import make_cache_key
+from service.resilience import UpstreamError, call_with_retries_async
+from service import metrics
+
+
+class AsyncOpenAIService(OpenAIService):
+    """
+    OpenAIService with coroutine variants of send_message and stream_message
+
+    Shares the credentials, response cache, context window trimming, request
+    coalescing, retry policy and per-model circuit breakers of OpenAIService; the
+    sync methods keep working (on the sync client). History trimming (token
+    counting) and response cache reads and writes (SQLite) run on the thread pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_client = None
+        self._async_client_loop = None
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        """The AsyncOpenAI client of the running event loop (on the shared async connection pool)"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            # Retries are done here (with the circuit breaker), not by the SDK
+            self._async_client = AsyncOpenAI(api_key=self.client.api_key, base_url=self.client.base_url,
+                                             http_client=get_async_openai_http_client(), max_retries=0)
+            self._async_client_loop = loop
+        return self._async_client
+
+    async def send_message_async(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                                 model: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None,
+                                 retry: bool = True) -> Dict[str, any]:
+        """
+        send_message without blocking the event loop (same arguments and result)
+
+        Raises:
+            UpstreamError: If the API call fails
+        """
+        model_to_use = model or self.model
+        messages, context_report = await run_in_threadpool(self._build_messages, message, conversation_history, model_to_use)
+
+        cache_key = None
+        if self.response_cache is not None and use_cache:
+            cache_key = make_cache_key(model_to_use, messages)
+            cached = await run_in_threadpool(self.response_cache.get, cache_key)
+            if cached is not None:
+                return self._cached_response(cached, model_to_use)
+
+        if self.coalescer is None or not use_cache:
+            result = await self._complete_async(messages, model_to_use, context_report, timeout, retry)
+        else:
+            result, shared = await self.coalescer.run_async(
+                cache_key or make_cache_key(model_to_use, messages),
+                lambda: self._complete_async(messages, model_to_use, context_report, timeout, retry)
+            )
+            if shared:
+                return self._cached_response(result, model_to_use, reused_as="coalesced")
+
+        if cache_key:
+            await run_in_threadpool(self.response_cache.set, cache_key, result)
+        return result
+
+    async def _complete_async(self, messages: List[Dict[str, str]], model_to_use: str, context_report: Optional[Dict[str, any]],
+                              timeout: Optional[float] = None, retry: bool = True) -> Dict[str, any]:
+        """Make one chat completion request (send_message_async result)"""
+        client = self._get_async_client()
+        options = {"timeout": timeout} if timeout else {}
+        try:
+            with metrics.openai_request_duration.time(model=model_to_use):
+                response = await call_with_retries_async(
+                    lambda: client.chat.completions.create(model=model_to_use, messages=messages, **options),
+                    self._breaker_for(model_to_use), self.retry_policy if retry else NO_RETRY, classify_openai_error
+                )
+        except UpstreamError:
+            raise
+        except Exception as e:
+            raise classify_openai_error(e) from e
+
+        usage = response.usage
+        usage_stats = {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+            "model": model_to_use
+        }
+        if context_report:
+            usage_stats["context"] = context_report
+        return {
+            "message": response.choices[0].message.content,
+            "usage": usage_stats
+        }
+
+    async def stream_message_async(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                                   model: Optional[str] = None, use_cache: bool = True, timeout: Optional[float] = None,
+                                   retry: bool = True) -> AsyncIterator[Dict[str, any]]:
+        """
+        stream_message without blocking the event loop (same arguments and items)
+
+        The upstream response is closed when the consumer stops early (client went away),
+        which frees its pooled connection.
+
+        Raises:
+            UpstreamError: If the API call fails. Only establishing the stream is retried.
+        """
+        model_to_use = model or self.model
+        messages, context_report = await run_in_threadpool(self._build_messages, message, conversation_history, model_to_use)
+
+        cache_key = None
+        if self.response_cache is not None and use_cache:
+            cache_key = make_cache_key(model_to_use, messages)
+            cached = await run_in_threadpool(self.response_cache.get, cache_key)
+            if cached is not None:
+                yield {"delta": cached["message"]}
+                yield self._cached_response(cached, model_to_use)
+                return
+
+        client = self._get_async_client()
+        options = {"timeout": timeout} if timeout else {}
+        start = time.perf_counter()
+        status = "error"
+        stream = None
+        try:
+            stream = await call_with_retries_async(
+                lambda: client.chat.completions.create(
+                    model=model_to_use,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **options
+                ),
+                self._breaker_for(model_to_use), self.retry_policy if retry else NO_RETRY, classify_openai_error
+            )
+
+            parts = []
+            usage = None
+            async for chunk in stream:
+                # The final chunk carries usage and has no choices
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.openai_time_to_first_token.observe(time.perf_counter() - start, model=model_to_use)
+                    parts.append(delta)
+                    yield {"delta": delta}
+            status = "ok"
+        except UpstreamError:
+            raise
+        except Exception as e:
+            error = classify_openai_error(e)
+            self._breaker_for(model_to_use).record_error(error)
+            raise error from e
+        finally:
+            if stream is not None:
+                await stream.close()
+            metrics.openai_request_duration.observe(time.perf_counter() - start, model=model_to_use, status=status)
+
+        usage_stats = {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+            "model": model_to_use
+        }
+        if context_report:
+            usage_stats["context"] = context_report
+        result = {
+            "message": "".join(parts),
+            "usage": usage_stats
+        }
+        if cache_key:
+            await run_in_threadpool(self.response_cache.set, cache_key, result)
+        yield result
@@ -0,0 +1,259 @@
+"""
+Attachment Retrieval
+Local BM25 search over chunks of large attachments, so only the parts relevant
+to the user's question are sent instead of the whole file
+Uses NumPy for scoring when it is installed, otherwise pure Python
+"""
+import os
+import re
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, List, Dict, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric terms"""
+    return _TOKEN.findall(text.lower())
+
+
+def _utf8_safe_cut(piece: bytes) -> int:
+    """Length of piece without a trailing, incomplete UTF-8 character"""
+    i = len(piece) - 1
+    while i > 0 and (piece[i] & 0xC0) == 0x80:
+        i -= 1
+    lead = piece[i]
+    char_length = 1 if lead < 0xC0 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+    return i if i > 0 and i + char_length > len(piece) else len(piece)
+
+
+def chunk_offsets(f, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Split a binary file into chunks of at most chunk_bytes, on line boundaries where possible
+
+    Lines longer than chunk_bytes are split without cutting a UTF-8 character.
+    Reads at most chunk_bytes at a time, so memory is bounded whatever the line lengths.
+
+    Returns:
+        List of (start, end) byte offsets
+    """
+    chunks = []
+    start = pos = 0
+    while True:
+        piece = f.readline(chunk_bytes)
+        if not piece:
+            break
+        if len(piece) == chunk_bytes and not piece.endswith(b'\n'):
+            cut = _utf8_safe_cut(piece)
+            if cut < len(piece):
+                f.seek(cut - len(piece), os.SEEK_CUR)
+                piece = piece[:cut]
+        if pos + len(piece) - start > chunk_bytes:
+            chunks.append((start, pos))
+            start = pos
+        pos += len(piece)
+    if pos > start:
+        chunks.append((start, pos))
+    return chunks
+
+
+class Bm25Index:
+    """BM25 index over the chunks of one attachment (chunk text stays on disk, only offsets are kept)"""
+
+    def __init__(self, path, chunk_bytes: int):
+        """
+        Build the index for a file
+
+        Args:
+            path: Attachment file
+            chunk_bytes: Target chunk size in bytes
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.chunks = chunk_offsets(f, chunk_bytes)
+
+            vocabulary = {}
+            post_terms, post_chunks, post_tf = [], [], []
+            lengths = []
+            for chunk_id, (start, end) in enumerate(self.chunks):
+                f.seek(start)
+                terms = Counter(tokenize(f.read(end - start).decode('utf-8', errors='replace')))
+                lengths.append(sum(terms.values()))
+                for term, tf in terms.items():
+                    post_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                    post_chunks.append(chunk_id)
+                    post_tf.append(tf)
+
+        self.vocabulary = vocabulary
+        n_chunks = len(self.chunks)
+        avg_length = (sum(lengths) / n_chunks) if n_chunks else 0.0
+        df = Counter(post_terms)
+        idf = {t: math.log(1 + (n_chunks - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+        # BM25 weight of each (term, chunk) posting doesn't depend on the query,
+        # so a query is scored by summing precomputed weights
+        weights = []
+        for t, c, tf in zip(post_terms, post_chunks, post_tf):
+            norm = 1 - BM25_B + BM25_B * (lengths[c] / avg_length if avg_length else 1.0)
+            weights.append(idf[t] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm))
+
+        if np is not None:
+            # Postings sorted by term; a term's postings are post_chunks[starts[t]:starts[t + 1]]
+            terms_arr = np.asarray(post_terms, dtype=np.int64)
+            order = np.argsort(terms_arr, kind='stable')
+            self._chunks_arr = np.asarray(post_chunks, dtype=np.int64)[order]
+            self._weights_arr = np.asarray(weights, dtype=np.float64)[order]
+            self._starts = np.concatenate(([0], np.cumsum(np.bincount(terms_arr, minlength=len(vocabulary)))))
+        else:
+            self._postings = {}
+            for t, c, w in zip(post_terms, post_chunks, weights):
+                self._postings.setdefault(t, []).append((c, w))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Get the k chunks that best match a query
+
+        Returns:
+            List of (chunk id, score), best first. Chunks that match no query term are left out.
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids or k <= 0:
+            return []
+
+        if np is not None:
+            ranges = [np.arange(self._starts[t], self._starts[t + 1]) for t in term_ids]
+            postings = np.concatenate(ranges)
+            scores = np.bincount(self._chunks_arr[postings], weights=self._weights_arr[postings], minlength=len(self.chunks))
+            matched = np.flatnonzero(scores > 0)
+            if len(matched) > k:
+                # Keep chunks scoring at least the k-th best (ties included), then sort
+                kth = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+                matched = matched[scores[matched] >= kth]
+            # Best score first, ties broken by position in the document
+            best = matched[np.lexsort((matched, -scores[matched]))][:k]
+            return [(int(c), float(scores[c])) for c in best]
+
+        scores = {}
+        for t in term_ids:
+            for c, w in self._postings[t]:
+                scores[c] = scores.get(c, 0.0) + w
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def read_chunk(self, f, chunk_id: int) -> str:
+        """Read a chunk's text from the open attachment file (binary mode)"""
+        start, end = self.chunks[chunk_id]
+        f.seek(start)
+        return f.read(end - start).decode('utf-8', errors='replace')
+
+
+class AttachmentRetriever:
+    """Selects the chunks of large attachments relevant to a question, with BM25 indexes cached by content hash"""
+
+    def __init__(self, store, min_bytes: Optional[int] = None, chunk_bytes: Optional[int] = None,
+                 top_k: Optional[int] = None, cache_size: Optional[int] = None):
+        """
+        Initialize attachment retriever
+
+        Args:
+            store: AttachmentStore the attachments are read from
+            min_bytes: Attachments at least this large are searched instead of inlined
+                (env ATTACHMENT_RETRIEVAL_MIN_BYTES, default 32KB)
+            chunk_bytes: Target chunk size (env ATTACHMENT_CHUNK_BYTES, default 2000)
+            top_k: Max chunks sent per attachment (env ATTACHMENT_TOP_K, default 8)
+            cache_size: Max indexes kept in memory (env ATTACHMENT_INDEX_CACHE_SIZE, default 64)
+        """
+        self.store = store
+        self.min_bytes = min_bytes or int(os.getenv('ATTACHMENT_RETRIEVAL_MIN_BYTES', str(32 * 1024)))
+        self.chunk_bytes = chunk_bytes or int(os.getenv('ATTACHMENT_CHUNK_BYTES', '2000'))
+        self.top_k = top_k or int(os.getenv('ATTACHMENT_TOP_K', '8'))
+        self.cache_size = cache_size or int(os.getenv('ATTACHMENT_INDEX_CACHE_SIZE', '64'))
+        self._indexes = OrderedDict()  # attachment id -> Bm25Index, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"searches": 0, "index_hits": 0, "index_builds": 0}
+
+    def should_search(self, attachment_id: str, query: str) -> bool:
+        """Check whether an attachment is large enough to search (and there is a question to search for)"""
+        size = self.store.get_size(attachment_id)
+        return bool(tokenize(query or '')) and size is not None and size >= self.min_bytes
+
+    def retrieve(self, attachment_id: str, query: str, max_chars: int) -> Dict[str, any]:
+        """
+        Get the chunks of an attachment most relevant to a query
+
+        Up to top_k chunks are selected by BM25 score while they fit in max_chars,
+        then returned in document order. If no chunk matches the query, the
+        leading chunks are used.
+
+        Returns:
+            {"text": excerpts joined with "[...]", "chars", "chunks": chunks sent, "total_chunks"}
+
+        Raises:
+            KeyError: If the attachment is not stored
+        """
+        index = self.get_index(attachment_id)
+        hits = [c for c, _ in index.search(query, self.top_k)]
+        if not hits:
+            hits = list(range(min(self.top_k, len(index.chunks))))
+
+        selected = []
+        used = 0
+        with open(index.path, 'rb') as f:
+            for chunk_id in hits:
+                text = index.read_chunk(f, chunk_id).strip()
+                if used + len(text) > max_chars:
+                    continue
+                selected.append((chunk_id, text))
+                used += len(text)
+
+        selected.sort()
+        text = "\n\n[...]\n\n".join(t for _, t in selected)
+        with self._lock:
+            self._stats["searches"] += 1
+        return {"text": text, "chars": len(text), "chunks": len(selected), "total_chunks": len(index.chunks)}
+
+    def get_index(self, attachment_id: str) -> Bm25Index:
+        """
+        Get the index for an attachment, building it on first use
+
+        Raises:
+            KeyError: If the attachment is not stored
+        """
+        with self._lock:
+            index = self._indexes.get(attachment_id)
+            if index is not None:
+                self._indexes.move_to_end(attachment_id)
+                self._stats["index_hits"] += 1
+                return index
+
+        if not self.store.exists(attachment_id):
+            raise KeyError(attachment_id)
+        # Built outside the lock; concurrent first requests for one file may both build it
+        index = Bm25Index(self.store.get_path(attachment_id), self.chunk_bytes)
+        with self._lock:
+            self._stats["index_builds"] += 1
+            self._indexes[attachment_id] = index
+            self._indexes.move_to_end(attachment_id)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get retrieval statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_indexes"] = len(self._indexes)
+        stats["numpy"] = np is not None
+        stats["min_bytes"] = self.min_bytes
+        stats["top_k"] = self.top_k
+        return stats
@@ -0,0 +1,290 @@
+"""
+Attachment Store
+Chat attachments stored on disk by content hash, so uploads are streamed
+instead of held in memory and each file is only inlined into the prompt
+up to a character budget
+"""
+import io
+import os
+import re
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, List, Dict, BinaryIO
+
+CHUNK_SIZE = 64 * 1024
+
+_ATTACHMENT_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+class AttachmentTooLarge(ValueError):
+    """Raised when an attachment is larger than the store's max_bytes"""
+
+
+class AttachmentStore:
+    """Content-addressed attachment files with a per-file size limit and age-based pruning"""
+
+    def __init__(self, base_dir: Optional[str] = None, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize attachment store
+
+        Args:
+            base_dir: Directory for attachment files (env ATTACHMENT_DIR, default <tmp>/al-chat-attachments)
+            max_bytes: Max size of one attachment (env ATTACHMENT_MAX_BYTES, default 20MB)
+            ttl: Seconds an attachment is kept after its last upload (env ATTACHMENT_TTL, default 86400)
+        """
+        base_dir = base_dir or os.getenv('ATTACHMENT_DIR') or os.path.join(tempfile.gettempdir(), 'al-chat-attachments')
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or int(os.getenv('ATTACHMENT_MAX_BYTES', str(20 * 1024 * 1024)))
+        self.ttl = ttl or float(os.getenv('ATTACHMENT_TTL', '86400'))
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduplicated": 0, "rejected": 0, "pruned": 0}
+        self._puts = 0
+
+    def put(self, stream: BinaryIO, name: Optional[str] = None) -> Dict[str, any]:
+        """
+        Store an attachment, reading the stream in chunks
+
+        Args:
+            stream: Binary file-like object (e.g. an uploaded file's stream)
+            name: File name reported back to the caller
+
+        Returns:
+            {"id": content hash, "name": name, "size": bytes}
+
+        Raises:
+            AttachmentTooLarge: If the stream is longer than max_bytes (nothing is stored)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.base_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        with self._lock:
+                            self._stats["rejected"] += 1
+                        raise AttachmentTooLarge(f"Attachment {name or 'file'} is larger than {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            attachment_id = digest.hexdigest()
+            path = self._path(attachment_id)
+            if path.exists():
+                # Same content uploaded before - keep the existing file, refresh its age
+                os.remove(tmp_path)
+                os.utime(path)
+                stat = "deduplicated"
+            else:
+                os.replace(tmp_path, path)
+                stat = "stored"
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._stats[stat] += 1
+            self._puts += 1
+            prune = self._puts % 100 == 0
+        # Prune old attachments every so often rather than on each upload
+        if prune:
+            self.prune()
+        return {"id": attachment_id, "name": name or "file", "size": size}
+
+    def put_bytes(self, data: bytes, name: Optional[str] = None) -> Dict[str, any]:
+        """Store an attachment held in memory (see put)"""
+        return self.put(io.BytesIO(data), name)
+
+    def exists(self, attachment_id: str) -> bool:
+        """Check whether an attachment is stored"""
+        return self._is_valid_id(attachment_id) and self._path(attachment_id).exists()
+
+    def get_size(self, attachment_id: str) -> Optional[int]:
+        """Get an attachment's size in bytes, or None if it is not stored"""
+        if not self._is_valid_id(attachment_id):
+            return None
+        try:
+            return self._path(attachment_id).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def get_path(self, attachment_id: str) -> Path:
+        """
+        Get the file an attachment is stored in
+
+        Raises:
+            KeyError: If the attachment is not stored
+        """
+        if not self.exists(attachment_id):
+            raise KeyError(attachment_id)
+        return self._path(attachment_id)
+
+    def open_text(self, attachment_id: str):
+        """
+        Open an attachment as UTF-8 text (undecodable bytes are replaced)
+
+        Raises:
+            KeyError: If the attachment is not stored
+        """
+        if not self.exists(attachment_id):
+            raise KeyError(attachment_id)
+        return open(self._path(attachment_id), 'r', encoding='utf-8', errors='replace')
+
+    def read_text(self, attachment_id: str, max_chars: int):
+        """
+        Read at most max_chars characters of an attachment (memory bounded by max_chars)
+
+        Returns:
+            Tuple of (text, truncated)
+
+        Raises:
+            KeyError: If the attachment is not stored
+        """
+        with self.open_text(attachment_id) as f:
+            text = f.read(max_chars)
+            truncated = bool(f.read(1))
+        return text, truncated
+
+    def prune(self, max_age: Optional[float] = None) -> int:
+        """
+        Delete attachments not uploaded for max_age seconds (default ttl)
+
+        Returns:
+            Number of attachments deleted
+        """
+        cutoff = time.time() - (max_age if max_age is not None else self.ttl)
+        removed = 0
+        for path in self.base_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    if path.suffix != '.part':
+                        removed += 1
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            self._stats["pruned"] += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get store statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl"] = self.ttl
+        return stats
+
+    def _path(self, attachment_id: str) -> Path:
+        return self.base_dir / attachment_id
+
+    @staticmethod
+    def _is_valid_id(attachment_id) -> bool:
+        return isinstance(attachment_id, str) and bool(_ATTACHMENT_ID.match(attachment_id))
+
+
+def build_attachment_message(attachments: List[Dict[str, any]], message: str, store: Optional[AttachmentStore] = None,
+                             max_chars: Optional[int] = None, retriever=None) -> Dict[str, any]:
+    """
+    Build the prompt for a message with attached files
+
+    Each attachment is either {"name", "content"} (sent inline) or {"name", "id"}
+    (stored in the attachment store). Attachments share a budget of max_chars
+    characters (env ATTACHMENT_PROMPT_MAX_CHARS, default 400000); each gets an
+    equal share of what is left, and stored ones are read from disk only up
+    to their share, so memory stays bounded whatever the file sizes.
+
+    With a retriever (see AttachmentRetriever), attachments of at least its
+    min_bytes are searched for the message and only the most relevant chunks
+    are sent. Large inline attachments are put in the retriever's store first,
+    so their index is cached by content hash like uploaded ones.
+
+    Args:
+        attachments: Attached files, in order
+        message: The user's message (a default asking to analyze the files is used if empty)
+        store: Attachment store for attachments given by id
+        max_chars: Character budget for all attachment content
+        retriever: Optional AttachmentRetriever for large attachments
+
+    Returns:
+        {"message": prompt text, "attachments": [{"name", "size", "chars", "truncated"}, ...]}.
+        Stored attachments also report their "id"; searched ones also report
+        "chunks" (sent) and "total_chunks".
+
+    Raises:
+        KeyError: If an attachment id is not in the store
+    """
+    if max_chars is None:
+        max_chars = int(os.getenv('ATTACHMENT_PROMPT_MAX_CHARS', '400000'))
+
+    parts = []
+    report = []
+    remaining = max_chars
+    for i, attachment in enumerate(attachments):
+        name = attachment.get('name') or 'file'
+        share = remaining // (len(attachments) - i)
+        attachment_id = attachment.get('id')
+        content = attachment.get('content') or ''
+        if retriever is not None and not attachment_id and len(content) >= retriever.min_bytes:
+            attachment_id = retriever.store.put_bytes(content.encode('utf-8'), name)["id"]
+
+        if retriever is not None and attachment_id and retriever.should_search(attachment_id, message):
+            retrieved = retriever.retrieve(attachment_id, message, share)
+            remaining -= retrieved["chars"]
+            truncated = retrieved["chunks"] < retrieved["total_chunks"]
+            parts.append(f"[Attached file {i+1}: {name}] "
+                         f"({retrieved['chunks']} most relevant of {retrieved['total_chunks']} excerpts)\n\n{retrieved['text']}")
+            report.append({"name": name, "id": attachment_id, "size": retriever.store.get_size(attachment_id),
+                           "chars": retrieved["chars"], "truncated": truncated,
+                           "chunks": retrieved["chunks"], "total_chunks": retrieved["total_chunks"]})
+            continue
+
+        if attachment.get('id'):
+            if store is None:
+                raise KeyError(attachment['id'])
+            text, truncated = store.read_text(attachment['id'], share)
+            size = store.get_size(attachment['id'])
+        else:
+            text, truncated = content[:share], len(content) > share
+            size = len(content)
+        remaining -= len(text)
+
+        header = f"[Attached file {i+1}: {name}]"
+        if truncated:
+            header += f" (truncated to the first {len(text)} characters)"
+        parts.append(f"{header}\n\n{text}")
+        entry = {"name": name, "size": size, "chars": len(text), "truncated": truncated}
+        if attachment.get('id'):
+            entry["id"] = attachment['id']
+        report.append(entry)
+
+    default_msg = 'Please compare and analyze the attached files.' if len(attachments) > 1 else 'Please analyze the attached file.'
+    parts.append(message or default_msg)
+    return {"message": "\n\n---\n\n".join(parts), "attachments": report}
+
+
+def attachment_reference(message: str, attachments: List[Dict[str, any]]) -> str:
+    """
+    Text saved in a conversation in place of a message's inlined attachments
+
+    Only the turn that attaches files sends their content; later turns keep
+    the user's message and a line naming the files (with their ids, which can
+    be sent again in attached_files to bring a stored file back).
+
+    Args:
+        message: The user's message
+        attachments: Attachment report from build_attachment_message
+
+    Returns:
+        The message followed by the attachment reference line
+    """
+    names = ", ".join(f"{a['name']} (id {a['id']})" if a.get('id') else a['name'] for a in attachments)
+    label = "Attached files" if len(attachments) > 1 else "Attached file"
+    return f"{message}\n\n[{label}: {names}]" if message else f"[{label}: {names}]"
@@ -0,0 +1,108 @@
+"""
+Context Window Manager
+Trims conversation history to a per-model token budget before it is sent to OpenAI
+"""
+import os
+import json
+from typing import Optional, List, Dict, Tuple
+from service.token_counter import count_message_tokens
+
+# Context window sizes (tokens) per model family. Longest matching prefix wins.
+DEFAULT_CONTEXT_BUDGETS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4-0125-preview": 128000,
+    "gpt-4-1106-preview": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+
+
+class ContextWindowManager:
+    """Keeps system messages and the most recent turns that fit in the model's budget"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, default_budget: Optional[int] = None,
+                 reserve_tokens: Optional[int] = None):
+        """
+        Initialize context window manager
+
+        Args:
+            budgets: Model -> prompt token budget overrides (env CONTEXT_BUDGETS, JSON object,
+                e.g. '{"gpt-4": 6000}'). Merged over DEFAULT_CONTEXT_BUDGETS.
+            default_budget: Budget for models not listed (env CONTEXT_DEFAULT_BUDGET, default 8192)
+            reserve_tokens: Tokens kept free for the completion (env CONTEXT_RESERVE_TOKENS, default 1024)
+        """
+        self.budgets = dict(DEFAULT_CONTEXT_BUDGETS)
+        if budgets is None and os.getenv('CONTEXT_BUDGETS'):
+            budgets = json.loads(os.getenv('CONTEXT_BUDGETS'))
+        self.budgets.update(budgets or {})
+        self.default_budget = default_budget or int(os.getenv('CONTEXT_DEFAULT_BUDGET', '8192'))
+        self.reserve_tokens = reserve_tokens if reserve_tokens is not None else int(os.getenv('CONTEXT_RESERVE_TOKENS', '1024'))
+
+    def get_budget(self, model: str) -> int:
+        """Get the prompt token budget for a model (context window minus reserved completion tokens)"""
+        window = self.default_budget
+        matches = [name for name in self.budgets if model == name or model.startswith(name + "-")]
+        if matches:
+            window = self.budgets[max(matches, key=len)]
+        return max(window - self.reserve_tokens, 0)
+
+    def fit(self, messages: List[Dict[str, str]], model: str) -> Tuple[List[Dict[str, str]], Dict[str, any]]:
+        """
+        Trim messages to the model's budget
+
+        System messages and the last message (the new user turn) are always kept.
+        Earlier turns are kept newest-first while they fit; older ones are dropped.
+
+        Args:
+            messages: Full message list (history + new user message)
+            model: Model the messages will be sent to
+
+        Returns:
+            Tuple of (messages to send, report dict with budget, prompt_tokens_estimate,
+            dropped_messages and dropped_tokens)
+        """
+        budget = self.get_budget(model)
+        counts = [count_message_tokens(m, model) for m in messages]
+        total = sum(counts)
+
+        if total <= budget or len(messages) <= 1:
+            return messages, {
+                "budget": budget,
+                "prompt_tokens_estimate": total,
+                "dropped_messages": 0,
+                "dropped_tokens": 0
+            }
+
+        last = len(messages) - 1
+        keep = [False] * len(messages)
+        keep[last] = True
+        used = counts[last]
+        for i, message in enumerate(messages):
+            if message.get("role") == "system":
+                keep[i] = True
+                used += counts[i]
+
+        # Walk back from the newest turn, stop at the first turn that doesn't fit
+        # so the kept history stays contiguous
+        for i in range(last - 1, -1, -1):
+            if keep[i]:
+                continue
+            if used + counts[i] > budget:
+                break
+            keep[i] = True
+            used += counts[i]
+
+        fitted = [m for m, kept in zip(messages, keep) if kept]
+        dropped_tokens = total - used
+        report = {
+            "budget": budget,
+            "prompt_tokens_estimate": used,
+            "dropped_messages": len(messages) - len(fitted),
+            "dropped_tokens": dropped_tokens
+        }
+        if used > budget:
+            report["over_budget"] = True
+        return fitted, report
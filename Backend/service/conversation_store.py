@@ -0,0 +1,178 @@
+"""
+Conversation Store
+Server-side conversation history keyed by conversation ID, so clients only
+send the new turn instead of the whole history on every request
+"""
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict
+from service.token_counter import count_message_tokens
+
+
+class ConversationStore:
+    """In-memory conversation histories with token counts, memory bounds and idle eviction"""
+
+    def __init__(self, max_conversations: Optional[int] = None, max_messages: Optional[int] = None,
+                 max_total_tokens: Optional[int] = None, idle_ttl: Optional[float] = None):
+        """
+        Initialize conversation store
+
+        Args:
+            max_conversations: Max conversations kept (env CONVERSATION_MAX_CONVERSATIONS, default 10000)
+            max_messages: Max messages kept per conversation, oldest dropped first
+                (env CONVERSATION_MAX_MESSAGES, default 200)
+            max_total_tokens: Max tokens kept across all conversations
+                (env CONVERSATION_MAX_TOTAL_TOKENS, default 20000000)
+            idle_ttl: Seconds of inactivity before a conversation is evicted
+                (env CONVERSATION_IDLE_TTL, default 3600)
+        """
+        self.max_conversations = max_conversations or int(os.getenv('CONVERSATION_MAX_CONVERSATIONS', '10000'))
+        self.max_messages = max_messages or int(os.getenv('CONVERSATION_MAX_MESSAGES', '200'))
+        self.max_total_tokens = max_total_tokens or int(os.getenv('CONVERSATION_MAX_TOTAL_TOKENS', '20000000'))
+        self.idle_ttl = idle_ttl or float(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+        # Ordered by last activity, least recently used first
+        self._conversations = OrderedDict()
+        self._total_tokens = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def create(self, conversation_id: Optional[str] = None) -> str:
+        """
+        Create an empty conversation
+
+        Args:
+            conversation_id: ID to use. If None, a random ID is generated.
+
+        Returns:
+            The conversation ID
+        """
+        conversation_id = conversation_id or uuid.uuid4().hex
+        with self._lock:
+            self._evict_idle()
+            if conversation_id not in self._conversations:
+                self._conversations[conversation_id] = {
+                    "messages": [],
+                    "tokens": 0,
+                    "created_at": time.time(),
+                    "last_active": time.monotonic()
+                }
+                self._evict_over_limits()
+        return conversation_id
+
+    def get_history(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Get the messages of a conversation in OpenAI format
+
+        Returns:
+            List of {"role", "content"} dicts, or None if the conversation is unknown or was evicted
+        """
+        with self._lock:
+            self._evict_idle()
+            conversation = self._touch(conversation_id)
+            if conversation is None:
+                return None
+            return [{"role": m["role"], "content": m["content"]} for m in conversation["messages"]]
+
+    def get_info(self, conversation_id: str) -> Optional[Dict[str, any]]:
+        """Get message count and token count of a conversation"""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            return {
+                "conversation_id": conversation_id,
+                "message_count": len(conversation["messages"]),
+                "tokens": conversation["tokens"],
+                "created_at": conversation["created_at"]
+            }
+
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        """
+        Append messages to a conversation (creating it if needed)
+
+        Args:
+            conversation_id: Conversation ID
+            messages: Messages in {"role", "content"} format
+        """
+        self.create(conversation_id)
+        with self._lock:
+            conversation = self._touch(conversation_id)
+            if conversation is None:
+                return
+            for message in messages:
+                entry = {
+                    "role": message.get("role", "user"),
+                    "content": message.get("content") or "",
+                }
+                entry["tokens"] = message.get("tokens") or count_message_tokens(entry)
+                conversation["messages"].append(entry)
+                conversation["tokens"] += entry["tokens"]
+                self._total_tokens += entry["tokens"]
+
+            # Drop the oldest messages beyond the per-conversation limit
+            overflow = len(conversation["messages"]) - self.max_messages
+            if overflow > 0:
+                dropped = conversation["messages"][:overflow]
+                del conversation["messages"][:overflow]
+                dropped_tokens = sum(m["tokens"] for m in dropped)
+                conversation["tokens"] -= dropped_tokens
+                self._total_tokens -= dropped_tokens
+
+            self._evict_over_limits()
+
+    def replace(self, conversation_id: str, messages: List[Dict[str, str]]):
+        """Replace the history of a conversation (e.g. when the client sends a full history)"""
+        self.delete(conversation_id)
+        self.append(conversation_id, messages)
+
+    def delete(self, conversation_id: str) -> bool:
+        """Delete a conversation. Returns True if it existed."""
+        with self._lock:
+            conversation = self._conversations.pop(conversation_id, None)
+            if conversation is None:
+                return False
+            self._total_tokens -= conversation["tokens"]
+            return True
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get store statistics"""
+        with self._lock:
+            return {
+                "conversations": len(self._conversations),
+                "total_tokens": self._total_tokens,
+                "evictions": self._evictions,
+                "max_conversations": self.max_conversations,
+                "max_total_tokens": self.max_total_tokens,
+                "idle_ttl": self.idle_ttl
+            }
+
+    def _touch(self, conversation_id: str) -> Optional[Dict[str, any]]:
+        """Mark a conversation as active (caller holds the lock)"""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None:
+            conversation["last_active"] = time.monotonic()
+            self._conversations.move_to_end(conversation_id)
+        return conversation
+
+    def _evict_idle(self):
+        """Evict conversations idle longer than idle_ttl (caller holds the lock)"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._conversations:
+            conversation = next(iter(self._conversations.values()))
+            if conversation["last_active"] > cutoff:
+                break
+            self._remove_oldest()
+
+    def _evict_over_limits(self):
+        """Evict least recently used conversations until within bounds (caller holds the lock)"""
+        while len(self._conversations) > self.max_conversations or (
+                self._total_tokens > self.max_total_tokens and len(self._conversations) > 1):
+            self._remove_oldest()
+
+    def _remove_oldest(self):
+        _, conversation = self._conversations.popitem(last=False)
+        self._total_tokens -= conversation["tokens"]
+        self._evictions += 1
@@ -0,0 +1,198 @@
+"""
+HTTP Clients
+Process-wide pooled HTTP clients for outbound calls (Papita API, OpenAI API)
+Clients keep TCP/TLS connections alive between requests instead of
+doing a new handshake per call
+"""
+import os
+import asyncio
+import threading
+from typing import Optional, Dict, List
+import httpx
+from openai import DefaultHttpxClient, DefaultAsyncHttpxClient, Timeout as OpenAITimeout
+
+_clients = {}
+# Async clients by (name, event loop) - connections belong to the loop they were opened on
+_async_clients = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _pool_limits(max_connections: Optional[int] = None) -> httpx.Limits:
+    """Connection pool limits (env HTTP_POOL_MAX_CONNECTIONS, HTTP_POOL_MAX_KEEPALIVE, HTTP_POOL_KEEPALIVE_EXPIRY)"""
+    return httpx.Limits(
+        max_connections=max_connections or int(os.getenv('HTTP_POOL_MAX_CONNECTIONS', '100')),
+        max_keepalive_connections=int(os.getenv('HTTP_POOL_MAX_KEEPALIVE', '20')),
+        keepalive_expiry=float(os.getenv('HTTP_POOL_KEEPALIVE_EXPIRY', '30'))
+    )
+
+
+def _event_hooks(name: str, is_async: bool = False) -> Dict[str, List]:
+    """Event hooks that count requests and responses per client (coroutines for async clients)"""
+    stats = _stats.setdefault(name, {"requests": 0, "responses": 0, "errors": 0})
+
+    def on_request(request):
+        stats["requests"] += 1
+
+    def on_response(response):
+        stats["responses"] += 1
+        if response.status_code >= 500:
+            stats["errors"] += 1
+
+    if not is_async:
+        return {"request": [on_request], "response": [on_response]}
+
+    async def on_request_async(request):
+        on_request(request)
+
+    async def on_response_async(response):
+        on_response(response)
+
+    return {"request": [on_request_async], "response": [on_response_async]}
+
+
+def _get_or_create(name: str, factory):
+    """Return the named client, creating it on first use"""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_papita_client() -> httpx.Client:
+    """
+    Get the shared client for Papita API calls
+
+    Timeout defaults to PAPITA_HTTP_TIMEOUT (default 5s); callers can pass a shorter
+    per-request timeout (e.g. credential lookups).
+    """
+    return _get_or_create("papita", lambda: httpx.Client(
+        limits=_pool_limits(),
+        timeout=httpx.Timeout(float(os.getenv('PAPITA_HTTP_TIMEOUT', '5.0')), connect=2.0),
+        event_hooks=_event_hooks("papita")
+    ))
+
+
+def get_openai_http_client():
+    """
+    Get the shared client used by the OpenAI SDK
+
+    Timeout defaults to OPENAI_HTTP_TIMEOUT (default 120s) since completions can take a while.
+    It is the SDK's own Timeout type, which isn't httpx.Timeout in every SDK version.
+    """
+    return _get_or_create("openai", lambda: DefaultHttpxClient(
+        limits=_pool_limits(),
+        timeout=OpenAITimeout(float(os.getenv('OPENAI_HTTP_TIMEOUT', '120')), connect=5.0),
+        event_hooks=_event_hooks("openai")
+    ))
+
+
+def get_async_openai_http_client():
+    """
+    Get the shared async client used by the async OpenAI SDK client (see AsyncOpenAIService)
+
+    Must be called on an event loop. Connections belong to the loop they were opened
+    on, so each loop gets its own client; aclose_async() closes it before the loop ends
+    (the ASGI app does at shutdown). Clients of loops that ended without it are dropped
+    when the next client is created.
+    Since one process serves many concurrent streams on it, its pool size is set
+    separately (env HTTP_ASYNC_POOL_MAX_CONNECTIONS, default 1000).
+    """
+    key = ("openai_async", asyncio.get_running_loop())
+    client = _async_clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        _drop_closed_loop_clients()
+        if key not in _async_clients:
+            _async_clients[key] = DefaultAsyncHttpxClient(
+                limits=_pool_limits(int(os.getenv('HTTP_ASYNC_POOL_MAX_CONNECTIONS', '1000'))),
+                timeout=OpenAITimeout(float(os.getenv('OPENAI_HTTP_TIMEOUT', '120')), connect=5.0),
+                event_hooks=_event_hooks("openai_async", is_async=True)
+            )
+        return _async_clients[key]
+
+
+def _drop_closed_loop_clients():
+    """
+    Forget the async clients of closed event loops (call with _lock held)
+
+    A closed loop can't run their aclose() any more; their sockets are closed when
+    the clients are garbage collected, which this registry no longer prevents.
+    """
+    for key in [key for key in _async_clients if key[1].is_closed()]:
+        del _async_clients[key]
+
+
+def warm_up(papita_api_url: Optional[str] = None, openai_base_url: Optional[str] = None) -> Dict[str, any]:
+    """
+    Open connections ahead of the first real request
+
+    Args:
+        papita_api_url: Papita API base URL (warm-up uses /api/health)
+        openai_base_url: OpenAI API base URL (default https://api.openai.com/v1)
+
+    Returns:
+        Dict of target -> "ok" or error message
+    """
+    results = {}
+    targets = []
+    if papita_api_url:
+        targets.append(("papita", get_papita_client(), f"{papita_api_url}/api/health"))
+    openai_base_url = openai_base_url or os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+    # Any response (even 401/404) means the TCP/TLS connection is established and pooled
+    targets.append(("openai", get_openai_http_client(), f"{openai_base_url.rstrip('/')}/models"))
+
+    for name, client, url in targets:
+        try:
+            client.get(url, timeout=2.0)
+            results[name] = "ok"
+        except Exception as e:
+            results[name] = str(e)
+    return results
+
+
+def get_pool_stats() -> Dict[str, any]:
+    """Get request counts and connection pool state for each client"""
+    stats = {}
+    clients = {**_clients, **{name: client for (name, _), client in list(_async_clients.items())}}
+    for name, client in clients.items():
+        client_stats = dict(_stats.get(name, {}))
+        # httpx doesn't expose pool state publicly - read it from the transport if available
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            connections = list(connections)
+            idle = sum(1 for c in connections if c.is_idle())
+            client_stats["connections"] = len(connections)
+            client_stats["idle_connections"] = idle
+            client_stats["active_connections"] = len(connections) - idle
+        stats[name] = client_stats
+    return {
+        "clients": stats,
+        "limits": {
+            "max_connections": int(os.getenv('HTTP_POOL_MAX_CONNECTIONS', '100')),
+            "max_keepalive_connections": int(os.getenv('HTTP_POOL_MAX_KEEPALIVE', '20')),
+            "keepalive_expiry": float(os.getenv('HTTP_POOL_KEEPALIVE_EXPIRY', '30'))
+        }
+    }
+
+
+def close_all():
+    """Close all shared sync clients (they are recreated on next use). Async clients are closed by aclose_async()."""
+    with _lock:
+        for name in list(_clients):
+            _clients.pop(name).close()
+
+
+async def aclose_async():
+    """Close the async clients of the running event loop (e.g. at ASGI server shutdown)"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        keys = [key for key in _async_clients if key[1] is loop]
+        clients = [_async_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.aclose()
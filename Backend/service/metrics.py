@@ -0,0 +1,150 @@
+"""
+Metrics
+In-process request counters and latency histograms, rendered in the
+Prometheus text exposition format (no external service needed)
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+# Latency buckets in seconds (upper bounds). Covers fast local work up to long completions.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets and optional labels"""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a block; adds status="error" when it raises"""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, status=status, **labels)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._values.items()]
+        for labels, bucket_counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Holds named metrics and renders them together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, documentation, buckets or DEFAULT_BUCKETS))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+# Process-wide registry and the metrics the backend records
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "alchat_http_requests_total", "HTTP requests handled, by endpoint and status code")
+http_request_duration = registry.histogram(
+    "alchat_http_request_duration_seconds", "HTTP request handling time, by endpoint")
+openai_request_duration = registry.histogram(
+    "alchat_openai_request_duration_seconds", "OpenAI chat completion call time, by model")
+openai_time_to_first_token = registry.histogram(
+    "alchat_openai_time_to_first_token_seconds", "Time until the first streamed token from OpenAI, by model")
+papita_usage_log_duration = registry.histogram(
+    "alchat_papita_usage_log_duration_seconds", "Papita usage log delivery time per record")
+credential_fetch_duration = registry.histogram(
+    "alchat_credential_fetch_duration_seconds", "Papita credential fetch time")
+session_log_write_duration = registry.histogram(
+    "alchat_session_log_write_duration_seconds", "Session log batch write time")
+upstream_retries_total = registry.counter(
+    "alchat_upstream_retries_total", "Retried upstream calls, by dependency and error type")
+admission_rejections_total = registry.counter(
+    "alchat_admission_rejections_total", "Chat requests rejected by local rate limits, by limit scope and unit")
+
+
+def render() -> str:
+    """Render all backend metrics"""
+    return registry.render()
@@ -0,0 +1,323 @@
+"""
+Model Router
+Picks the model for a chat request from configurable rules (prompt size,
+attachments, user tier), tracks EWMA latency and error rate per model, and
+fails over to fallback models while a model is slow or erroring
+"""
+import os
+import json
+import time
+import threading
+from typing import Optional, List, Dict, Iterator, AsyncIterator, Tuple
+from service.resilience import UpstreamError, CircuitOpenError
+
+
+class ModelHealth:
+    """Exponentially weighted latency and error rate of one model"""
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.errors = 0
+        self.last_sample = 0.0
+        self.last_probe = 0.0
+
+    def record(self, alpha: float, latency: Optional[float], error: bool):
+        self.error_rate = alpha * (1.0 if error else 0.0) + (1 - alpha) * self.error_rate
+        if latency is not None:
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+        self.samples += 1
+        self.errors += int(error)
+        self.last_sample = time.monotonic()
+
+
+class ModelRouter:
+    """
+    Chooses candidate models for a request and sends it to the first one that works
+
+    Routing: a model in the request is used as-is. Otherwise the first rule that
+    matches picks the model, else the default model. Rules are objects with a
+    "model" and any of the conditions "min_prompt_tokens", "max_prompt_tokens",
+    "attachments" (true/false) and "tier" ("guest" or "user", or a list), e.g.
+    [{"max_prompt_tokens": 500, "model": "gpt-4o-mini"}, {"attachments": true, "model": "gpt-4o"}].
+
+    Failover: the chosen model is followed by its fallbacks. Models whose EWMA
+    latency is over slow_seconds or whose error rate is over max_error_rate are
+    tried last, until probe_interval passes without a sample; then one request
+    probes them so they can recover. Attempts that have a fallback after them
+    are not retried (and time out after attempt_timeout, if set, instead of the
+    normal request timeout); a rate limit, timeout or 5xx moves on to the next model.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, any]]] = None, fallbacks: Optional[Dict[str, List[str]]] = None,
+                 slow_seconds: Optional[float] = None, max_error_rate: Optional[float] = None,
+                 alpha: Optional[float] = None, probe_interval: Optional[float] = None,
+                 attempt_timeout: Optional[float] = None):
+        """
+        Initialize model router
+
+        Args:
+            rules: Routing rules (env MODEL_ROUTES, JSON list; default none)
+            fallbacks: Model -> fallback models in order (env MODEL_FALLBACKS, JSON object,
+                e.g. '{"gpt-4o": ["gpt-4o-mini"]}'). Longest matching prefix wins.
+            slow_seconds: EWMA latency over which a model is degraded (env MODEL_ROUTER_SLOW_SECONDS, default 15)
+            max_error_rate: EWMA error rate over which a model is degraded (env MODEL_ROUTER_MAX_ERROR_RATE, default 0.5)
+            alpha: EWMA weight of each new sample (env MODEL_ROUTER_EWMA_ALPHA, default 0.2)
+            probe_interval: Seconds between probe requests to a degraded model (env MODEL_ROUTER_PROBE_INTERVAL, default 30)
+            attempt_timeout: Timeout of attempts that can fail over (env MODEL_ROUTER_ATTEMPT_TIMEOUT; default
+                none, i.e. the normal request timeout, so slow but healthy completions aren't cut off)
+        """
+        if rules is None:
+            rules = json.loads(os.getenv('MODEL_ROUTES', '[]'))
+        if fallbacks is None:
+            fallbacks = json.loads(os.getenv('MODEL_FALLBACKS', '{}'))
+        self.rules = rules
+        self.fallbacks = fallbacks
+        self.slow_seconds = slow_seconds or float(os.getenv('MODEL_ROUTER_SLOW_SECONDS', '15'))
+        self.max_error_rate = max_error_rate or float(os.getenv('MODEL_ROUTER_MAX_ERROR_RATE', '0.5'))
+        self.alpha = alpha or float(os.getenv('MODEL_ROUTER_EWMA_ALPHA', '0.2'))
+        self.probe_interval = probe_interval if probe_interval is not None else float(os.getenv('MODEL_ROUTER_PROBE_INTERVAL', '30'))
+        if attempt_timeout is None and os.getenv('MODEL_ROUTER_ATTEMPT_TIMEOUT'):
+            attempt_timeout = float(os.getenv('MODEL_ROUTER_ATTEMPT_TIMEOUT'))
+        self.attempt_timeout = attempt_timeout or None
+        self._health = {}
+        self._lock = threading.Lock()
+        self._stats = {"routed": 0, "failovers": 0, "skipped_degraded": 0}
+
+    def _match(self, rule: Dict[str, any], prompt_tokens: int, has_attachments: bool, tier: str) -> bool:
+        if prompt_tokens < rule.get("min_prompt_tokens", 0):
+            return False
+        if "max_prompt_tokens" in rule and prompt_tokens > rule["max_prompt_tokens"]:
+            return False
+        if "attachments" in rule and rule["attachments"] != has_attachments:
+            return False
+        if "tier" in rule:
+            tiers = rule["tier"] if isinstance(rule["tier"], list) else [rule["tier"]]
+            if tier not in tiers:
+                return False
+        return True
+
+    def _get_fallbacks(self, model: str) -> List[str]:
+        matches = [name for name in self.fallbacks if model == name or model.startswith(name + "-")]
+        return list(self.fallbacks[max(matches, key=len)]) if matches else []
+
+    def _is_degraded(self, health: Optional[ModelHealth]) -> bool:
+        if health is None:
+            return False
+        return health.error_rate > self.max_error_rate or (health.latency or 0.0) > self.slow_seconds
+
+    def route(self, default_model: str, requested_model: Optional[str] = None, prompt_tokens: int = 0,
+              has_attachments: bool = False, tier: str = "user") -> Tuple[List[str], str]:
+        """
+        Choose the models to try for a request
+
+        Args:
+            default_model: Model used when no rule matches
+            requested_model: Model set in the request, if any
+            prompt_tokens: Estimated prompt tokens
+            has_attachments: Whether the request has attachments
+            tier: "guest" or "user"
+
+        Returns:
+            Tuple of (models in the order to try, routing reason)
+        """
+        if requested_model:
+            model, reason = requested_model, "requested"
+        else:
+            model, reason = default_model, "default"
+            for index, rule in enumerate(self.rules):
+                if self._match(rule, prompt_tokens, has_attachments, tier):
+                    model, reason = rule["model"], f"rule {index}"
+                    break
+
+        candidates = [model] + [m for m in self._get_fallbacks(model) if m != model]
+        if len(candidates) == 1:
+            return candidates, reason
+
+        # Degraded models go last, unless it's time to probe them
+        now = time.monotonic()
+        healthy, degraded = [], []
+        with self._lock:
+            for candidate in candidates:
+                health = self._health.get(candidate)
+                if self._is_degraded(health) and now - max(health.last_sample, health.last_probe) < self.probe_interval:
+                    degraded.append(candidate)
+                    continue
+                if self._is_degraded(health):
+                    health.last_probe = now
+                healthy.append(candidate)
+            if healthy and candidates[0] in degraded:
+                self._stats["skipped_degraded"] += 1
+        return healthy + degraded, reason
+
+    def record(self, model: str, latency: Optional[float] = None, error: bool = False):
+        """Record the latency (successful calls) or an error of a model"""
+        with self._lock:
+            health = self._health.get(model)
+            if health is None:
+                health = self._health[model] = ModelHealth()
+            health.record(self.alpha, latency, error)
+
+    def _attempt_options(self, index: int, candidates: List[str]) -> Dict[str, any]:
+        """send_message/stream_message options: attempts with a fallback after them aren't retried (and may time out sooner)"""
+        if index == len(candidates) - 1:
+            return {}
+        if self.attempt_timeout:
+            return {"timeout": self.attempt_timeout, "retry": False}
+        return {"retry": False}
+
+    def _should_fail_over(self, error: Exception, index: int, candidates: List[str]) -> bool:
+        """Move on to the next model for model-specific failures (rate limit, timeout, 5xx, or the model's circuit is open)"""
+        model_failed = isinstance(error, UpstreamError) and (error.trips_circuit or isinstance(error, CircuitOpenError))
+        return model_failed and index < len(candidates) - 1
+
+    def _route_report(self, result: Dict[str, any], reason: str, failed: List[str]):
+        result.setdefault("usage", {})["route"] = {"reason": reason, **({"failed_over_from": failed} if failed else {})}
+
+    def send_message(self, openai_service, message: str, conversation_history: Optional[List[Dict[str, str]]],
+                     candidates: List[str], reason: str, use_cache: bool = True) -> Dict[str, any]:
+        """
+        Send a message to the first candidate model that answers
+
+        Returns:
+            send_message result; usage has "model" (the model that answered) and
+            "route" ({"reason": ..., "failed_over_from": [...]})
+
+        Raises:
+            UpstreamError: The last candidate's error (or a non-model-specific error)
+        """
+        with self._lock:
+            self._stats["routed"] += 1
+        failed = []
+        for index, model in enumerate(candidates):
+            start = time.perf_counter()
+            try:
+                result = openai_service.send_message(message, conversation_history, model=model, use_cache=use_cache,
+                                                     **self._attempt_options(index, candidates))
+            except Exception as e:
+                if isinstance(e, UpstreamError) and e.trips_circuit:
+                    self.record(model, error=True)
+                if not self._should_fail_over(e, index, candidates):
+                    raise
+                failed.append(model)
+                with self._lock:
+                    self._stats["failovers"] += 1
+                continue
+            usage = result.get("usage", {})
+            if not usage.get("cached") and not usage.get("coalesced"):
+                self.record(model, latency=time.perf_counter() - start)
+            self._route_report(result, reason, failed)
+            return result
+
+    def stream_message(self, openai_service, message: str, conversation_history: Optional[List[Dict[str, str]]],
+                       candidates: List[str], reason: str, use_cache: bool = True) -> Iterator[Dict[str, any]]:
+        """
+        Stream a message from the first candidate model that answers
+
+        Fails over only until the first chunk arrives; later errors end the stream.
+        Yields the same items as OpenAIService.stream_message, with "route" in the final usage.
+        """
+        with self._lock:
+            self._stats["routed"] += 1
+        failed = []
+        for index, model in enumerate(candidates):
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in openai_service.stream_message(message, conversation_history, model=model, use_cache=use_cache,
+                                                           **self._attempt_options(index, candidates)):
+                    if "delta" in chunk:
+                        started = True
+                        yield chunk
+                        continue
+                    usage = chunk.get("usage", {})
+                    if not usage.get("cached"):
+                        self.record(model, latency=time.perf_counter() - start)
+                    self._route_report(chunk, reason, failed)
+                    yield chunk
+                return
+            except Exception as e:
+                if isinstance(e, UpstreamError) and e.trips_circuit:
+                    self.record(model, error=True)
+                if started or not self._should_fail_over(e, index, candidates):
+                    raise
+                failed.append(model)
+                with self._lock:
+                    self._stats["failovers"] += 1
+
+    async def send_message_async(self, openai_service, message: str, conversation_history: Optional[List[Dict[str, str]]],
+                                 candidates: List[str], reason: str, use_cache: bool = True) -> Dict[str, any]:
+        """send_message with an AsyncOpenAIService, without blocking the event loop"""
+        with self._lock:
+            self._stats["routed"] += 1
+        failed = []
+        for index, model in enumerate(candidates):
+            start = time.perf_counter()
+            try:
+                result = await openai_service.send_message_async(message, conversation_history, model=model, use_cache=use_cache,
+                                                                 **self._attempt_options(index, candidates))
+            except Exception as e:
+                if isinstance(e, UpstreamError) and e.trips_circuit:
+                    self.record(model, error=True)
+                if not self._should_fail_over(e, index, candidates):
+                    raise
+                failed.append(model)
+                with self._lock:
+                    self._stats["failovers"] += 1
+                continue
+            usage = result.get("usage", {})
+            if not usage.get("cached") and not usage.get("coalesced"):
+                self.record(model, latency=time.perf_counter() - start)
+            self._route_report(result, reason, failed)
+            return result
+
+    async def stream_message_async(self, openai_service, message: str, conversation_history: Optional[List[Dict[str, str]]],
+                                   candidates: List[str], reason: str, use_cache: bool = True) -> AsyncIterator[Dict[str, any]]:
+        """stream_message with an AsyncOpenAIService, without blocking the event loop"""
+        with self._lock:
+            self._stats["routed"] += 1
+        failed = []
+        for index, model in enumerate(candidates):
+            start = time.perf_counter()
+            started = False
+            chunks = openai_service.stream_message_async(message, conversation_history, model=model, use_cache=use_cache,
+                                                         **self._attempt_options(index, candidates))
+            try:
+                async for chunk in chunks:
+                    if "delta" in chunk:
+                        started = True
+                        yield chunk
+                        continue
+                    usage = chunk.get("usage", {})
+                    if not usage.get("cached"):
+                        self.record(model, latency=time.perf_counter() - start)
+                    self._route_report(chunk, reason, failed)
+                    yield chunk
+                return
+            except Exception as e:
+                if isinstance(e, UpstreamError) and e.trips_circuit:
+                    self.record(model, error=True)
+                if started or not self._should_fail_over(e, index, candidates):
+                    raise
+                failed.append(model)
+                with self._lock:
+                    self._stats["failovers"] += 1
+            finally:
+                # Closes the upstream stream now if the client went away mid-stream
+                await chunks.aclose()
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get routing counters and per-model health"""
+        with self._lock:
+            models = {
+                model: {
+                    "latency_ewma": round(health.latency, 3) if health.latency is not None else None,
+                    "error_rate_ewma": round(health.error_rate, 3),
+                    "samples": health.samples,
+                    "errors": health.errors,
+                    "degraded": self._is_degraded(health)
+                }
+                for model, health in self._health.items()
+            }
+            return {**self._stats, "models": models}
@@ -3,37 +3,82 @@ OpenAI Service
 Business logic for interacting with OpenAI API
 Handles sending/receiving prompts and responses
 """
-from openai import OpenAI
-from typing import Optional, List, Dict
+import time
+from openai import OpenAI, APIStatusError, APIConnectionError
+from typing import Optional, List, Dict, Iterator, Tuple
 from credentials.credential_manager import CredentialManager
+from service.http_clients import get_openai_http_client
+from service.response_cache import ResponseCache, make_cache_key
+from service.context_window import ContextWindowManager
+from service.request_coalescer import RequestCoalescer
+from service.resilience import (UpstreamError, UpstreamUnavailableError, RetryPolicy, call_with_retries,
+                                error_for_status, get_breaker, parse_retry_after)
+from service import metrics
+
+
+def classify_openai_error(error: Exception) -> UpstreamError:
+    """Convert an OpenAI SDK exception to a typed UpstreamError"""
+    message = f"OpenAI API error: {str(error)}"
+    if isinstance(error, APIStatusError):
+        return error_for_status("openai", error.status_code, message, retry_after=parse_retry_after(error.response.headers))
+    if isinstance(error, APIConnectionError):
+        # Includes timeouts
+        return UpstreamUnavailableError("openai", message)
+    return UpstreamError("openai", message)
+
+
+# For attempts that fail over instead of retrying (see ModelRouter)
+NO_RETRY = RetryPolicy(max_retries=0)
 
 
 class OpenAIService:
     """Service for interacting with OpenAI API"""
     
-    def __init__(self, credential_manager: Optional[CredentialManager] = None):
+    def __init__(self, credential_manager: Optional[CredentialManager] = None, response_cache: Optional[ResponseCache] = None,
+                 context_manager: Optional[ContextWindowManager] = None, coalescer: Optional[RequestCoalescer] = None):
         """
         Initialize OpenAI service
         
         Args:
             credential_manager: CredentialManager instance. If None, creates a new one.
+            response_cache: Optional ResponseCache for identical requests. If None, caching is disabled.
+            context_manager: Optional ContextWindowManager to trim history to the model's token budget.
+                If None, history is sent as-is.
+            coalescer: Optional RequestCoalescer so identical concurrent send_message calls share
+                one OpenAI request. If None, every call goes to OpenAI.
+        
+        Calls are retried on 429/5xx/connection errors (see RetryPolicy) and go through the
+        process-wide circuit breaker of their model ("openai:<model>"), so a failing model
+        doesn't cut off its fallbacks.
         """
         if credential_manager is None:
             credential_manager = CredentialManager()
         
         self.credential_manager = credential_manager
+        self.response_cache = response_cache
+        self.context_manager = context_manager
+        self.coalescer = coalescer
         
         # Validate credentials
         is_valid, error_message = credential_manager.validate_openai_credentials()
         if not is_valid:
             raise ValueError(error_message)
         
-        # Initialize OpenAI client
+        # Initialize OpenAI client (on the shared connection pool)
         api_key = credential_manager.get_openai_api_key()
-        self.client = OpenAI(api_key=api_key)
+        # Retries are done here (with the circuit breaker), not by the SDK
+        self.client = OpenAI(api_key=api_key, http_client=get_openai_http_client(), max_retries=0)
         self.model = credential_manager.get_openai_model()
+        self.retry_policy = RetryPolicy()
+        # None: each model has its own breaker (see _breaker_for); set to use one breaker for every model
+        self.breaker = None
+    
+    def _breaker_for(self, model: str):
+        """Circuit breaker of a model"""
+        return self.breaker or get_breaker(f"openai:{model}")
     
-    def send_message(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None, model: Optional[str] = None) -> Dict[str, any]:
+    def send_message(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None, model: Optional[str] = None, use_cache: bool = True,
+                     timeout: Optional[float] = None, retry: bool = True) -> Dict[str, any]:
         """
         Send a message to OpenAI and get a response with usage statistics
         
@@ -42,25 +87,59 @@ class OpenAIService:
             conversation_history: List of previous messages in format:
                 [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]
             model: Optional model to use (overrides default model)
+            use_cache: Whether to use the response cache and share identical in-flight requests
+                (if configured)
+            timeout: Optional per-attempt timeout in seconds (default: the client's)
+            retry: Whether failed attempts are retried (see RetryPolicy)
         
         Returns:
-            Dict with "message" (response text) and "usage" (token usage stats)
+            Dict with "message" (response text) and "usage" (token usage stats).
+            On a cache hit, usage reports zero tokens with "cached": True and the tokens saved.
+            A call that shared an identical in-flight request (see RequestCoalescer) reports zero
+            tokens with "coalesced": True and the tokens saved; the call that made the request
+            reports its usage.
+            With a context manager, usage includes a "context" report of what was dropped from history.
         
         Raises:
-            Exception: If API call fails
+            UpstreamError: If the API call fails (UpstreamAuthError, UpstreamRateLimitError,
+                UpstreamUnavailableError, CircuitOpenError, ...)
         """
-        # Build messages list
-        messages = conversation_history.copy() if conversation_history else []
-        messages.append({"role": "user", "content": message})
-        
         # Use provided model or default
         model_to_use = model or self.model
+        messages, context_report = self._build_messages(message, conversation_history, model_to_use)
         
-        try:
-            response = self.client.chat.completions.create(
-                model=model_to_use,
-                messages=messages
+        cache_key = None
+        if self.response_cache is not None and use_cache:
+            cache_key = make_cache_key(model_to_use, messages)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return self._cached_response(cached, model_to_use)
+        
+        if self.coalescer is None or not use_cache:
+            result = self._complete(messages, model_to_use, context_report, timeout, retry)
+        else:
+            result, shared = self.coalescer.run(
+                cache_key or make_cache_key(model_to_use, messages),
+                lambda: self._complete(messages, model_to_use, context_report, timeout, retry)
             )
+            if shared:
+                # The caller that made the request caches and accounts for it
+                return self._cached_response(result, model_to_use, reused_as="coalesced")
+        
+        if cache_key:
+            self.response_cache.set(cache_key, result)
+        return result
+    
+    def _complete(self, messages: List[Dict[str, str]], model_to_use: str, context_report: Optional[Dict[str, any]],
+                  timeout: Optional[float] = None, retry: bool = True) -> Dict[str, any]:
+        """Make one chat completion request (send_message result)"""
+        options = {"timeout": timeout} if timeout else {}
+        try:
+            with metrics.openai_request_duration.time(model=model_to_use):
+                response = call_with_retries(
+                    lambda: self.client.chat.completions.create(model=model_to_use, messages=messages, **options),
+                    self._breaker_for(model_to_use), self.retry_policy if retry else NO_RETRY, classify_openai_error
+                )
             
             # Extract usage statistics
             usage = response.usage
@@ -70,14 +149,141 @@ class OpenAIService:
                 "total_tokens": usage.total_tokens if usage else 0,
                 "model": model_to_use
             }
+            if context_report:
+                usage_stats["context"] = context_report
             
-            return {
+            result = {
                 "message": response.choices[0].message.content,
                 "usage": usage_stats
             }
         
+        except UpstreamError:
+            raise
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise classify_openai_error(e) from e
+        return result
+    
+    def _build_messages(self, message: str, conversation_history: Optional[List[Dict[str, str]]], model: str) -> Tuple[List[Dict[str, str]], Optional[Dict[str, any]]]:
+        """
+        Build the message list for a request, trimmed to the model's token budget
+        
+        Returns:
+            Tuple of (messages, context report). The report is None when no context manager is configured.
+        """
+        messages = conversation_history.copy() if conversation_history else []
+        messages.append({"role": "user", "content": message})
+        if self.context_manager is None:
+            return messages, None
+        return self.context_manager.fit(messages, model)
+    
+    def _cached_response(self, cached: Dict[str, any], model: str, reused_as: str = "cached") -> Dict[str, any]:
+        """Build a send_message result from a cached (or coalesced) response, reporting the tokens saved"""
+        cached_usage = cached.get("usage", {})
+        return {
+            "message": cached["message"],
+            "usage": {
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0,
+                "model": model,
+                reused_as: True,
+                "saved_prompt_tokens": cached_usage.get("prompt_tokens", 0),
+                "saved_completion_tokens": cached_usage.get("completion_tokens", 0),
+                "saved_tokens": cached_usage.get("total_tokens", 0)
+            }
+        }
+    
+    def stream_message(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None, model: Optional[str] = None, use_cache: bool = True,
+                       timeout: Optional[float] = None, retry: bool = True) -> Iterator[Dict[str, any]]:
+        """
+        Send a message to OpenAI and stream the response as it is generated
+        
+        Args:
+            message: The user's message/prompt
+            conversation_history: List of previous messages (same format as send_message)
+            model: Optional model to use (overrides default model)
+            use_cache: Whether to use the response cache (if one is configured)
+            timeout: Optional timeout in seconds for establishing the stream and for each chunk
+            retry: Whether failed attempts to establish the stream are retried
+        
+        Yields:
+            {"delta": "..."} for each chunk of response text, followed by a final
+            {"message": full response text, "usage": token usage stats} (same shape as send_message)
+        
+        Raises:
+            UpstreamError: If the API call fails. Only establishing the stream is retried;
+                an error after the first chunk ends the stream.
+        """
+        model_to_use = model or self.model
+        messages, context_report = self._build_messages(message, conversation_history, model_to_use)
+        
+        cache_key = None
+        if self.response_cache is not None and use_cache:
+            cache_key = make_cache_key(model_to_use, messages)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                # Cached responses are sent as a single chunk
+                yield {"delta": cached["message"]}
+                yield self._cached_response(cached, model_to_use)
+                return
+        
+        options = {"timeout": timeout} if timeout else {}
+        start = time.perf_counter()
+        status = "error"
+        try:
+            stream = call_with_retries(
+                lambda: self.client.chat.completions.create(
+                    model=model_to_use,
+                    messages=messages,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **options
+                ),
+                self._breaker_for(model_to_use), self.retry_policy if retry else NO_RETRY, classify_openai_error
+            )
+            
+            parts = []
+            usage = None
+            for chunk in stream:
+                # The final chunk carries usage and has no choices
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        metrics.openai_time_to_first_token.observe(time.perf_counter() - start, model=model_to_use)
+                    parts.append(delta)
+                    yield {"delta": delta}
+            status = "ok"
+            
+            usage_stats = {
+                "prompt_tokens": usage.prompt_tokens if usage else 0,
+                "completion_tokens": usage.completion_tokens if usage else 0,
+                "total_tokens": usage.total_tokens if usage else 0,
+                "model": model_to_use
+            }
+            if context_report:
+                usage_stats["context"] = context_report
+            
+            result = {
+                "message": "".join(parts),
+                "usage": usage_stats
+            }
+        
+        except UpstreamError:
+            raise
+        except Exception as e:
+            error = classify_openai_error(e)
+            self._breaker_for(model_to_use).record_error(error)
+            raise error from e
+        finally:
+            metrics.openai_request_duration.observe(time.perf_counter() - start, model=model_to_use, status=status)
+        
+        if cache_key:
+            self.response_cache.set(cache_key, result)
+        yield result
     
     def chat_completion(self, message: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, any]:
         """
@@ -94,7 +300,7 @@ class OpenAIService:
         """
         try:
             test_message = "Say 'Connection successful' if you can read this."
-            response_data = self.send_message(test_message)
+            response_data = self.send_message(test_message, use_cache=False)
             
             return {
                 "status": "success",
@@ -0,0 +1,303 @@
+"""
+Papita Usage Logger
+Non-blocking, batched delivery of usage records to the Papita API
+Records are queued in-process and sent by a background worker, so chat
+responses never wait on usage accounting
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict
+import httpx
+from service.http_clients import get_papita_client
+from service.resilience import get_breaker, CircuitOpenError
+from service import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows - run a single worker process, the spool is only locked in-process
+    fcntl = None
+
+
+class PapitaUsageLogger:
+    """
+    Queues usage records and delivers them to Papita API from a background thread
+
+    The spool file may be shared by several worker processes: appends and the
+    move to the replay file hold an exclusive lock on <spool>.lock, and only
+    the process holding <spool>.replay.lock replays, so a record is replayed once.
+    """
+
+    def __init__(self, api_url: str, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_queue_size: Optional[int] = None, max_retries: Optional[int] = None,
+                 spool_file: Optional[str] = None):
+        """
+        Initialize usage logger
+
+        Args:
+            api_url: Papita API base URL
+            batch_size: Flush once this many records are queued (env PAPITA_USAGE_BATCH_SIZE, default 20)
+            flush_interval: Flush at least every N seconds (env PAPITA_USAGE_FLUSH_INTERVAL, default 2.0)
+            max_queue_size: Maximum queued records before spilling to disk (env PAPITA_USAGE_QUEUE_SIZE, default 10000)
+            max_retries: Retries per batch when Papita fails (env PAPITA_USAGE_MAX_RETRIES, default 3)
+            spool_file: File for records that could not be delivered (env PAPITA_USAGE_SPOOL_FILE,
+                default Backend/spool/papita_usage.jsonl)
+        """
+        self.api_url = api_url
+        self.batch_size = batch_size or int(os.getenv('PAPITA_USAGE_BATCH_SIZE', '20'))
+        self.flush_interval = flush_interval or float(os.getenv('PAPITA_USAGE_FLUSH_INTERVAL', '2.0'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('PAPITA_USAGE_MAX_RETRIES', '3'))
+        self.backoff_base = 0.5
+        self.spool_replay_interval = 60.0
+
+        if spool_file is None:
+            spool_file = os.getenv('PAPITA_USAGE_SPOOL_FILE') or Path(__file__).parent.parent / 'spool' / 'papita_usage.jsonl'
+        self.spool_file = Path(spool_file)
+
+        self._queue = queue.Queue(maxsize=max_queue_size or int(os.getenv('PAPITA_USAGE_QUEUE_SIZE', '10000')))
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._worker = None
+        self._stopping = threading.Event()
+        self._last_spool_replay = 0.0
+        self._stats = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "discarded": 0
+        }
+        atexit.register(self.stop)
+
+    def log(self, record: Dict[str, any]) -> bool:
+        """
+        Queue a usage record for delivery (never blocks)
+
+        Args:
+            record: Usage record in Papita /api/usage/log format
+
+        Returns:
+            True if queued, False if the queue was full and the record was spilled to disk
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+            with self._lock:
+                self._stats["queued"] += 1
+            return True
+        except queue.Full:
+            self._spool([record])
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until all queued records have been processed
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Flush pending records and stop the worker thread"""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        self.flush(timeout)
+        self._stopping.set()
+        self._worker.join(timeout)
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get delivery statistics"""
+        return {
+            **self._stats,
+            "pending": self._queue.qsize(),
+            "spool_file": str(self.spool_file),
+            "worker_alive": self._worker is not None and self._worker.is_alive()
+        }
+
+    def _ensure_worker(self):
+        """Start the background worker on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name="papita-usage-logger", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Worker loop: collect records into batches and flush on size or interval"""
+        while not self._stopping.is_set():
+            try:
+                self._run_once()
+            except Exception as e:
+                # Keep the worker alive - an unexpected error must not stop usage delivery for the process
+                print(f"[WARNING] Papita usage logger error: {str(e)}")
+                self._stopping.wait(self.flush_interval)
+
+    def _run_once(self):
+        """Collect one batch and deliver it (or replay the spool when idle)"""
+        batch = self._collect_batch()
+        client = get_papita_client()
+        if not batch:
+            self._maybe_replay_spool(client)
+            return
+        try:
+            if self._send_batch(client, batch):
+                self._maybe_replay_spool(client)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _collect_batch(self) -> List[Dict[str, any]]:
+        """Block until batch_size records are queued or flush_interval elapses"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send_batch(self, client: httpx.Client, batch: List[Dict[str, any]]) -> bool:
+        """
+        Deliver a batch, retrying with exponential backoff
+
+        Records still undelivered after the last retry are spilled to the spool file.
+
+        Returns:
+            True if every record was delivered
+        """
+        pending = list(batch)
+        for attempt in range(self.max_retries + 1):
+            pending = self._post_records(client, pending)
+            if not pending:
+                return True
+            if attempt < self.max_retries and not self._stopping.is_set():
+                time.sleep(self.backoff_base * (2 ** attempt))
+
+        print(f"[WARNING] Papita API unreachable, spooling {len(pending)} usage record(s) to {self.spool_file}")
+        self._spool(pending)
+        return False
+
+    def _post_records(self, client: httpx.Client, records: List[Dict[str, any]]) -> List[Dict[str, any]]:
+        """
+        Post records one by one over the shared keep-alive Papita client
+
+        Returns:
+            Records that should be retried (all remaining ones while the "papita" circuit is open)
+        """
+        url = f'{self.api_url}/api/usage/log'
+        breaker = get_breaker("papita")
+        for i, record in enumerate(records):
+            try:
+                breaker.before_call()
+                with metrics.papita_usage_log_duration.time():
+                    response = client.post(url, json=record)
+            except CircuitOpenError:
+                return records[i:]
+            except httpx.HTTPError:
+                # Papita is unreachable - don't wait on a timeout for every remaining record
+                breaker.record_failure()
+                return records[i:]
+
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code == 200:
+                self._stats["sent"] += 1
+            elif response.status_code >= 500 or response.status_code == 429:
+                return records[i:]
+            else:
+                # Client errors won't succeed on retry
+                self._stats["failed"] += 1
+                print(f"[WARNING] Failed to log usage to Papita API: {response.status_code}")
+        return []
+
+    @contextmanager
+    def _file_lock(self, suffix: str, blocking: bool = True):
+        """
+        Exclusive lock on <spool file><suffix>, shared with other worker processes
+
+        Yields:
+            False if blocking is False and another process holds the lock
+        """
+        with open(self.spool_file.parent / (self.spool_file.name + suffix), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except OSError:
+                    yield False
+                    return
+            yield True
+
+    def _spool(self, records: List[Dict[str, any]]):
+        """Append undeliverable records to the spool file"""
+        try:
+            with self._spool_lock:
+                self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+                with self._file_lock('.lock'), open(self.spool_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+                self._stats["spooled"] += len(records)
+        except OSError as e:
+            with self._spool_lock:
+                self._stats["failed"] += len(records)
+            print(f"[WARNING] Could not spool usage records: {str(e)}")
+
+    def _maybe_replay_spool(self, client: httpx.Client):
+        """Resend spooled records once Papita is reachable again (at most every spool_replay_interval)"""
+        now = time.monotonic()
+        if now - self._last_spool_replay < self.spool_replay_interval or not self.spool_file.exists():
+            return
+        self._last_spool_replay = now
+
+        with self._file_lock('.replay.lock', blocking=False) as acquired:
+            if acquired:
+                self._replay_spool(client)
+
+    def _replay_spool(self, client: httpx.Client):
+        """Move the spool to the replay file and resend it (holding the replay lock)"""
+        replay_file = self.spool_file.with_suffix('.replay')
+        with self._spool_lock, self._file_lock('.lock'):
+            if replay_file.exists():
+                # Leftover from an interrupted replay - merge it back first
+                with open(replay_file, 'r', encoding='utf-8') as src, open(self.spool_file, 'a', encoding='utf-8') as dst:
+                    dst.write(src.read())
+            if not self.spool_file.exists():
+                return  # Replayed by another worker in the meantime
+            self.spool_file.replace(replay_file)
+
+        records = []
+        with open(replay_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Truncated or corrupt line (e.g. a crash mid-write) - it can never be delivered
+                    self._stats["discarded"] += 1
+
+        pending = self._post_records(client, records)
+        self._stats["replayed"] += len(records) - len(pending)
+        if pending:
+            self._spool(pending)
+            with self._spool_lock:
+                self._stats["spooled"] -= len(pending)
+        replay_file.unlink()
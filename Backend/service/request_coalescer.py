@@ -0,0 +1,108 @@
+"""
+Request Coalescer
+Single-flight execution of identical in-flight requests: concurrent callers
+with the same key wait for one upstream call and share its result
+"""
+import asyncio
+import threading
+from typing import Callable, Awaitable, Dict, Tuple
+
+
+class _Call:
+    """One in-flight call and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Runs at most one call per key at a time; duplicates arriving meanwhile get the same result"""
+
+    def __init__(self):
+        self._calls = {}
+        # In-flight calls of run_async (asyncio tasks)
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0, "errors": 0}
+
+    def run(self, key: str, fn: Callable[[], any]) -> Tuple[any, bool]:
+        """
+        Run fn, or wait for the call already running under the same key
+
+        Args:
+            key: Request key (e.g. make_cache_key of model + messages)
+            fn: Makes the upstream call
+
+        Returns:
+            Tuple of (result, shared). shared is False for the caller that ran fn
+            and True for callers that received its result.
+
+        Raises:
+            Exception: Whatever fn raised (every waiting caller gets the same error)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self._stats["calls"] += 1
+            else:
+                leader = False
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            # Later requests start a new call (and may hit the response cache instead)
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def run_async(self, key: str, fn: Callable[[], Awaitable[any]]) -> Tuple[any, bool]:
+        """
+        run for coroutines: fn returns an awaitable (all callers must be on the same event loop)
+
+        The call runs as its own task, so a caller that is cancelled (client went away)
+        doesn't cancel it for the others.
+
+        Returns:
+            Tuple of (result, shared), as run
+        """
+        with self._lock:
+            task = self._async_calls.get(key)
+            shared = task is not None
+            if shared:
+                self._stats["coalesced"] += 1
+            else:
+                self._stats["calls"] += 1
+                task = self._async_calls[key] = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda done: self._finish_async(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish_async(self, key: str, task: asyncio.Future):
+        with self._lock:
+            del self._async_calls[key]
+            # Also marks the error as retrieved when every caller was cancelled
+            if not task.cancelled() and task.exception() is not None:
+                self._stats["errors"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get coalescing statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._async_calls)
+        return stats
@@ -0,0 +1,302 @@
+"""
+Resilience
+Typed upstream errors, jittered exponential retries that honor Retry-After,
+and per-dependency circuit breakers that fail fast while a dependency is down
+"""
+import os
+import time
+import asyncio
+import random
+import threading
+from typing import Optional, Callable, Awaitable, Dict
+from service import metrics
+
+
+class UpstreamError(Exception):
+    """A call to an upstream dependency (OpenAI, Papita) failed"""
+
+    # Whether the same call may succeed if retried
+    retryable = False
+    # Whether the failure says the dependency is unhealthy (counts toward opening its circuit)
+    trips_circuit = False
+    # HTTP status to answer our own client with
+    http_status = 502
+
+    def __init__(self, dependency: str, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.dependency = dependency
+        self.status = status
+        self.retry_after = retry_after
+
+
+class UpstreamAuthError(UpstreamError):
+    """Credentials were rejected (401/403)"""
+    http_status = 401
+
+
+class UpstreamBadRequestError(UpstreamError):
+    """The request was rejected (other 4xx) - retrying won't help"""
+    http_status = 400
+
+
+class UpstreamRateLimitError(UpstreamError):
+    """Rate limited (429)"""
+    retryable = True
+    trips_circuit = True
+    http_status = 429
+
+
+class UpstreamUnavailableError(UpstreamError):
+    """5xx, timeout or connection failure"""
+    retryable = True
+    trips_circuit = True
+    http_status = 503
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """The dependency's circuit is open - the call was not attempted"""
+    retryable = False
+    trips_circuit = False
+
+
+def error_for_status(dependency: str, status: int, message: str, retry_after: Optional[float] = None) -> UpstreamError:
+    """Build the typed error for an HTTP error status"""
+    if status in (401, 403):
+        error_class = UpstreamAuthError
+    elif status == 429:
+        error_class = UpstreamRateLimitError
+    elif status >= 500 or status == 408:
+        error_class = UpstreamUnavailableError
+    else:
+        error_class = UpstreamBadRequestError
+    return error_class(dependency, message, status=status, retry_after=retry_after)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Get the Retry-After delay in seconds from response headers (only the seconds form is supported)"""
+    value = headers.get('retry-after') if headers is not None else None
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, waiting at least as long as Retry-After asks"""
+
+    def __init__(self, max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, max_retry_after: Optional[float] = None):
+        """
+        Initialize retry policy
+
+        Args:
+            max_retries: Retries after the first attempt (env UPSTREAM_MAX_RETRIES, default 2)
+            base_delay: Backoff before the first retry, doubled each retry (env UPSTREAM_RETRY_BASE_DELAY, default 0.5)
+            max_delay: Cap on the backoff (env UPSTREAM_RETRY_MAX_DELAY, default 8)
+            max_retry_after: Don't retry when Retry-After asks for longer than this
+                (env UPSTREAM_MAX_RETRY_AFTER, default 20)
+        """
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('UPSTREAM_MAX_RETRIES', '2'))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv('UPSTREAM_RETRY_BASE_DELAY', '0.5'))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv('UPSTREAM_RETRY_MAX_DELAY', '8'))
+        self.max_retry_after = max_retry_after if max_retry_after is not None else float(os.getenv('UPSTREAM_MAX_RETRY_AFTER', '20'))
+
+    def get_delay(self, attempt: int, error: UpstreamError) -> Optional[float]:
+        """
+        Get the wait before retrying a failed attempt
+
+        Args:
+            attempt: Number of the failed attempt (0 = first)
+            error: The attempt's error
+
+        Returns:
+            Seconds to wait, or None if the call should not be retried
+        """
+        if not error.retryable or attempt >= self.max_retries:
+            return None
+        if error.retry_after is not None and error.retry_after > self.max_retry_after:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        return max(delay, error.retry_after or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Per-dependency circuit breaker
+
+    closed: calls go through. After failure_threshold consecutive failures it opens.
+    open: calls fail fast with CircuitOpenError for reset_timeout seconds.
+    half_open: one trial call goes through; success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Dependency name
+            failure_threshold: Consecutive failures that open the circuit (env CIRCUIT_FAILURE_THRESHOLD, default 5)
+            reset_timeout: Seconds the circuit stays open before a trial call (env CIRCUIT_RESET_TIMEOUT, default 30)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+        self.reset_timeout = reset_timeout or float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self):
+        """
+        Check that a call may go through
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or a half-open trial call is already in flight)
+        """
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                self._trial_in_flight = False
+            if self._state == "closed":
+                return
+            if self._state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._stats["rejected"] += 1
+            retry_after = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, f"{self.name} is unavailable (circuit open)", retry_after=retry_after)
+
+    def record_success(self):
+        """Record a call that reached a healthy dependency"""
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a call that failed because the dependency is unhealthy"""
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._stats["opened"] += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def record_error(self, error: Exception):
+        """Record a failed call: unhealthy-dependency errors count as failures, others as successes"""
+        if isinstance(error, UpstreamError) and not error.trips_circuit:
+            if not isinstance(error, CircuitOpenError):
+                self.record_success()
+            return
+        self.record_failure()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def get_status(self) -> Dict[str, any]:
+        """Get the circuit state and counters"""
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                **self._stats
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide circuit breaker of a dependency, creating it on first use"""
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def get_breaker_states() -> Dict[str, Dict[str, any]]:
+    """Get the status of every circuit breaker"""
+    return {name: breaker.get_status() for name, breaker in list(_breakers.items())}
+
+
+def call_with_retries(fn: Callable[[], any], breaker: CircuitBreaker, policy: RetryPolicy,
+                      classify: Callable[[Exception], UpstreamError]) -> any:
+    """
+    Call fn through a circuit breaker, retrying retryable failures
+
+    Args:
+        fn: Makes the upstream call
+        breaker: Circuit breaker of the dependency
+        policy: Retry policy
+        classify: Converts an exception raised by fn to a typed UpstreamError
+
+    Returns:
+        fn's result
+
+    Raises:
+        UpstreamError: The last attempt's error, or CircuitOpenError if the circuit is open
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            error = e if isinstance(e, UpstreamError) else classify(e)
+            breaker.record_error(error)
+            delay = policy.get_delay(attempt, error)
+            if delay is None:
+                if error is e:
+                    raise
+                raise error from e
+            metrics.upstream_retries_total.inc(dependency=breaker.name, error=type(error).__name__)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+async def call_with_retries_async(fn: Callable[[], Awaitable[any]], breaker: CircuitBreaker, policy: RetryPolicy,
+                                  classify: Callable[[Exception], UpstreamError]) -> any:
+    """
+    call_with_retries for coroutines: fn returns an awaitable, and backoff waits
+    don't block the event loop
+
+    Raises:
+        UpstreamError: The last attempt's error, or CircuitOpenError if the circuit is open
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            error = e if isinstance(e, UpstreamError) else classify(e)
+            breaker.record_error(error)
+            delay = policy.get_delay(attempt, error)
+            if delay is None:
+                if error is e:
+                    raise
+                raise error from e
+            metrics.upstream_retries_total.inc(dependency=breaker.name, error=type(error).__name__)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
@@ -0,0 +1,176 @@
+"""
+Response Cache
+Opt-in cache of OpenAI chat completions for identical requests
+Keyed on a hash of model + messages (+ params), with an in-memory LRU tier
+and an optional SQLite tier that survives restarts
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, List, Dict
+
+
+def make_cache_key(model: str, messages: List[Dict[str, str]], params: Optional[Dict[str, any]] = None) -> str:
+    """
+    Build a cache key for a chat completion request
+
+    Args:
+        model: Model name
+        messages: Full message list sent to OpenAI
+        params: Other request parameters that affect the output (temperature, etc.)
+
+    Returns:
+        Hex SHA-256 digest of the normalized request
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of chat completions with an optional SQLite tier"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 db_path: Optional[str] = None, max_disk_entries: Optional[int] = None):
+        """
+        Initialize response cache
+
+        Args:
+            max_entries: Max in-memory entries (env RESPONSE_CACHE_MAX_ENTRIES, default 1000)
+            ttl: Seconds an entry stays valid (env RESPONSE_CACHE_TTL, default 3600)
+            db_path: SQLite file for the disk tier (env RESPONSE_CACHE_DB). None disables the disk tier.
+            max_disk_entries: Max entries kept on disk (env RESPONSE_CACHE_MAX_DISK_ENTRIES, default 100000)
+        """
+        # Explicit zeros are kept (ttl=0 expires entries at once, max_entries=0 keeps none in memory)
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None \
+            else int(os.getenv('RESPONSE_CACHE_MAX_DISK_ENTRIES', '100000'))
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        db_path = db_path or os.getenv('RESPONSE_CACHE_DB')
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_writes = 0
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires ON response_cache (expires_at)")
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, any]]:
+        """
+        Look up a cached response
+
+        Returns:
+            Cached {"message", "usage"} dict, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+        # Promote to the memory tier
+        self._memory_set(key, value[1], value[0])
+        return value[1]
+
+    def set(self, key: str, value: Dict[str, any]):
+        """Store a response in the cache"""
+        expires_at = time.time() + self.ttl
+        self._memory_set(key, value, expires_at)
+        with self._lock:
+            self._stats["stores"] += 1
+        self._disk_set(key, value, expires_at)
+
+    def clear(self):
+        """Remove all cached responses (memory and disk)"""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get cache statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["disk_enabled"] = self._db is not None
+        return stats
+
+    def _memory_set(self, key: str, value: Dict[str, any], expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float):
+        """Returns (expires_at, value) from the disk tier, or None"""
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+            if row is None:
+                return None
+            return row[1], json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"[WARNING] Response cache read failed: {str(e)}")
+            return None
+
+    def _disk_set(self, key: str, value: Dict[str, any], expires_at: float):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._disk_writes += 1
+                # Prune expired and oldest entries every so often rather than on each write
+                if self._disk_writes % 100 == 0:
+                    self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.execute(
+                        "DELETE FROM response_cache WHERE key IN ("
+                        "SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,)
+                    )
+                self._db.commit()
+        except sqlite3.Error as e:
+            print(f"[WARNING] Response cache write failed: {str(e)}")
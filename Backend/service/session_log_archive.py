@@ -0,0 +1,250 @@
+"""
+Session Log Archive
+Compresses daily session logs older than N days into block-compressed gzip files
+(one gzip member per block, so single entries can be read without inflating the
+whole day) and streams events across plain and archived logs in constant memory
+"""
+import os
+import json
+import gzip
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows - only one process should archive at a time
+    fcntl = None
+
+# Uncompressed bytes per gzip member (bigger compresses better, smaller makes random reads cheaper)
+BLOCK_SIZE = 64 * 1024
+
+# Entry fields holding large payloads that repeat across entries (stored once, by content hash)
+DEDUP_FIELDS = ("project_criteria",)
+
+# Payloads smaller than this are left inline
+MIN_DEDUP_BYTES = 256
+
+PAYLOAD_REF_KEY = "$payload"
+
+
+class PayloadStore:
+    """Append-only store of deduplicated payloads, keyed by content hash"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._payloads = None
+        self._lock = threading.Lock()
+
+    def put(self, value: any) -> str:
+        """Store a payload (if new) and return its hash"""
+        data = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        payload_hash = hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            payloads = self._load()
+            if payload_hash not in payloads:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"hash": payload_hash, "value": value}, ensure_ascii=False) + '\n')
+                payloads[payload_hash] = value
+        return payload_hash
+
+    def get(self, payload_hash: str) -> Optional[any]:
+        with self._lock:
+            payloads = self._load()
+            if payload_hash not in payloads:
+                # May have been added by another process since we loaded
+                self._payloads = None
+                payloads = self._load()
+            return payloads.get(payload_hash)
+
+    def resolve(self, entry: Dict[str, any]) -> Dict[str, any]:
+        """Replace payload references in an entry with the stored payloads"""
+        for field in DEDUP_FIELDS:
+            value = entry.get(field)
+            if isinstance(value, dict) and PAYLOAD_REF_KEY in value:
+                entry[field] = self.get(value[PAYLOAD_REF_KEY])
+        return entry
+
+    def _load(self) -> Dict[str, any]:
+        # Payloads are few (distinct values only), so they are kept in memory once read
+        if self._payloads is None:
+            self._payloads = {}
+            if self.path.exists():
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self._payloads[record["hash"]] = record["value"]
+                        except (ValueError, KeyError):
+                            continue
+        return self._payloads
+
+
+class SessionLogArchiver:
+    """Archives old daily logs and reads events across plain and archived logs"""
+
+    def __init__(self, log_dir: Path, index=None, archive_after_days: Optional[int] = None,
+                 dedup: Optional[bool] = None):
+        """
+        Initialize session log archiver
+
+        Args:
+            log_dir: Directory holding the daily log files
+            index: Optional SessionLogIndex to repoint at the archives
+            archive_after_days: Archive logs older than this many days (env SESSION_LOG_ARCHIVE_DAYS,
+                default 0: archiving is opt-in, since it rewrites and removes the log files)
+            dedup: Store repeated payloads (project_init criteria) once (env SESSION_LOG_ARCHIVE_DEDUP, default true)
+        """
+        self.log_dir = Path(log_dir)
+        self.index = index
+        self.archive_after_days = archive_after_days if archive_after_days is not None else \
+            int(os.getenv('SESSION_LOG_ARCHIVE_DAYS', '0'))
+        self.dedup = dedup if dedup is not None else \
+            os.getenv('SESSION_LOG_ARCHIVE_DEDUP', 'true').lower() == 'true'
+        self.payloads = PayloadStore(self.log_dir / 'session_payloads.jsonl')
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def archive(self, today: Optional[datetime] = None) -> List[Dict[str, any]]:
+        """
+        Compress every plain log older than archive_after_days
+
+        Only one process archives at a time; others return immediately.
+
+        Args:
+            today: Reference date (default now)
+
+        Returns:
+            One report per archived file (file, original_bytes, archived_bytes, entries)
+        """
+        if self.archive_after_days <= 0:
+            return []
+        cutoff = ((today or datetime.now()) - timedelta(days=self.archive_after_days)).strftime('%Y-%m-%d')
+
+        with open(self.log_dir / '.archive.lock', 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return []  # Another worker is archiving
+            reports = []
+            for log_file in sorted(self.log_dir.glob('session_*.log')):
+                if self._log_date(log_file) < cutoff:
+                    reports.append(self._archive_file(log_file))
+            return reports
+
+    def iter_events(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    event: Optional[str] = None) -> Iterator[Dict[str, any]]:
+        """
+        Stream entries from plain and archived logs, oldest day first
+
+        Reads one line (or one archive block) at a time, so memory use does not grow
+        with the amount of logs.
+
+        Args:
+            start_date: First day (YYYY-MM-DD), default no lower bound
+            end_date: Last day (YYYY-MM-DD), default no upper bound
+            event: Only entries of this event type
+        """
+        files = list(self.log_dir.glob('session_*.log')) + list(self.log_dir.glob('session_*.log.gz'))
+        for log_file in sorted(files, key=lambda f: (self._log_date(f), f.suffix == '.log')):
+            date = self._log_date(log_file)
+            if (start_date and date < start_date) or (end_date and date > end_date):
+                continue
+            opener = gzip.open if log_file.suffix == '.gz' else open
+            try:
+                with opener(log_file, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if event and entry.get("event") != event:
+                            continue
+                        yield self.payloads.resolve(entry)
+            except OSError:
+                # Archived (and removed) by another process while we were listing
+                continue
+
+    def start(self, interval: Optional[float] = None):
+        """Archive now and then every `interval` seconds in a background thread (env SESSION_LOG_ARCHIVE_INTERVAL, default 3600)"""
+        if self.archive_after_days <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        interval = interval or float(os.getenv('SESSION_LOG_ARCHIVE_INTERVAL', '3600'))
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="session-log-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background archiving thread"""
+        self._stopping.set()
+
+    def _run(self, interval: float):
+        while not self._stopping.is_set():
+            try:
+                for report in self.archive():
+                    print(f"[OK] Archived {report['file']}: {report['original_bytes']} -> {report['archived_bytes']} bytes")
+            except Exception as e:
+                print(f"[WARNING] Session log archiving failed: {str(e)}")
+            self._stopping.wait(interval)
+
+    def _archive_file(self, log_file: Path) -> Dict[str, any]:
+        """Write log_file as session_YYYY-MM-DD.log.gz (one gzip member per block), then remove it"""
+        archive_file = log_file.with_name(log_file.name + '.gz')
+        tmp_file = log_file.with_name(log_file.name + '.gz.tmp')
+        entries = 0
+        with open(log_file, 'r', encoding='utf-8') as src, open(tmp_file, 'wb') as dst:
+            if archive_file.exists():
+                # An earlier archive of this day (e.g. late writes after archiving) - keep its blocks
+                with open(archive_file, 'rb') as existing:
+                    dst.write(existing.read())
+            block = []
+            block_bytes = 0
+            for line in src:
+                if not line.endswith('\n'):
+                    line += '\n'
+                line = self._dedup_line(line)
+                block.append(line)
+                block_bytes += len(line)
+                entries += 1
+                if block_bytes >= BLOCK_SIZE:
+                    dst.write(gzip.compress(''.join(block).encode('utf-8')))
+                    block, block_bytes = [], 0
+            if block:
+                dst.write(gzip.compress(''.join(block).encode('utf-8')))
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        original_bytes = log_file.stat().st_size
+        os.replace(tmp_file, archive_file)
+        log_file.unlink()
+        if self.index is not None:
+            self.index.replace_with_archive(log_file, archive_file)
+        return {
+            "file": archive_file.name,
+            "original_bytes": original_bytes,
+            "archived_bytes": archive_file.stat().st_size,
+            "entries": entries
+        }
+
+    def _dedup_line(self, line: str) -> str:
+        """Replace large repeated payloads in a log line with a reference to the payload store"""
+        if not self.dedup or not any(f'"{field}"' in line for field in DEDUP_FIELDS):
+            return line
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return line
+        changed = False
+        for field in DEDUP_FIELDS:
+            value = entry.get(field)
+            if isinstance(value, (dict, list)) and len(json.dumps(value)) >= MIN_DEDUP_BYTES:
+                entry[field] = {PAYLOAD_REF_KEY: self.payloads.put(value)}
+                changed = True
+        return json.dumps(entry, ensure_ascii=False) + '\n' if changed else line
+
+    @staticmethod
+    def _log_date(log_file: Path) -> str:
+        return log_file.name[len('session_'):len('session_YYYY-MM-DD')]
@@ -0,0 +1,339 @@
+"""
+Session Log Index
+SQLite index of session log entries (session_id, event, date -> file byte offset)
+Kept up to date incrementally: each sync only reads bytes appended since the last one
+Archived (block-compressed) logs are indexed by gzip member offset and line number
+"""
+import json
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
+
+# Bytes read per step when indexing a file, so a large backlog is indexed in constant memory
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Bump when the schema changes; the index is rebuilt from the log files
+SCHEMA_VERSION = 2
+
+
+def iter_gzip_members(f) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Iterate the members of a multi-member gzip file
+
+    Args:
+        f: File opened in binary mode, positioned at the start
+
+    Yields:
+        (member offset, member length, decompressed data) for each member
+    """
+    offset = 0
+    buffer = b''
+    while True:
+        if not buffer:
+            buffer = f.read(READ_CHUNK_SIZE)
+            if not buffer:
+                return
+        decompressor = zlib.decompressobj(wbits=31)
+        start = offset
+        parts = []
+        while not decompressor.eof:
+            if not buffer:
+                buffer = f.read(READ_CHUNK_SIZE)
+                if not buffer:
+                    raise ValueError("Truncated gzip member")
+            parts.append(decompressor.decompress(buffer))
+            offset += len(buffer) - len(decompressor.unused_data)
+            buffer = decompressor.unused_data
+        yield start, offset - start, b''.join(parts)
+
+
+class SessionLogIndex:
+    """Byte-offset index over the daily session log files (plain .log and archived .log.gz)"""
+
+    def __init__(self, log_dir: Path, db_path: Optional[Path] = None):
+        """
+        Initialize session log index
+
+        Args:
+            log_dir: Directory holding the daily log files
+            db_path: SQLite file for the index (default <log_dir>/session_index.db)
+        """
+        self.log_dir = Path(log_dir)
+        self.db_path = Path(db_path) if db_path else self.log_dir / 'session_index.db'
+        self._lock = threading.Lock()
+        # Opened on first use, so creating an index (e.g. when main.py is imported) touches no files
+        self._db = None
+
+    def _connect(self):
+        """Open the index database and create its tables. Called with the lock held."""
+        if self._db is not None:
+            return
+        # Worker processes share the index; wait for each other's write transactions
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # The index only caches what is in the log files, so an old schema is simply rebuilt
+            self._db.execute("DROP TABLE IF EXISTS indexed_files")
+            self._db.execute("DROP TABLE IF EXISTS events")
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_files ("
+            "name TEXT PRIMARY KEY, indexed_bytes INTEGER NOT NULL)"
+        )
+        # Plain logs: offset/length of the line. Archives: offset/length of the gzip member,
+        # block_line is the line number inside the member.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "file TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL, date TEXT NOT NULL, "
+            "event TEXT, session_id TEXT, timestamp TEXT, block_line INTEGER NOT NULL DEFAULT -1, "
+            "PRIMARY KEY (file, offset, block_line))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_events_session ON events (session_id, event)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events (date, event)")
+
+    def sync(self, files: Optional[Iterable[Path]] = None) -> int:
+        """
+        Index entries appended since the last sync
+
+        Args:
+            files: Log files to check (default: every session_*.log and session_*.log.gz in log_dir)
+
+        Returns:
+            Number of entries added to the index
+        """
+        full_sync = files is None
+        if full_sync:
+            files = list(self.log_dir.glob('session_*.log')) + list(self.log_dir.glob('session_*.log.gz'))
+        added = 0
+        with self._lock:
+            self._connect()
+            # One process advances the index at a time; others wait on the SQLite lock
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                known = dict(self._db.execute("SELECT name, indexed_bytes FROM indexed_files"))
+                if full_sync:
+                    # Drop entries of files that were deleted (or archived by another process)
+                    for name in set(known) - {Path(f).name for f in files}:
+                        self._forget(name)
+                for log_file in files:
+                    log_file = Path(log_file)
+                    if log_file.suffix == '.gz':
+                        added += self._sync_archive(log_file, known.get(log_file.name, 0))
+                    else:
+                        added += self._sync_file(log_file, known.get(log_file.name, 0))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return added
+
+    def replace_with_archive(self, log_file: Path, archive_file: Path) -> int:
+        """
+        Point a log file's index entries at its archive (in one transaction)
+
+        Args:
+            log_file: Plain log file that was archived (it can be deleted afterwards)
+            archive_file: Block-compressed archive of the same entries
+
+        Returns:
+            Number of entries indexed from the archive
+        """
+        with self._lock:
+            self._connect()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._forget(log_file.name)
+                self._forget(archive_file.name)
+                added = self._sync_archive(archive_file, 0)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return added
+
+    def get_session_events(self, session_id: str, event: Optional[str] = None,
+                           limit: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Get a session's entries in the order they were logged
+
+        Args:
+            session_id: Session ID
+            event: Only entries of this event type (session_start, metric, ...)
+            limit: Max entries returned
+        """
+        query = "SELECT file, offset, length, block_line FROM events WHERE session_id = ?"
+        params = [session_id]
+        if event:
+            query += " AND event = ?"
+            params.append(event)
+        query += " ORDER BY date, offset, block_line LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        return self._read_entries(self._query(query, params))
+
+    def get_events(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   event: Optional[str] = None, limit: int = 1000, offset: int = 0) -> List[Dict[str, any]]:
+        """
+        Get entries logged between two dates (inclusive), oldest first
+
+        Args:
+            start_date: First day (YYYY-MM-DD), default no lower bound
+            end_date: Last day (YYYY-MM-DD), default no upper bound
+            event: Only entries of this event type
+            limit: Max entries returned
+            offset: Entries skipped (for paging)
+        """
+        query = "SELECT file, offset, length, block_line FROM events WHERE 1 = 1"
+        params = []
+        if start_date:
+            query += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND date <= ?"
+            params.append(end_date)
+        if event:
+            query += " AND event = ?"
+            params.append(event)
+        query += " ORDER BY date, offset, block_line LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return self._read_entries(self._query(query, params))
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get index size statistics"""
+        files, entries = self._query(
+            "SELECT (SELECT COUNT(*) FROM indexed_files), (SELECT COUNT(*) FROM events)", []
+        )[0]
+        return {"files": files, "entries": entries, "db_path": str(self.db_path)}
+
+    def close(self):
+        """Close the index database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _forget(self, file_name: str):
+        self._db.execute("DELETE FROM events WHERE file = ?", (file_name,))
+        self._db.execute("DELETE FROM indexed_files WHERE name = ?", (file_name,))
+
+    def _sync_file(self, log_file: Path, indexed_bytes: int) -> int:
+        """Index the complete lines appended to one file since indexed_bytes"""
+        try:
+            size = log_file.stat().st_size
+        except OSError:
+            return 0
+        if size < indexed_bytes:
+            # File was truncated or replaced - index it again from the start
+            self._db.execute("DELETE FROM events WHERE file = ?", (log_file.name,))
+            indexed_bytes = 0
+        if size == indexed_bytes:
+            return 0
+
+        date = log_file.name[len('session_'):len('session_YYYY-MM-DD')]
+        added = 0
+        position = indexed_bytes
+        with open(log_file, 'rb') as f:
+            f.seek(position)
+            pending = b''
+            while True:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                data = pending + chunk
+                # Only index complete lines; a partial last line waits for the next sync
+                end = data.rfind(b'\n') + 1
+                rows = []
+                line_start = 0
+                while line_start < end:
+                    line_end = data.index(b'\n', line_start) + 1
+                    row = self._parse_line(data[line_start:line_end], log_file.name, position + line_start,
+                                           line_end - line_start, -1, date)
+                    if row is not None:
+                        rows.append(row)
+                    line_start = line_end
+                self._insert(rows)
+                added += len(rows)
+                position += end
+                pending = data[end:]
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO indexed_files (name, indexed_bytes) VALUES (?, ?)", (log_file.name, position)
+        )
+        return added
+
+    def _sync_archive(self, archive_file: Path, indexed_bytes: int) -> int:
+        """Index an archive (archives are written once, so it is indexed whole or not at all)"""
+        try:
+            size = archive_file.stat().st_size
+        except OSError:
+            return 0
+        if size == indexed_bytes:
+            return 0
+        self._db.execute("DELETE FROM events WHERE file = ?", (archive_file.name,))
+
+        date = archive_file.name[len('session_'):len('session_YYYY-MM-DD')]
+        added = 0
+        with open(archive_file, 'rb') as f:
+            for member_offset, member_length, data in iter_gzip_members(f):
+                rows = []
+                for line_no, line in enumerate(data.splitlines()):
+                    row = self._parse_line(line, archive_file.name, member_offset, member_length, line_no, date)
+                    if row is not None:
+                        rows.append(row)
+                self._insert(rows)
+                added += len(rows)
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO indexed_files (name, indexed_bytes) VALUES (?, ?)", (archive_file.name, size)
+        )
+        return added
+
+    def _insert(self, rows):
+        self._db.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    @staticmethod
+    def _parse_line(line: bytes, file_name: str, offset: int, length: int, block_line: int, date: str):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None  # Skip corrupted lines
+        if not isinstance(entry, dict):
+            return None
+        return (file_name, offset, length, date, entry.get("event"),
+                entry.get("session_id"), entry.get("timestamp"), block_line)
+
+    def _query(self, query: str, params: List[any]):
+        with self._lock:
+            self._connect()
+            return self._db.execute(query, params).fetchall()
+
+    def _read_entries(self, locations) -> List[Dict[str, any]]:
+        """Read entries at their indexed locations, reusing one handle per file and the last decompressed block"""
+        entries = []
+        handles = {}
+        block_key, block_lines = None, None
+        try:
+            for file_name, offset, length, block_line in locations:
+                f = handles.get(file_name)
+                if f is None:
+                    try:
+                        f = handles[file_name] = open(self.log_dir / file_name, 'rb')
+                    except OSError:
+                        continue
+                try:
+                    if block_line < 0:
+                        f.seek(offset)
+                        entries.append(json.loads(f.read(length)))
+                        continue
+                    if block_key != (file_name, offset):
+                        f.seek(offset)
+                        block_key = (file_name, offset)
+                        block_lines = zlib.decompress(f.read(length), wbits=31).splitlines()
+                    entries.append(json.loads(block_lines[block_line]))
+                except (ValueError, IndexError, zlib.error):
+                    continue
+        finally:
+            for f in handles.values():
+                f.close()
+        return entries
@@ -0,0 +1,204 @@
+"""
+Session Log Writer
+Buffered, thread-safe JSON-lines writer for the session log
+Entries are queued and written in batches from a background thread; each batch
+is one locked append, so threads and worker processes never interleave lines
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from pathlib import Path
+from typing import Optional, List, Tuple, Dict, Callable
+from service import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows - batches are still written with a single append call
+    fcntl = None
+
+FSYNC_POLICIES = ("never", "batch", "always")
+
+
+class SessionLogWriter:
+    """Queues log lines and appends them to their daily file from a background thread"""
+
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 max_queue_size: Optional[int] = None, fsync: Optional[str] = None,
+                 after_batch: Optional[Callable[[List[Path]], None]] = None):
+        """
+        Initialize session log writer
+
+        Args:
+            batch_size: Max entries written per batch (env SESSION_LOG_BATCH_SIZE, default 200)
+            flush_interval: Max seconds an entry waits before it is written (env SESSION_LOG_FLUSH_INTERVAL, default 0.5)
+            max_queue_size: Max queued entries; when full, entries are written by the caller
+                (env SESSION_LOG_QUEUE_SIZE, default 10000)
+            fsync: "never" (leave it to the OS), "batch" (fsync after each batch) or "always"
+                (write and fsync each entry before returning, no background thread)
+                (env SESSION_LOG_FSYNC, default "never")
+            after_batch: Called with the files written after each batch (e.g. to update an index)
+        """
+        self.batch_size = batch_size or int(os.getenv('SESSION_LOG_BATCH_SIZE', '200'))
+        self.flush_interval = flush_interval or float(os.getenv('SESSION_LOG_FLUSH_INTERVAL', '0.5'))
+        self.fsync = (fsync or os.getenv('SESSION_LOG_FSYNC', 'never')).lower()
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"SESSION_LOG_FSYNC must be one of {', '.join(FSYNC_POLICIES)}")
+
+        self.after_batch = after_batch
+        self._queue = queue.Queue(maxsize=max_queue_size or int(os.getenv('SESSION_LOG_QUEUE_SIZE', '10000')))
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._worker = None
+        self._stopping = threading.Event()
+        self._file = None
+        self._file_path = None
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "direct_writes": 0, "errors": 0}
+        atexit.register(self.stop)
+
+    def write(self, log_file: Path, entry: Dict[str, any]):
+        """
+        Queue an entry to be appended to a log file (never blocks on I/O unless the queue is full)
+
+        Args:
+            log_file: Daily log file the entry belongs to
+            entry: JSON-serializable log entry
+        """
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        if self.fsync == "always":
+            self._write_batch([(Path(log_file), line)])
+            self._stats["direct_writes"] += 1
+            return
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((Path(log_file), line))
+            self._stats["queued"] += 1
+        except queue.Full:
+            # Don't drop entries - write this one on the caller's thread
+            self._write_batch([(Path(log_file), line)])
+            self._stats["direct_writes"] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until all queued entries have been written
+
+        Returns:
+            True if the queue drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Write pending entries, stop the worker thread and close the file"""
+        if self._worker is not None and self._worker.is_alive():
+            self.flush(timeout)
+            self._stopping.set()
+            self._worker.join(timeout)
+        with self._write_lock:
+            self._close_file()
+
+    def get_stats(self) -> Dict[str, any]:
+        """Get writer statistics"""
+        return {
+            **self._stats,
+            "pending": self._queue.qsize(),
+            "fsync": self.fsync,
+            "worker_alive": self._worker is not None and self._worker.is_alive()
+        }
+
+    def _ensure_worker(self):
+        """Start the background worker on first use"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name="session-log-writer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Worker loop: write whatever is queued, at least every flush_interval"""
+        while not self._stopping.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Keep the worker alive - drop the bad batch, later entries are still written
+                self._stats["errors"] += 1
+                print(f"[WARNING] Session log writer dropped {len(batch)} entries: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _collect_batch(self) -> List[Tuple[Path, str]]:
+        """Block until an entry is queued (or flush_interval elapses), then take up to batch_size entries"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch: List[Tuple[Path, str]]):
+        """Append a batch, one locked write per log file (a batch can span midnight)"""
+        by_file = {}
+        for log_file, line in batch:
+            by_file.setdefault(log_file, []).append(line)
+
+        with self._write_lock, metrics.session_log_write_duration.time(event="batch"):
+            for log_file, lines in by_file.items():
+                try:
+                    self._append(log_file, ''.join(lines))
+                    self._stats["written"] += len(lines)
+                except OSError as e:
+                    self._stats["errors"] += 1
+                    print(f"[WARNING] Could not write session log: {str(e)}")
+            self._stats["batches"] += 1
+
+        if self.after_batch is not None:
+            try:
+                self.after_batch(list(by_file))
+            except Exception as e:
+                print(f"[WARNING] Session log post-write hook failed: {str(e)}")
+
+    def _append(self, log_file: Path, data: str):
+        """Append data to a log file, keeping the handle open until the day rolls over"""
+        # Reopen when the day rolls over, or when the file was moved away (archived or deleted)
+        if self._file_path != log_file or not log_file.exists():
+            self._close_file()
+            self._file = open(log_file, 'a', encoding='utf-8')
+            self._file_path = log_file
+
+        if fcntl is not None:
+            # Exclusive lock so batches from other worker processes don't interleave
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+            self._file_path = None
@@ -0,0 +1,123 @@
+"""
+Startup
+Deferred, run-once initialization of backend services with a timing report
+Importing the backend does no network I/O; services are built in the background
+at app creation or on first use, whichever comes first
+"""
+import time
+import threading
+from typing import Optional, Callable, Dict, List
+
+
+class LazyService:
+    """Builds a service once, on first use or in a background thread"""
+
+    def __init__(self, name: str, factory: Callable[[], any], retry_interval: float = 30.0):
+        """
+        Initialize lazy service
+
+        Args:
+            name: Name shown in the startup report
+            factory: Builds the service. May raise; the error is kept and the service is None.
+            retry_interval: Seconds before a failed build is attempted again on use
+        """
+        self.name = name
+        self.factory = factory
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        self._failed_at = None
+        self._init_seconds = None
+
+    def get(self) -> Optional[any]:
+        """Get the service, building it first if needed. Returns None if the build failed."""
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._value is None and self._should_build():
+                self._build()
+            return self._value
+
+    def peek(self) -> Optional[any]:
+        """Get the service if it is already built (never blocks)"""
+        return self._value
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """Error from the last failed build, if any"""
+        return self._error
+
+    def start(self) -> threading.Thread:
+        """Build the service in a background thread"""
+        thread = threading.Thread(target=self.get, name=f"init-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first build attempt to finish. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def get_status(self) -> Dict[str, any]:
+        """Get the build state ("pending", "ready" or "failed") and how long the build took"""
+        if self._value is not None:
+            state = "ready"
+        elif self._error is not None:
+            state = "failed"
+        else:
+            state = "pending"
+        status = {
+            "state": state,
+            "init_ms": round(self._init_seconds * 1000, 1) if self._init_seconds is not None else None
+        }
+        if self._error is not None and self._value is None:
+            status["error"] = str(self._error)
+        return status
+
+    def _should_build(self) -> bool:
+        return self._failed_at is None or time.monotonic() - self._failed_at >= self.retry_interval
+
+    def _build(self):
+        start = time.perf_counter()
+        try:
+            self._value = self.factory()
+            self._error = None
+            self._failed_at = None
+        except Exception as e:
+            self._error = e
+            self._failed_at = time.monotonic()
+        finally:
+            self._init_seconds = time.perf_counter() - start
+            self._done.set()
+
+
+def start_all(services: List[LazyService], budget: float) -> Dict[str, any]:
+    """
+    Build services concurrently, waiting at most `budget` seconds in total
+
+    Services that are still building when the budget runs out keep building in
+    the background; callers that need them block on first use.
+
+    Args:
+        services: Services to build
+        budget: Max seconds to wait (0 returns immediately)
+
+    Returns:
+        Startup report: elapsed_ms, budget_exceeded, and the status of each service
+    """
+    start = time.perf_counter()
+    for service in services:
+        service.start()
+    deadline = start + budget
+    for service in services:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0 or not service.wait(remaining):
+            break
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "budget_ms": round(budget * 1000, 1),
+        "budget_exceeded": not all(service.wait(0) for service in services),
+        "services": {service.name: service.get_status() for service in services}
+    }
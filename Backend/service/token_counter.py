@@ -0,0 +1,101 @@
+"""
+Token Counter
+Local token counts for chat messages (no API call)
+Uses tiktoken, or a conservative estimate when its encoding can't be loaded
+"""
+from functools import lru_cache
+from typing import Optional, Dict, List, Union
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# OpenAI chat format adds a few tokens of framing per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Encoding load failures are reported once, not once per model
+_load_warning_printed = False
+
+
+@lru_cache(maxsize=32)
+def _get_encoding(model: Optional[str]):
+    """
+    Get the tiktoken encoding for a model
+
+    Returns None if tiktoken is not installed or the encoding can't be loaded
+    (tiktoken downloads encodings on first use). The result is cached, so a
+    failed load is only attempted once per model.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except KeyError:
+        # Unknown model name - fall back to the default chat encoding
+        return _get_encoding(None) if model else None
+    except Exception as e:
+        global _load_warning_printed
+        if not _load_warning_printed:
+            _load_warning_printed = True
+            print(f"[WARNING] Could not load tiktoken encoding, using token estimates: {str(e)}")
+        return None
+
+
+def preload(model: Optional[str] = None) -> bool:
+    """
+    Load the encoding for a model ahead of the first count (tiktoken may download it)
+
+    Returns:
+        True if tiktoken counts are available, False if estimates will be used
+    """
+    return _get_encoding(model) is not None
+
+
+# Texts longer than this are counted without caching, so the cache can't pin large attachments in memory
+MAX_CACHED_TEXT_LENGTH = 64 * 1024
+
+
+def _count(text: str, model: Optional[str]) -> int:
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Deliberately high so trimmed prompts still fit: English runs ~4 characters (bytes) per token,
+    # code and non-Latin scripts fewer, and CJK about one character (3 UTF-8 bytes) per token
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+_count_cached = lru_cache(maxsize=4096)(_count)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens in a piece of text
+
+    Results are cached per (text, model), so history messages that are resent
+    on every turn are only counted once.
+
+    Args:
+        text: Text to count
+        model: Model name (selects the tiktoken encoding)
+    """
+    if not text:
+        return 0
+    if len(text) > MAX_CACHED_TEXT_LENGTH:
+        return _count(text, model)
+    return _count_cached(text, model)
+
+
+def count_message_tokens(message: Dict[str, Union[str, List[Dict[str, any]]]], model: Optional[str] = None) -> int:
+    """
+    Count the tokens a chat message contributes to the prompt
+
+    Multimodal content (a list of parts) is counted by its text parts.
+    """
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        texts = [part.get("text") for part in content if isinstance(part, dict)]
+        return sum(count_tokens(text, model) for text in texts if isinstance(text, str)) + MESSAGE_OVERHEAD_TOKENS
+    if not isinstance(content, str):
+        return MESSAGE_OVERHEAD_TOKENS
+    return count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
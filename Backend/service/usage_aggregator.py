@@ -0,0 +1,372 @@
+"""
+Usage Aggregator
+Thread-safe OpenAI usage counters per model, per user and per session,
+with cost estimates priced per model
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows - state files of finished workers are not compacted
+    fcntl = None
+
+# Pricing per 1K tokens as of 2024 (approximate, may vary)
+COST_PER_1K_TOKENS = {
+    "gpt-4": {"prompt": 0.03, "completion": 0.06},
+    "gpt-4-turbo": {"prompt": 0.01, "completion": 0.03},
+    "gpt-4-turbo-preview": {"prompt": 0.01, "completion": 0.03},
+    "gpt-4-0125-preview": {"prompt": 0.01, "completion": 0.03},
+    "gpt-3.5-turbo": {"prompt": 0.0015, "completion": 0.002},
+    "gpt-3.5-turbo-16k": {"prompt": 0.003, "completion": 0.004},
+}
+
+# Counter slots, kept as a flat list per key so an update is a few list index adds
+_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "request_count",
+    "cache_hits",
+    "cached_prompt_tokens_saved",
+    "cached_completion_tokens_saved",
+    "coalesced_requests",
+    "coalesced_tokens_saved",
+)
+(_PROMPT, _COMPLETION, _TOTAL, _REQUESTS, _CACHE_HITS, _SAVED_PROMPT, _SAVED_COMPLETION,
+ _COALESCED, _COALESCED_SAVED) = range(len(_FIELDS))
+
+
+def get_model_pricing(model: str) -> Dict[str, float]:
+    """Get per-1K-token pricing for a model, handling model name variations"""
+    model = model or "gpt-3.5-turbo"
+    model_key = model
+    if "gpt-4" in model and "turbo" in model:
+        model_key = "gpt-4-turbo"
+    elif "gpt-3.5" in model and "16k" in model:
+        model_key = "gpt-3.5-turbo-16k"
+    elif "gpt-3.5" in model:
+        model_key = "gpt-3.5-turbo"
+    elif "gpt-4" in model:
+        model_key = "gpt-4"
+    return COST_PER_1K_TOKENS.get(model_key, COST_PER_1K_TOKENS["gpt-3.5-turbo"])
+
+
+def _to_dict(counters) -> Dict[str, int]:
+    return dict(zip(_FIELDS, counters))
+
+
+# Counters of exited workers (see UsageAggregator.compact)
+COMPACTED_STATE_FILE = "usage_compacted.json"
+
+
+def _read_state(state_file: Path) -> Optional[Dict[str, any]]:
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _state_file_pid(state_file: Path) -> Optional[int]:
+    """pid of the worker that wrote a state file (usage_<pid>_<id>.json)"""
+    try:
+        return int(state_file.stem.split('_')[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return True  # Not a worker's file - leave it alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class UsageAggregator:
+    """Lock-protected usage counters with O(1) updates and bounded per-user/per-session maps"""
+
+    def __init__(self, max_users: Optional[int] = None, max_sessions: Optional[int] = None,
+                 state_dir: Optional[str] = None):
+        """
+        Initialize usage aggregator
+
+        Args:
+            max_users: Max users tracked, least recently active dropped first (env USAGE_MAX_USERS, default 10000)
+            max_sessions: Max sessions tracked, least recently active dropped first (env USAGE_MAX_SESSIONS, default 10000)
+            state_dir: Directory shared by all worker processes (env USAGE_STATE_DIR). When set, each
+                process periodically writes its counters there and snapshots merge every process's
+                counters, so stats are correct no matter which worker serves the request. Files of
+                workers that have exited are folded into usage_compacted.json when a worker starts.
+        """
+        self.max_users = max_users or int(os.getenv('USAGE_MAX_USERS', '10000'))
+        self.max_sessions = max_sessions or int(os.getenv('USAGE_MAX_SESSIONS', '10000'))
+        self._lock = threading.Lock()
+        self._totals = [0] * len(_FIELDS)
+        self._by_model = {}
+        self._by_user = OrderedDict()
+        self._by_session = OrderedDict()
+        self._last_model = None
+        self._last_update = 0.0
+
+        state_dir = state_dir or os.getenv('USAGE_STATE_DIR')
+        self.state_dir = Path(state_dir) if state_dir else None
+        self.persist_interval = float(os.getenv('USAGE_STATE_INTERVAL', '2.0'))
+        self._state_file = None
+        self._dirty = threading.Event()
+        self._persister = None
+        if self.state_dir is not None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            # pid alone can be reused by a later worker, which would overwrite a finished worker's counts
+            self._state_file = self.state_dir / f"usage_{os.getpid()}_{uuid.uuid4().hex[:8]}.json"
+            atexit.register(self.persist)
+            self.compact()
+
+    def record(self, model: str, username: Optional[str], session_id: Optional[str], usage: Dict[str, any]):
+        """
+        Record the usage of one chat request
+
+        Args:
+            model: Model the request was sent to
+            username: Username ('guest' for guests)
+            session_id: Session ID, if known
+            usage: Usage dict returned by OpenAIService
+        """
+        delta = [0] * len(_FIELDS)
+        delta[_PROMPT] = usage.get("prompt_tokens", 0)
+        delta[_COMPLETION] = usage.get("completion_tokens", 0)
+        delta[_TOTAL] = usage.get("total_tokens", 0)
+        delta[_REQUESTS] = 1
+        if usage.get("cached"):
+            delta[_CACHE_HITS] = 1
+            delta[_SAVED_PROMPT] = usage.get("saved_prompt_tokens", 0)
+            delta[_SAVED_COMPLETION] = usage.get("saved_completion_tokens", 0)
+        elif usage.get("coalesced"):
+            # Shared another request's OpenAI call; the tokens are counted on that request
+            delta[_COALESCED] = 1
+            delta[_COALESCED_SAVED] = usage.get("saved_tokens", 0)
+
+        model = model or "unknown"
+        with self._lock:
+            self._last_model = model
+            self._last_update = time.time()
+            self._add(self._totals, delta)
+            self._add(self._by_model.setdefault(model, [0] * len(_FIELDS)), delta)
+            self._add(self._bounded(self._by_user, username or "guest", self.max_users), delta)
+            if session_id:
+                self._add(self._bounded(self._by_session, session_id, self.max_sessions), delta)
+
+        if self._state_file is not None:
+            self._dirty.set()
+            self._ensure_persister()
+
+    def snapshot(self, default_model: Optional[str] = None) -> Dict[str, any]:
+        """
+        Get a consistent copy of all counters with per-model cost estimates
+
+        Args:
+            default_model: Model reported as "model" when nothing has been recorded yet
+
+        Returns:
+            Dict with the cumulative totals (total_prompt_tokens, total_completion_tokens, total_tokens,
+            request_count, cache and coalescing counters), "model" (last model used), cost estimates summed over
+            models, and "by_model" / "by_user" breakdowns
+        """
+        state = self._merged_state()
+        totals = state["totals"]
+        by_model = state["by_model"]
+        by_user = {u: _to_dict(c) for u, c in state["by_user"].items()}
+        last_model = state["last_model"]
+
+        prompt_cost = completion_cost = savings = 0.0
+        models = {}
+        for model, counters in by_model.items():
+            pricing = get_model_pricing(model)
+            model_prompt_cost = (counters[_PROMPT] / 1000) * pricing["prompt"]
+            model_completion_cost = (counters[_COMPLETION] / 1000) * pricing["completion"]
+            model_savings = (counters[_SAVED_PROMPT] / 1000) * pricing["prompt"] + \
+                (counters[_SAVED_COMPLETION] / 1000) * pricing["completion"]
+            prompt_cost += model_prompt_cost
+            completion_cost += model_completion_cost
+            savings += model_savings
+            models[model] = {
+                **_to_dict(counters),
+                "estimated_cost_usd": round(model_prompt_cost + model_completion_cost, 4),
+                "cache_savings_usd": round(model_savings, 4)
+            }
+
+        return {
+            "total_prompt_tokens": totals[_PROMPT],
+            "total_completion_tokens": totals[_COMPLETION],
+            "total_tokens": totals[_TOTAL],
+            "request_count": totals[_REQUESTS],
+            "cache_hits": totals[_CACHE_HITS],
+            "cached_prompt_tokens_saved": totals[_SAVED_PROMPT],
+            "cached_completion_tokens_saved": totals[_SAVED_COMPLETION],
+            "coalesced_requests": totals[_COALESCED],
+            "coalesced_tokens_saved": totals[_COALESCED_SAVED],
+            "model": last_model or default_model or "unknown",
+            "estimated_cost_usd": round(prompt_cost + completion_cost, 4),
+            "prompt_cost_usd": round(prompt_cost, 4),
+            "completion_cost_usd": round(completion_cost, 4),
+            "cache_savings_usd": round(savings, 4),
+            "by_model": models,
+            "by_user": by_user
+        }
+
+    def get_session_usage(self, session_id: str) -> Optional[Dict[str, int]]:
+        """Get the counters of one session, or None if it is not tracked"""
+        counters = self._merged_state()["by_session"].get(session_id)
+        return _to_dict(counters) if counters is not None else None
+
+    def persist(self):
+        """Write this process's counters to the shared state directory (no-op without state_dir)"""
+        if self._state_file is None or not self.state_dir.exists():
+            return
+        self._dirty.clear()
+        state = self._export()
+        tmp_file = self._state_file.with_suffix('.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            # Atomic replace so readers never see a partial file
+            os.replace(tmp_file, self._state_file)
+        except OSError as e:
+            print(f"[WARNING] Could not persist usage stats: {str(e)}")
+
+    def compact(self) -> int:
+        """
+        Fold the state files of exited worker processes into usage_compacted.json and delete them
+
+        Keeps the number of files merged by snapshots at the number of live workers
+        (plus one) when workers are recycled. Skipped while another process compacts.
+
+        Returns:
+            Number of state files folded
+        """
+        if self._state_file is None or fcntl is None:
+            return 0
+        with open(self.state_dir / '.compact.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0  # Another worker is compacting, or a snapshot is reading
+            compacted_file = self.state_dir / COMPACTED_STATE_FILE
+            merged = self._empty_state()
+            finished = []
+            worker_files = sorted(self.state_dir.glob("usage_*_*.json"), key=lambda f: f.stat().st_mtime)
+            for state_file in [compacted_file] + worker_files:
+                if state_file != compacted_file and _pid_alive(_state_file_pid(state_file)):
+                    continue
+                state = _read_state(state_file)
+                if state is not None:
+                    self._merge(merged, state)
+                if state_file != compacted_file:
+                    finished.append(state_file)
+            if not finished:
+                return 0
+            for dimension, max_keys in (("by_user", self.max_users), ("by_session", self.max_sessions)):
+                # Oldest workers' keys were merged first
+                keys = list(merged[dimension])
+                for key in keys[:max(0, len(keys) - max_keys)]:
+                    del merged[dimension][key]
+            tmp_file = compacted_file.with_suffix('.tmp')
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(merged, f)
+                os.replace(tmp_file, compacted_file)
+                for state_file in finished:
+                    state_file.unlink()
+            except OSError as e:
+                print(f"[WARNING] Could not compact usage stats: {str(e)}")
+                return 0
+            return len(finished)
+
+    def _export(self) -> Dict[str, any]:
+        """Copy this process's raw counters"""
+        with self._lock:
+            return {
+                "totals": list(self._totals),
+                "by_model": {m: list(c) for m, c in self._by_model.items()},
+                "by_user": {u: list(c) for u, c in self._by_user.items()},
+                "by_session": {s: list(c) for s, c in self._by_session.items()},
+                "last_model": self._last_model,
+                "last_update": self._last_update
+            }
+
+    def _merged_state(self) -> Dict[str, any]:
+        """Raw counters of this process, merged with every other process's when state_dir is set"""
+        if self._state_file is None:
+            return self._export()
+
+        self.persist()
+        merged = self._empty_state()
+        with open(self.state_dir / '.compact.lock', 'w') as lock_file:
+            if fcntl is not None:
+                # Shared: a compaction moving counts between files never runs while we read
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+            for state_file in self.state_dir.glob("usage_*.json"):
+                state = _read_state(state_file)
+                if state is not None:
+                    self._merge(merged, state)
+        return merged
+
+    @staticmethod
+    def _empty_state() -> Dict[str, any]:
+        return {"totals": [0] * len(_FIELDS), "by_model": {}, "by_user": {}, "by_session": {},
+                "last_model": None, "last_update": 0.0}
+
+    @classmethod
+    def _merge(cls, merged: Dict[str, any], state: Dict[str, any]):
+        """Add a process's raw counters (see _export) to merged"""
+        cls._add(merged["totals"], state["totals"])
+        for dimension in ("by_model", "by_user", "by_session"):
+            for key, counters in state[dimension].items():
+                cls._add(merged[dimension].setdefault(key, [0] * len(_FIELDS)), counters)
+        if state["last_model"] and state["last_update"] >= merged["last_update"]:
+            merged["last_model"] = state["last_model"]
+            merged["last_update"] = state["last_update"]
+
+    def _ensure_persister(self):
+        """Start the background thread that persists counters after updates"""
+        if self._persister is not None and self._persister.is_alive():
+            return
+        with self._lock:
+            if self._persister is None or not self._persister.is_alive():
+                self._persister = threading.Thread(target=self._persist_loop, name="usage-persister", daemon=True)
+                self._persister.start()
+
+    def _persist_loop(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.persist_interval)
+            self.persist()
+
+    @staticmethod
+    def _add(counters, delta):
+        for i, value in enumerate(delta):
+            counters[i] += value
+
+    @staticmethod
+    def _bounded(counters_by_key: OrderedDict, key: str, max_keys: int):
+        """Get (or create) the counters of a key, dropping the least recently used key when full"""
+        counters = counters_by_key.get(key)
+        if counters is None:
+            counters = counters_by_key[key] = [0] * len(_FIELDS)
+            if len(counters_by_key) > max_keys:
+                counters_by_key.popitem(last=False)
+        else:
+            counters_by_key.move_to_end(key)
+        return counters
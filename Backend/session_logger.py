@@ -3,20 +3,43 @@ Session Logger Module
 Handles session logging with daily rotation and metrics tracking
 """
 import os
+import time
+import secrets
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import json
 from pathlib import Path
+from service.session_log_writer import SessionLogWriter
+from service.session_log_index import SessionLogIndex
+from service.session_log_archive import SessionLogArchiver
 
 class SessionLogger:
     """Manages session logging with daily file rotation"""
     
-    def __init__(self, log_dir='SessionLog'):
+    def __init__(self, log_dir='SessionLog', writer=None, idle_timeout=None, max_open_sessions=None):
         # Get absolute path relative to project root (parent of Backend directory)
         base_path = Path(__file__).parent.parent
         self.log_dir = base_path / log_dir
         self.log_dir.mkdir(exist_ok=True)
-        self.current_session_id = None
-        self.session_start_time = None
+        # Open sessions of this process: session_id -> state, least recently active first.
+        # Idle sessions are stopped with a synthetic session_stop (env SESSION_IDLE_TIMEOUT, default 1800s).
+        self.idle_timeout = idle_timeout or float(os.getenv('SESSION_IDLE_TIMEOUT', '1800'))
+        self.max_open_sessions = max_open_sessions or int(os.getenv('SESSION_MAX_OPEN', '100000'))
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self._last_started = None
+        # Idle sessions are also stopped from a background thread, so they end without new session traffic
+        self.evict_interval = min(60.0, self.idle_timeout / 2)
+        self._evictor = None
+        self._evictor_stopping = threading.Event()
+        # Byte-offset index of entries, updated after each write batch
+        self.index = SessionLogIndex(self.log_dir)
+        # Entries are written in batches from a background thread (see SessionLogWriter)
+        self.writer = writer or SessionLogWriter(after_batch=self.index.sync)
+        # Compresses logs older than SESSION_LOG_ARCHIVE_DAYS when set (started by the app, see start_archiving)
+        self.archiver = SessionLogArchiver(self.log_dir, index=self.index)
         
     def _get_log_file_path(self):
         """Get the log file path for today"""
@@ -24,37 +47,138 @@ class SessionLogger:
         return self.log_dir / f'session_{today}.log'
     
     def _append_to_log(self, entry):
-        """Append an entry to the current day's log file"""
-        log_file = self._get_log_file_path()
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        """Queue an entry for the current day's log file"""
+        self.writer.write(self._get_log_file_path(), entry)
+    
+    def flush(self, timeout=5.0):
+        """Wait until all logged entries are written to disk"""
+        return self.writer.flush(timeout)
+    
+    @property
+    def current_session_id(self):
+        """Most recently started session that is still open (for single-user use; None if stopped)"""
+        with self._sessions_lock:
+            return self._last_started if self._last_started in self._sessions else None
     
     def start_session(self):
-        """Start a new session and log it"""
-        self.session_start_time = datetime.now()
-        self.current_session_id = f"session_{self.session_start_time.strftime('%Y%m%d_%H%M%S')}"
+        """
+        Start a new session and log it
+        
+        Session IDs are session_YYYYMMDD_HHMMSS_<random hex>, so sessions started
+        in the same second (or by different workers) never collide.
+        """
+        start_time = datetime.now()
+        session_id = f"session_{start_time.strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(4)}"
+        
+        with self._sessions_lock:
+            self._sessions[session_id] = {
+                "start_time": start_time,
+                "last_active": time.monotonic(),
+                "events": 0,
+                "metrics": 0
+            }
+            self._last_started = session_id
         
         entry = {
             "event": "session_start",
-            "session_id": self.current_session_id,
-            "timestamp": self.session_start_time.isoformat(),
-            "date": self.session_start_time.strftime('%Y-%m-%d')
+            "session_id": session_id,
+            "timestamp": start_time.isoformat(),
+            "date": start_time.strftime('%Y-%m-%d')
         }
         
         self._append_to_log(entry)
-        return self.current_session_id
+        self.evict_idle_sessions()
+        self._ensure_evictor()
+        return session_id
     
     def stop_session(self, session_id=None, metrics=None):
-        """Stop the current session and log it with metrics"""
+        """Stop a session (default: the most recently started one) and log it with metrics"""
         if session_id is None:
             session_id = self.current_session_id
         
+        with self._sessions_lock:
+            state = self._sessions.pop(session_id, None)
+        entry = self._log_session_stop(session_id, state, metrics)
+        self.evict_idle_sessions()
+        return entry
+    
+    def touch_session(self, session_id):
+        """Record activity on a session (keeps it from being stopped as idle)"""
+        with self._sessions_lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state["last_active"] = time.monotonic()
+                state["events"] += 1
+                self._sessions.move_to_end(session_id)
+    
+    def get_open_sessions(self):
+        """Get the number of open sessions in this process and the idle timeout"""
+        with self._sessions_lock:
+            return {
+                "open_sessions": len(self._sessions),
+                "max_open_sessions": self.max_open_sessions,
+                "idle_timeout": self.idle_timeout
+            }
+    
+    def evict_idle_sessions(self):
+        """
+        Stop sessions idle longer than idle_timeout (and the least recently active ones
+        over max_open_sessions), logging a synthetic session_stop for each
+        
+        Returns:
+            Number of sessions stopped
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        with self._sessions_lock:
+            while self._sessions:
+                session_id, state = next(iter(self._sessions.items()))
+                if state["last_active"] > cutoff and len(self._sessions) <= self.max_open_sessions:
+                    break
+                self._sessions.popitem(last=False)
+                evicted.append((session_id, state, "idle_timeout" if state["last_active"] <= cutoff else "evicted"))
+        
+        if evicted:
+            self._sync_index_quietly()
+        for session_id, state, reason in evicted:
+            if self._has_logged_stop(session_id):
+                continue  # Stopped through another worker process
+            self._log_session_stop(session_id, state, {}, reason=reason)
+        return len(evicted)
+    
+    def _ensure_evictor(self):
+        """Start the background thread that stops idle sessions (on the first session)"""
+        if self._evictor is not None and self._evictor.is_alive():
+            return
+        with self._sessions_lock:
+            if self._evictor is None or not self._evictor.is_alive():
+                self._evictor_stopping.clear()
+                self._evictor = threading.Thread(target=self._evict_loop, name="session-evictor", daemon=True)
+                self._evictor.start()
+    
+    def stop_evicting(self):
+        """Stop the background thread that stops idle sessions"""
+        self._evictor_stopping.set()
+    
+    def _evict_loop(self):
+        """Evictor loop: stop idle sessions every evict_interval seconds"""
+        while not self._evictor_stopping.wait(self.evict_interval):
+            try:
+                self.evict_idle_sessions()
+            except Exception as e:
+                print(f"[WARNING] Could not stop idle sessions: {str(e)}")
+    
+    def _log_session_stop(self, session_id, state, metrics, reason=None):
         stop_time = datetime.now()
         
         # Calculate session duration if start time is available
         duration_seconds = None
-        if self.session_start_time:
-            duration_seconds = (stop_time - self.session_start_time).total_seconds()
+        start_time = state["start_time"] if state else None
+        if start_time is None:
+            # Session may have been started by another worker process - recover start time from its ID
+            start_time = self._parse_session_start(session_id)
+        if start_time:
+            duration_seconds = (stop_time - start_time).total_seconds()
         
         entry = {
             "event": "session_stop",
@@ -64,17 +188,99 @@ class SessionLogger:
             "duration_seconds": duration_seconds,
             "metrics": metrics or {}
         }
+        if state:
+            entry["counters"] = {"events": state["events"], "metrics": state["metrics"]}
+        if reason:
+            # Synthetic stop (the client never stopped the session)
+            entry["reason"] = reason
         
         self._append_to_log(entry)
+        return entry
+    
+    def _sync_index_quietly(self):
+        try:
+            self.index.sync()
+        except Exception as e:
+            print(f"[WARNING] Session log index sync failed: {str(e)}")
+    
+    def _has_logged_stop(self, session_id):
+        """Check the index for a session_stop of this session (e.g. logged by another worker)"""
+        try:
+            return bool(self.index.get_session_events(session_id, event="session_stop", limit=1))
+        except Exception:
+            return False
+    
+    def get_session_events(self, session_id, event=None, limit=None):
+        """
+        Get a session's logged entries (uses the index, no file scan)
         
-        # Reset session tracking
-        self.current_session_id = None
-        self.session_start_time = None
+        Args:
+            session_id: Session ID
+            event: Only entries of this event type (session_start, session_stop, metric)
+            limit: Max entries returned
         
-        return entry
+        Returns:
+            List of log entries, oldest first
+        """
+        self._sync_index()
+        events = self.index.get_session_events(session_id, event=event, limit=limit)
+        return [self.archiver.payloads.resolve(e) for e in events]
+    
+    def get_events(self, start_date=None, end_date=None, event=None, limit=1000, offset=0):
+        """
+        Get entries logged between two dates, inclusive (uses the index, no file scan)
+        
+        Args:
+            start_date: First day (YYYY-MM-DD), default no lower bound
+            end_date: Last day (YYYY-MM-DD), default no upper bound
+            event: Only entries of this event type
+            limit: Max entries returned
+            offset: Entries skipped (for paging)
+        
+        Returns:
+            List of log entries, oldest first
+        """
+        self._sync_index()
+        events = self.index.get_events(start_date, end_date, event=event, limit=limit, offset=offset)
+        return [self.archiver.payloads.resolve(e) for e in events]
+    
+    def iter_events(self, start_date=None, end_date=None, event=None):
+        """
+        Stream all entries between two dates from plain and archived logs (constant memory)
+        
+        Args:
+            start_date: First day (YYYY-MM-DD), default no lower bound
+            end_date: Last day (YYYY-MM-DD), default no upper bound
+            event: Only entries of this event type
+        """
+        self.flush()
+        return self.archiver.iter_events(start_date, end_date, event=event)
+    
+    def start_archiving(self):
+        """Archive old logs now and periodically in the background (no-op unless SESSION_LOG_ARCHIVE_DAYS is set)"""
+        self.archiver.start()
+    
+    def _sync_index(self):
+        """Write pending entries and index anything appended since the last sync (e.g. by other workers)"""
+        self.flush()
+        self.index.sync()
+    
+    @staticmethod
+    def _parse_session_start(session_id):
+        """Get the start time encoded in a session ID (session_YYYYMMDD_HHMMSS), or None"""
+        try:
+            return datetime.strptime(session_id[len('session_'):len('session_') + 15], '%Y%m%d_%H%M%S')
+        except (TypeError, ValueError):
+            return None
     
     def log_metric(self, session_id, metric_name, metric_value):
-        """Log a metric for the current session"""
+        """Log a metric for a session"""
+        with self._sessions_lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                state["last_active"] = time.monotonic()
+                state["metrics"] += 1
+                self._sessions.move_to_end(session_id)
         entry = {
             "event": "metric",
             "session_id": session_id,
@@ -87,12 +293,40 @@ class SessionLogger:
         self._append_to_log(entry)
     
     def log_project_init(self, project_criteria):
-        """Log initial project organization criteria"""
+        """
+        Log initial project organization criteria
+        
+        Logged once per day: skipped if today's log already has a project_init
+        entry with the same criteria (restarts, reloader and worker processes).
+        
+        Returns:
+            True if the entry was written, False if it was already logged
+        """
+        criteria_hash = hashlib.sha256(
+            json.dumps(project_criteria, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:16]
+        self.flush()
+        if self._has_project_init(criteria_hash):
+            return False
+        
         entry = {
             "event": "project_init",
             "timestamp": datetime.now().isoformat(),
             "date": datetime.now().strftime('%Y-%m-%d'),
+            "criteria_hash": criteria_hash,
             "project_criteria": project_criteria
         }
         
         self._append_to_log(entry)
+        # Written right away so other worker processes starting now see it
+        self.flush()
+        return True
+    
+    def _has_project_init(self, criteria_hash):
+        """Check whether today's log already has a project_init entry with this criteria hash"""
+        log_file = self._get_log_file_path()
+        if not log_file.exists():
+            return False
+        marker = f'"criteria_hash": "{criteria_hash}"'
+        with open(log_file, 'r', encoding='utf-8') as f:
+            return any(marker in line for line in f)
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from main import create_app
+
+app = create_app()
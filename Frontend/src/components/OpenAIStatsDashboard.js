@@ -155,6 +155,16 @@ function OpenAIStatsDashboard({ isOpen, onClose }) {
                     <div className="stat-label">Completion Tokens</div>
                     <div className="stat-value">{formatNumber(stats.total_completion_tokens || 0)}</div>
                   </div>
+
+                  {stats.cache_hits > 0 && (
+                    <div className="stat-card">
+                      <div className="stat-label">Cache Hits</div>
+                      <div className="stat-value">{formatNumber(stats.cache_hits)}</div>
+                      <div className="stat-note">
+                        {formatNumber((stats.cached_prompt_tokens_saved || 0) + (stats.cached_completion_tokens_saved || 0))} tokens / {formatCurrency(stats.cache_savings_usd || 0)} saved
+                      </div>
+                    </div>
+                  )}
                 </div>
               </div>
 
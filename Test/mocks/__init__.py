@@ -0,0 +1,4 @@
+"""
+Test Mocks
+Fake upstream servers (OpenAI, Papita API) for offline tests and load tests
+"""
@@ -0,0 +1,223 @@
+"""
+Fake Upstreams
+In-process stand-ins for the OpenAI chat completions API and the Papita API
+(/api/credentials, /api/usage/log) with configurable latency, token counts
+and error rates, so the backend can be exercised fully offline
+"""
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict
+
+
+class UpstreamBehavior:
+    """How a fake upstream answers: latency, token counts and injected errors"""
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, prompt_tokens: int = 50,
+                 completion_tokens: int = 20, error_rate: float = 0.0, error_status: int = 503,
+                 retry_after: Optional[float] = None, stream_chunks: int = 5):
+        """
+        Args:
+            latency: Seconds before answering
+            latency_jitter: Extra random latency, uniform in [0, latency_jitter]
+            prompt_tokens / completion_tokens: Token counts reported in usage
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status of injected errors
+            retry_after: Retry-After header (seconds) sent with injected errors
+            stream_chunks: Number of content chunks in streamed completions
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+
+    def wait(self):
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Dispatches to the FakeUpstream that owns the server"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def send_json(self, status: int, data, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.upstream.handle(self, "GET", None)
+
+    def do_POST(self):
+        self.server.upstream.handle(self, "POST", self._read_json())
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog (5) drops connections of concurrent load tests
+    request_queue_size = 1024
+
+
+class FakeUpstream:
+    """A fake HTTP API on 127.0.0.1 (random port), served from a background thread"""
+
+    def __init__(self, behavior: Optional[UpstreamBehavior] = None):
+        self.behavior = behavior or UpstreamBehavior()
+        self._server = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeUpstream":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.upstream = self
+        threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, field: str):
+        with self._lock:
+            self._stats[field] = self._stats.get(field, 0) + 1
+
+    def handle(self, handler: _Handler, method: str, body):
+        """Answer a request: injected error, else the route's response"""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+        try:
+            self.behavior.wait()
+            if self.behavior.should_fail():
+                self._count("errors")
+                headers = {}
+                if self.behavior.retry_after is not None:
+                    headers["Retry-After"] = str(self.behavior.retry_after)
+                handler.send_json(self.behavior.error_status, {"error": {"message": "Injected error", "type": "fake_error"}}, headers)
+                return
+            self.route(handler, method, handler.path.split("?")[0], body)
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+
+    def route(self, handler: _Handler, method: str, path: str, body):
+        handler.send_json(404, {"error": {"message": f"Not found: {path}"}})
+
+
+class FakeOpenAI(FakeUpstream):
+    """
+    Fake OpenAI API: POST /v1/chat/completions (also streamed) and GET /v1/models
+
+    Point the backend at it with OPENAI_BASE_URL=<url>/v1
+    """
+
+    def route(self, handler, method, path, body):
+        if method == "GET" and path == "/v1/models":
+            handler.send_json(200, {"object": "list", "data": [{"id": "gpt-fake", "object": "model", "created": 0, "owned_by": "fake"}]})
+        elif method == "POST" and path == "/v1/chat/completions":
+            self._count("completions")
+            if body.get("stream"):
+                self._stream(handler, body)
+            else:
+                handler.send_json(200, self._completion(body))
+        else:
+            super().route(handler, method, path, body)
+
+    def _usage(self) -> Dict[str, int]:
+        behavior = self.behavior
+        return {"prompt_tokens": behavior.prompt_tokens, "completion_tokens": behavior.completion_tokens,
+                "total_tokens": behavior.prompt_tokens + behavior.completion_tokens}
+
+    def _completion(self, body) -> Dict[str, any]:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Fake answer."}, "finish_reason": "stop"}],
+            "usage": self._usage()
+        }
+
+    def _stream(self, handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "gpt-fake")}
+        events = [{**base, "choices": [{"index": 0, "delta": {"content": f"chunk {i} "}, "finish_reason": None}]}
+                  for i in range(self.behavior.stream_chunks)]
+        events.append({**base, "choices": [], "usage": self._usage()})
+        for event in events:
+            handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+
+
+class FakePapita(FakeUpstream):
+    """
+    Fake Papita API: GET /api/credentials/global/openai, POST /api/usage/log and GET /api/health
+
+    Point the backend at it with PAPITA_API_URL=<url>. Logged usage records are kept in usage_records.
+    """
+
+    def __init__(self, behavior: Optional[UpstreamBehavior] = None, api_key: str = "sk-fake-papita"):
+        super().__init__(behavior)
+        self.api_key = api_key
+        self.usage_records = []
+
+    def route(self, handler, method, path, body):
+        if method == "GET" and path == "/api/credentials/global/openai":
+            handler.send_json(200, {"credentials": {"credentials": {"api_key": self.api_key}}})
+        elif method == "POST" and path == "/api/usage/log":
+            with self._lock:
+                self.usage_records.append(body)
+            handler.send_json(200, {"success": True})
+        elif method == "GET" and path == "/api/health":
+            handler.send_json(200, {"status": "ok"})
+        else:
+            super().route(handler, method, path, body)
@@ -0,0 +1,289 @@
+"""
+Benchmark Runner
+Micro-benchmarks of the CPU work of assembling a chat request and its response,
+across payload sizes (1KB-10MB attachments, 10-1000 turn histories):
+    parse_chat_request: request JSON -> chat request (get_chat_body + build_chat_request,
+        attachments inlined or searched)
+    build_attachment_message: attachment prompt within the character budget
+    build_messages: history copy + context window trim (OpenAIService._build_messages)
+    cache_key: request key used by the response cache and request coalescing
+    estimate_prompt_tokens: prompt token estimate used by routing and admission control
+    jsonify_response: /api/chat response body -> JSON response
+    session_log_write: session log entry -> JSON line, queued (SessionLogWriter.write)
+
+Results can be saved as a baseline; later runs are compared with it and
+regressions beyond a threshold are reported (exit code 1).
+
+Usage:
+    cd Test
+    python run_benchmarks.py --save-baseline
+    python run_benchmarks.py                      # compare with the saved baseline
+    python run_benchmarks.py --quick --filter history --threshold 0.5
+"""
+import os
+import sys
+import io
+import gc
+import json
+import time
+import platform
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+DEFAULT_BASELINE = Path(__file__).parent / "reports" / "benchmark_baseline.json"
+
+KB = 1024
+ATTACHMENT_SIZES = [KB, 10 * KB, 100 * KB, 1024 * KB, 10 * 1024 * KB]
+HISTORY_TURNS = [10, 100, 1000]
+RESPONSE_SIZES = [KB, 10 * KB, 100 * KB]
+QUICK_ATTACHMENT_SIZES = [KB, 100 * KB]
+QUICK_HISTORY_TURNS = [10, 100]
+QUICK_RESPONSE_SIZES = [KB]
+
+
+def format_size(size):
+    return f"{size // (1024 * KB)}MB" if size >= 1024 * KB else f"{size // KB}KB"
+
+
+def make_text(size):
+    """Prose-like text of about size bytes"""
+    words = ("the backend assembles each chat request from the message history and attached files "
+             "before it is sent upstream ").split()
+    text = " ".join(f"{words[i % len(words)]}{i % 97}" for i in range(size // 6 + 1))
+    return text[:size]
+
+
+def make_history(turns):
+    """Alternating user/assistant messages of a few hundred bytes"""
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": make_text(300 + i % 50)} for i in range(turns)]
+
+
+def measure(fn, min_time=0.2, repeat=7):
+    """
+    Time fn
+
+    Calls it once to warm up (caches, indexes), then in loops long enough
+    (min_time / repeat each) to be measurable, repeat times, and reports per-call
+    times. Garbage collection is off while timing, as in timeit.
+
+    Returns:
+        {"median_ms", "min_ms", "calls"}
+    """
+    fn()
+    target = min_time / repeat
+    number = 1
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= target:
+                break
+            number = max(number * 2, int(number * target / max(elapsed, 1e-9)))
+        times = [elapsed / number]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "min_ms": round(min(times) * 1000, 4),
+        "calls": number * repeat
+    }
+
+
+def build_benchmarks(quick=False):
+    """
+    Set up the benchmarks
+
+    Returns:
+        List of (name, zero-argument function)
+    """
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+    import main
+    from flask import Flask, jsonify
+    from service.attachment_store import build_attachment_message
+    from service.response_cache import make_cache_key
+    from service.openai_service import OpenAIService
+    from service.session_log_writer import SessionLogWriter
+
+    attachment_sizes = QUICK_ATTACHMENT_SIZES if quick else ATTACHMENT_SIZES
+    history_turns = QUICK_HISTORY_TURNS if quick else HISTORY_TURNS
+    response_sizes = QUICK_RESPONSE_SIZES if quick else RESPONSE_SIZES
+
+    app = Flask(__name__)
+    app.register_blueprint(main.api)
+    openai_service = OpenAIService(main.credential_manager, context_manager=main.context_manager)
+    model = openai_service.model
+    writer = SessionLogWriter()
+    benchmarks = []
+
+    for size in attachment_sizes:
+        label = format_size(size)
+        attached_files = [{"name": "data.txt", "content": make_text(size)}]
+        body = json.dumps({"message": "Summarize the retry settings", "attached_files": attached_files,
+                           "username": "bench", "isGuest": False})
+
+        def parse_chat_request(body=body):
+            with app.test_request_context('/api/chat', method='POST', data=body, content_type='application/json'):
+                chat_request, error = main.build_chat_request(main.get_chat_body())
+                assert error is None, error
+
+        benchmarks.append((f"parse_chat_request[attachment={label}]", parse_chat_request))
+        benchmarks.append((f"build_attachment_message[{label}]",
+                           lambda attached_files=attached_files: build_attachment_message(attached_files, "Summarize")))
+
+    for turns in history_turns:
+        history = make_history(turns)
+        messages = history + [{"role": "user", "content": "Next question"}]
+        chat_request = {"history": history, "effective_message": "Next question"}
+        benchmarks.append((f"build_messages[history={turns}]",
+                           lambda history=history: openai_service._build_messages("Next question", history, model)))
+        benchmarks.append((f"cache_key[history={turns}]", lambda messages=messages: make_cache_key(model, messages)))
+        benchmarks.append((f"estimate_prompt_tokens[history={turns}]",
+                           lambda chat_request=chat_request: main.estimate_prompt_tokens(chat_request, model)))
+
+    for size in response_sizes:
+        label = format_size(size)
+        response = {
+            "message": make_text(size),
+            "usage": {"prompt_tokens": 1200, "completion_tokens": size // 4, "total_tokens": 1200 + size // 4, "model": model,
+                      "context": {"budget": 7168, "dropped_messages": 0, "dropped_tokens": 0, "prompt_tokens_estimate": 1200}},
+            "timestamp": datetime.now().isoformat(),
+            "attachments": [{"name": "data.txt", "size": size, "chars": size, "truncated": False}]
+        }
+
+        def jsonify_response(response=response):
+            with app.app_context():
+                jsonify(response).get_data()
+
+        entry = {"event": "metric", "session_id": "session_20260101_000000_bench", "metric_name": "chat_response",
+                 "metric_value": response, "timestamp": datetime.now().isoformat(), "date": "2026-01-01"}
+        benchmarks.append((f"jsonify_response[{label}]", jsonify_response))
+        # Entries are written to the null device, so only the request thread's cost is measured
+        benchmarks.append((f"session_log_write[{label}]", lambda entry=entry: writer.write(Path(os.devnull), entry)))
+
+    return benchmarks
+
+
+def run_benchmarks(quick=False, name_filter=None, min_time=0.2, repeat=7, verbose=True):
+    """
+    Run the benchmarks
+
+    Returns:
+        Dict of benchmark name -> {"median_ms", "min_ms", "calls"}
+    """
+    results = {}
+    for name, fn in build_benchmarks(quick):
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(fn, min_time=min_time, repeat=repeat)
+        if verbose:
+            print(f"   {name:<48}{results[name]['min_ms']:>12.4f} ms  (median {results[name]['median_ms']:.4f} ms, {results[name]['calls']} calls)")
+    return results
+
+
+def load_baseline(path):
+    """Benchmark results of a saved baseline (empty if there is none)"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8')).get("results", {})
+
+
+def save_baseline(path, results):
+    """Save results as the baseline, with the machine they were measured on"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }, indent=2, sort_keys=True), encoding='utf-8')
+
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Find regressions: benchmarks more than threshold (fraction) slower than the baseline
+
+    Compares the fastest repeat (min_ms), which is the least affected by other load on the machine.
+
+    Returns:
+        List of {"name", "baseline_ms", "current_ms", "change"} (change as a fraction), slowest first
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or not baseline[name]["min_ms"]:
+            continue
+        change = result["min_ms"] / baseline[name]["min_ms"] - 1
+        if change > threshold:
+            regressions.append({"name": name, "baseline_ms": baseline[name]["min_ms"],
+                                "current_ms": result["min_ms"], "change": round(change, 3)})
+    return sorted(regressions, key=lambda r: r["change"], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request assembly micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Fewer payload sizes")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each benchmark (default 0.2)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help=f"Baseline file (default {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Save the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown (fraction of the baseline) reported as a regression (default 0.25)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  Request Assembly Benchmarks")
+    print("="*60)
+    results = run_benchmarks(quick=args.quick, name_filter=args.filter, min_time=args.min_time)
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(results, indent=2, sort_keys=True), encoding='utf-8')
+
+    if args.save_baseline:
+        # Keep baseline entries of benchmarks that weren't run (--quick, --filter)
+        save_baseline(args.baseline, {**load_baseline(args.baseline), **results})
+        print(f"\n[OK] Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print(f"\n[WARNING] No baseline at {args.baseline} - run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"[REGRESSION] {regression['name']}: {regression['baseline_ms']} ms -> {regression['current_ms']} ms "
+              f"(+{regression['change'] * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"\n[OK] No regressions over {args.threshold * 100:.0f}% ({len(set(results) & set(baseline))} benchmarks compared)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Load Test Runner
+Runs the backend against fake OpenAI and Papita servers (fully offline, no API key
+needed) and drives /api/chat, /api/openai/usage and the session endpoints at a set
+concurrency. Reports throughput and p50/p95/p99 latency per endpoint.
+
+Usage:
+    cd Test
+    python run_load_test.py --concurrency 16 --duration 10
+    python run_load_test.py --asgi --concurrency 500 --duration 10    # async chat endpoints (uvicorn)
+    python run_load_test.py --openai-latency 0.5 --openai-error-rate 0.05 --json reports/load.json
+"""
+import os
+import sys
+import io
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import httpx
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend and Test to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from mocks.fake_upstreams import FakeOpenAI, FakePapita, UpstreamBehavior
+
+# Relative weights of the operations each worker picks from
+DEFAULT_MIX = {"chat": 8, "usage": 1, "session": 1}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Throughput and latency percentiles per endpoint
+
+    Args:
+        samples: List of (endpoint, status, latency seconds)
+        elapsed: Wall time of the run in seconds
+
+    Returns:
+        Dict of endpoint (and "all") -> {"requests", "errors", "throughput", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+    """
+    by_endpoint = {}
+    for endpoint, status, latency in samples:
+        by_endpoint.setdefault(endpoint, []).append((status, latency))
+        by_endpoint.setdefault("all", []).append((status, latency))
+
+    report = {}
+    for endpoint, results in by_endpoint.items():
+        latencies = sorted(latency for _, latency in results)
+        report[endpoint] = {
+            "requests": len(results),
+            "errors": sum(1 for status, _ in results if not 200 <= status < 300),
+            "throughput": round(len(results) / elapsed, 1) if elapsed else 0.0,
+            **{f"p{int(q * 100)}_ms": round(percentile(latencies, q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+            "max_ms": round(latencies[-1] * 1000, 1)
+        }
+    return report
+
+
+def run_load(base_url, concurrency=8, duration=10.0, max_requests=None, users=50, mix=None):
+    """
+    Drive the backend from concurrency worker threads
+
+    Each worker loops over operations picked by weight from mix:
+        chat: POST /api/chat with a unique message, as one of users usernames, in the worker's session
+        usage: GET /api/openai/usage
+        session: POST /api/session/stop for the worker's session, then POST /api/session/start
+
+    Args:
+        base_url: Backend URL
+        concurrency: Number of workers (sharing one client with a keep-alive connection per worker)
+        duration: Seconds to run
+        max_requests: Stop after this many operations in total (None: run for duration)
+        users: Number of distinct usernames used in chat requests
+        mix: Operation -> weight (default DEFAULT_MIX)
+
+    Returns:
+        Tuple of (samples [(endpoint, status, latency)], elapsed seconds)
+    """
+    mix = mix or DEFAULT_MIX
+    operations, weights = zip(*mix.items())
+    samples = []
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def take_ticket():
+        with samples_lock:
+            if max_requests is not None and issued[0] >= max_requests:
+                return False
+            issued[0] += 1
+            return True
+
+    # One client for all workers: building a client per worker (TLS context and all) takes
+    # long enough to delay the start of large runs
+    client = httpx.Client(base_url=base_url, timeout=60.0,
+                          limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency))
+
+    def worker(number):
+        rng = random.Random(number)
+        results = []
+
+        def call(endpoint, method, path, **kwargs):
+            start = time.perf_counter()
+            try:
+                response = client.request(method, path, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError:
+                response, status = None, 599
+            results.append((endpoint, status, time.perf_counter() - start))
+            return response
+
+        response = call("session/start", "POST", "/api/session/start")
+        session_id = response.json().get("session_id") if response is not None and response.status_code == 200 else None
+        sequence = 0
+        while time.perf_counter() < deadline and take_ticket():
+            operation = rng.choices(operations, weights)[0]
+            sequence += 1
+            if operation == "chat":
+                call("chat", "POST", "/api/chat", json={
+                    "message": f"Load test message {number}-{sequence}",
+                    "username": f"load-user-{rng.randrange(users)}",
+                    "isGuest": False,
+                    "sessionId": session_id
+                })
+            elif operation == "usage":
+                call("usage", "GET", "/api/openai/usage")
+            else:
+                call("session/stop", "POST", "/api/session/stop", json={"session_id": session_id, "metrics": {"sequence": sequence}})
+                response = call("session/start", "POST", "/api/session/start")
+                session_id = response.json().get("session_id") if response is not None and response.status_code == 200 else None
+        with samples_lock:
+            samples.extend(results)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-{i}") for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    client.close()
+    return samples, elapsed
+
+
+class OfflineBackend:
+    """
+    The backend app served on 127.0.0.1 (random port), talking to fake OpenAI and Papita servers
+
+    Environment is set before main is imported, so create this before anything imports main.
+    Session logs go to a temporary directory. With asgi=True the ASGI app (async chat
+    endpoints, see async_api.py) is served by uvicorn instead of the Flask app by werkzeug.
+    """
+
+    def __init__(self, openai_behavior=None, papita_behavior=None, admission=False, asgi=False, env=None):
+        self.openai = FakeOpenAI(openai_behavior).start()
+        self.papita = FakePapita(papita_behavior).start()
+        self.asgi = asgi
+        self._server = None
+        self._thread = None
+        self._port = None
+        self._env = {
+            "OPENAI_BASE_URL": f"{self.openai.url}/v1",
+            "PAPITA_API_URL": self.papita.url,
+            "OPENAI_API_KEY": "sk-fake-env",
+            "OPENAI_MODEL": "gpt-fake",
+            "RESPONSE_CACHE_ENABLED": "false",
+            "ADMISSION_CONTROL_ENABLED": "true" if admission else "false",
+            "ATTACHMENT_DIR": tempfile.mkdtemp(),
+            **(env or {})
+        }
+
+    def start(self):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class QuietRequestHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        os.environ.update(self._env)
+        import main
+        from session_logger import SessionLogger
+        main.session_logger = SessionLogger(log_dir=tempfile.mkdtemp())
+        self.main = main
+        if self.asgi:
+            self._start_uvicorn()
+            return self
+        self._server = make_server("127.0.0.1", 0, main.create_app(), threaded=True,
+                                   request_handler=QuietRequestHandler)
+        self._port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, name="backend", daemon=True)
+        self._thread.start()
+        return self
+
+    def _start_uvicorn(self):
+        import uvicorn
+        from async_api import create_asgi_app
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self._port = sock.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(create_asgi_app(), log_level="warning", access_log=False,
+                                                     backlog=4096))
+        self._thread = threading.Thread(target=self._server.run, kwargs={"sockets": [sock]}, name="backend", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.01)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._port}"
+
+    def stop(self):
+        if self.asgi and self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(10)
+        elif self._server is not None:
+            self._server.shutdown()
+        self.main.papita_usage_logger.flush()
+        self.openai.stop()
+        self.papita.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def print_report(report):
+    print(f"\n{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for endpoint in sorted(report, key=lambda e: (e == "all", e)):
+        row = report[endpoint]
+        print(f"{endpoint:<16}{row['requests']:>10}{row['errors']:>8}{row['throughput']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the AL-Chat backend")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (default 8)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (default 10)")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many operations")
+    parser.add_argument("--users", type=int, default=50, help="Distinct usernames in chat requests (default 50)")
+    parser.add_argument("--mix", type=json.loads, default=None,
+                        help=f"Operation weights as JSON (default {json.dumps(DEFAULT_MIX)})")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="Fake OpenAI latency in seconds (default 0.05)")
+    parser.add_argument("--openai-jitter", type=float, default=0.05, help="Fake OpenAI extra random latency (default 0.05)")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="Fraction of fake OpenAI errors (default 0)")
+    parser.add_argument("--openai-error-status", type=int, default=503, help="Status of fake OpenAI errors (default 503)")
+    parser.add_argument("--prompt-tokens", type=int, default=50, help="Prompt tokens reported by fake OpenAI")
+    parser.add_argument("--completion-tokens", type=int, default=20, help="Completion tokens reported by fake OpenAI")
+    parser.add_argument("--papita-latency", type=float, default=0.01, help="Fake Papita latency in seconds (default 0.01)")
+    parser.add_argument("--papita-error-rate", type=float, default=0.0, help="Fraction of fake Papita errors (default 0)")
+    parser.add_argument("--admission", action="store_true", help="Keep admission control (rate limits) enabled")
+    parser.add_argument("--asgi", action="store_true", help="Serve the ASGI app (async chat endpoints) with uvicorn")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    openai_behavior = UpstreamBehavior(latency=args.openai_latency, latency_jitter=args.openai_jitter,
+                                       prompt_tokens=args.prompt_tokens, completion_tokens=args.completion_tokens,
+                                       error_rate=args.openai_error_rate, error_status=args.openai_error_status)
+    papita_behavior = UpstreamBehavior(latency=args.papita_latency, error_rate=args.papita_error_rate)
+
+    print("="*60)
+    print("  AL-Chat Offline Load Test")
+    print("="*60)
+    with OfflineBackend(openai_behavior, papita_behavior, admission=args.admission, asgi=args.asgi) as backend:
+        print(f"   Backend: {backend.url} ({'ASGI' if args.asgi else 'WSGI'}), fake OpenAI: {backend.openai.url}, "
+              f"fake Papita: {backend.papita.url}")
+        print(f"   Concurrency: {args.concurrency}, duration: {args.duration}s")
+        samples, elapsed = run_load(backend.url, concurrency=args.concurrency, duration=args.duration,
+                                    max_requests=args.requests, users=args.users, mix=args.mix)
+        report = summarize(samples, elapsed)
+        upstreams = {"openai": backend.openai.get_stats(), "papita": backend.papita.get_stats()}
+
+    print_report(report)
+    print(f"\n   Elapsed: {elapsed:.1f}s, fake OpenAI: {upstreams['openai']}, fake Papita: {upstreams['papita']}")
+
+    if args.json:
+        path = Path(args.json)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"config": vars(args), "elapsed": round(elapsed, 3), "endpoints": report,
+                                    "upstreams": upstreams}, indent=2), encoding='utf-8')
+        print(f"   Report written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
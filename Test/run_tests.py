@@ -26,6 +26,29 @@ def main():
     tests = [
         ("test_credentials.py", "Testing Credential Manager"),
         ("test_openai_service.py", "Testing OpenAI Service (requires .env)"),
+        ("test_streaming.py", "Testing OpenAI Streaming"),
+        ("test_papita_usage_logger.py", "Testing Papita Usage Logger"),
+        ("test_http_clients.py", "Testing Shared HTTP Clients"),
+        ("test_response_cache.py", "Testing Response Cache"),
+        ("test_request_coalescing.py", "Testing Request Coalescing"),
+        ("test_chat_batch.py", "Testing Chat Batch"),
+        ("test_resilience.py", "Testing Resilience"),
+        ("test_admission.py", "Testing Admission Control"),
+        ("test_model_router.py", "Testing Model Router"),
+        ("test_load_harness.py", "Testing Load Harness"),
+        ("test_benchmarks.py", "Testing Benchmarks"),
+        ("test_async_api.py", "Testing Async API"),
+        ("test_conversation_store.py", "Testing Conversation Store"),
+        ("test_context_window.py", "Testing Context Window"),
+        ("test_usage_aggregator.py", "Testing Usage Aggregator"),
+        ("test_metrics.py", "Testing Metrics"),
+        ("test_startup.py", "Testing Startup"),
+        ("test_session_log_writer.py", "Testing Session Log Writer"),
+        ("test_session_log_index.py", "Testing Session Log Index"),
+        ("test_session_log_archive.py", "Testing Session Log Archive"),
+        ("test_session_registry.py", "Testing Session Registry"),
+        ("test_attachments.py", "Testing Attachments"),
+        ("test_attachment_retrieval.py", "Testing Attachment Retrieval"),
         ("test_backend.py", "Testing Backend API (requires server running)"),
     ]
     
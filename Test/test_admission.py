@@ -0,0 +1,162 @@
+"""
+Admission Control Test Script
+Tests token-bucket rate limits per user, session and model: bounded queueing,
+fast rejection with Retry-After and token reservations settled to actual usage
+(no API key needed)
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+
+import main
+from flask import Flask
+from service.admission import AdmissionController, AdmissionRejected
+
+
+def make_controller(**limits):
+    """Controller with only the given limits enabled"""
+    settings = {"user_rpm": 0, "user_tpm": 0, "guest_rpm": 0, "guest_tpm": 0, "session_rpm": 0,
+                "model_rpm": 0, "model_tpm": 0, "model_limits": {}, "max_wait": 1}
+    settings.update(limits)
+    return AdmissionController(**settings)
+
+
+def try_admit(controller, username="alice", is_guest=False, session_id=None, model="gpt-test", tokens=10):
+    """Admit a request. Returns the ticket or the AdmissionRejected error."""
+    try:
+        return controller.admit(username, is_guest, session_id, model, tokens)
+    except AdmissionRejected as e:
+        return e
+
+
+def test_queue_and_reject():
+    """Test that short waits are queued and long ones rejected with retry_after"""
+    print("\n" + "="*60)
+    print("  Testing Queueing and Rejection")
+    print("="*60)
+
+    controller = make_controller(user_tpm=6000)
+    burst = try_admit(controller, tokens=6000)
+    start = time.perf_counter()
+    queued = try_admit(controller, tokens=30)
+    waited = time.perf_counter() - start
+    rejected = try_admit(controller, tokens=3000)
+
+    print(f"   Queued for {waited:.2f}s, rejected: {rejected}, stats: {controller.get_stats()}")
+    ok = burst.waited == 0 and 0.2 <= waited < 1 and isinstance(rejected, AdmissionRejected) \
+        and rejected.http_status == 429 and 25 < rejected.retry_after < 35 \
+        and controller.get_stats()["queued"] == 1 and controller.get_stats()["rejected"] == 1
+    print("[OK] Short waits queued, long waits rejected" if ok else "[ERROR] Queueing incorrect")
+    assert ok
+    return ok
+
+
+def test_settle_to_actual_usage():
+    """Test that unused reserved tokens are given back and overruns are charged"""
+    print("\n" + "="*60)
+    print("  Testing Token Settlement")
+    print("="*60)
+
+    controller = make_controller(user_tpm=1000, max_wait=0)
+    ticket = try_admit(controller, tokens=1000)
+    before = try_admit(controller, tokens=500)
+    controller.settle(ticket, 100)
+    after = try_admit(controller, tokens=800)
+
+    overrun = make_controller(user_tpm=1000, max_wait=0)
+    overrun_ticket = try_admit(overrun, tokens=100)
+    overrun.settle(overrun_ticket, 1000)
+    charged = try_admit(overrun, tokens=100)
+
+    print(f"   Before settle: {type(before).__name__}, after: {type(after).__name__}, after overrun: {type(charged).__name__}")
+    ok = isinstance(before, AdmissionRejected) and not isinstance(after, AdmissionRejected) \
+        and isinstance(charged, AdmissionRejected)
+    print("[OK] Reservations settled" if ok else "[ERROR] Settlement incorrect")
+    assert ok
+    return ok
+
+
+def test_fair_keys():
+    """Test that guests, users, sessions and models are limited separately"""
+    print("\n" + "="*60)
+    print("  Testing Limit Keys")
+    print("="*60)
+
+    controller = make_controller(user_rpm=5, guest_rpm=3, session_rpm=2, max_wait=0)
+    guests = [try_admit(controller, "guest", True) for _ in range(4)]
+    alice = try_admit(controller, "alice")
+    sessions = [try_admit(controller, "bob", session_id="s1") for _ in range(3)] + [try_admit(controller, "bob", session_id="s2")]
+
+    models = make_controller(model_rpm=100, model_limits={"gpt-4": {"rpm": 1}}, max_wait=0)
+    gpt4 = [try_admit(models, f"user{i}", model="gpt-4-0613") for i in range(2)]
+    other = try_admit(models, "user3", model="gpt-3.5-turbo")
+
+    rejected = lambda results: [isinstance(r, AdmissionRejected) for r in results]
+    print(f"   Guests: {rejected(guests)}, alice: {isinstance(alice, AdmissionRejected)}, "
+          f"sessions: {rejected(sessions)}, gpt-4: {rejected(gpt4)}, other model: {isinstance(other, AdmissionRejected)}")
+    ok = rejected(guests) == [False, False, False, True] and not isinstance(alice, AdmissionRejected) \
+        and rejected(sessions) == [False, False, True, False] \
+        and rejected(gpt4) == [False, True] and not isinstance(other, AdmissionRejected)
+    print("[OK] Limits keyed correctly" if ok else "[ERROR] Limit keys incorrect")
+    assert ok
+    return ok
+
+
+class FakeOpenAIService:
+    model = "gpt-test"
+
+    def send_message(self, message, conversation_history=None, model=None, use_cache=True):
+        return {"message": "ok", "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5, "model": model}}
+
+
+def test_chat_rejected_with_retry_after():
+    """Test that /api/chat answers 429 with Retry-After once the user is over the limit"""
+    print("\n" + "="*60)
+    print("  Testing /api/chat Rejection")
+    print("="*60)
+
+    saved = (main.get_openai_service, main.admission_controller, main.papita_usage_logger.log)
+    main.get_openai_service = lambda: FakeOpenAIService()
+    main.admission_controller = make_controller(user_rpm=2, max_wait=0)
+    main.papita_usage_logger.log = lambda record: None
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(main.api)
+        client = app.test_client()
+        responses = [client.post('/api/chat', json={"message": "Hi", "username": "carol", "isGuest": False}) for _ in range(3)]
+        stream = client.post('/api/chat/stream', json={"message": "Hi", "username": "carol", "isGuest": False})
+    finally:
+        main.get_openai_service, main.admission_controller, main.papita_usage_logger.log = saved
+
+    last = responses[-1]
+    print(f"   Statuses: {[r.status_code for r in responses]}, Retry-After: {last.headers.get('Retry-After')}, "
+          f"body: {last.get_json()}, stream: {stream.status_code}")
+    ok = [r.status_code for r in responses] == [200, 200, 429] and int(last.headers["Retry-After"]) >= 1 \
+        and last.get_json()["retry_after"] > 0 and stream.status_code == 429
+    print("[OK] Over-limit chat rejected" if ok else "[ERROR] Over-limit chat not rejected")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_queue_and_reject, test_settle_to_actual_usage, test_fair_keys, test_chat_rejected_with_retry_after):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,303 @@
+"""
+Async API Test Script
+Tests the asyncio serving path against a fake OpenAI server: AsyncOpenAIService,
+async request coalescing and admission, and the ASGI app (async chat endpoints,
+everything else passed to the Flask app) - no API key needed
+"""
+import os
+import sys
+import io
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend and Test to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-async')
+os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+
+import httpx
+from starlette.testclient import TestClient
+import main
+import async_api
+from session_logger import SessionLogger
+from credentials.credential_manager import CredentialManager
+from service.async_openai_service import AsyncOpenAIService
+from service.response_cache import ResponseCache
+from service import http_clients
+from service.request_coalescer import RequestCoalescer
+from service.admission import AdmissionController, AdmissionRejected
+from service.resilience import CircuitBreaker, RetryPolicy, UpstreamRateLimitError
+from mocks.fake_upstreams import FakeOpenAI, UpstreamBehavior
+
+
+# One credential manager: its negative cache keeps failed Papita lookups from opening the shared "papita" circuit
+credential_manager = CredentialManager()
+
+
+def make_service(fake, **kwargs):
+    """AsyncOpenAIService talking to a fake OpenAI server, with its own circuit breaker and no retries"""
+    openai_service = AsyncOpenAIService(credential_manager, **kwargs)
+    openai_service.client.base_url = f"{fake.url}/v1"
+    openai_service.retry_policy = RetryPolicy(max_retries=0)
+    openai_service.breaker = CircuitBreaker("openai-async-test")
+    return openai_service
+
+
+class PatchedBackend:
+    """Serves chat requests from openai_service (async and Flask endpoints) without admission control or usage logging,
+    with session logs (including the startup events of the ASGI app) written to a temporary directory"""
+
+    def __init__(self, openai_service):
+        self.openai_service = openai_service
+
+    def __enter__(self):
+        self.saved = (async_api.get_async_openai_service, main.get_openai_service, main.admission_controller,
+                      main.papita_usage_logger.log, main.session_logger)
+
+        async def get_async_openai_service():
+            return self.openai_service
+
+        async_api.get_async_openai_service = get_async_openai_service
+        main.get_openai_service = lambda: self.openai_service
+        main.admission_controller = None
+        main.papita_usage_logger.log = lambda record: None
+        main.session_logger = SessionLogger(log_dir=tempfile.mkdtemp())
+        return self
+
+    def __exit__(self, *exc_info):
+        main.session_logger.writer.stop()
+        (async_api.get_async_openai_service, main.get_openai_service, main.admission_controller,
+         main.papita_usage_logger.log, main.session_logger) = self.saved
+
+
+def test_async_service():
+    """Test plain and streamed completions with AsyncOpenAI, and typed errors"""
+    print("\n" + "="*60)
+    print("  Testing Async OpenAI Service")
+    print("="*60)
+
+    async def scenario(fake, failing):
+        openai_service = make_service(fake)
+        result = await openai_service.send_message_async("Hi", [{"role": "user", "content": "Earlier"}])
+        chunks = [chunk async for chunk in openai_service.stream_message_async("Hi")]
+        try:
+            await make_service(failing).send_message_async("Hi")
+            error = None
+        except UpstreamRateLimitError as e:
+            error = e
+        return result, chunks, error
+
+    with FakeOpenAI(UpstreamBehavior(prompt_tokens=7, completion_tokens=3, stream_chunks=3)) as fake, \
+            FakeOpenAI(UpstreamBehavior(error_rate=1.0, error_status=429, retry_after=2)) as failing:
+        result, chunks, error = asyncio.run(scenario(fake, failing))
+        completions = fake.get_stats()["completions"]
+
+    deltas = [chunk["delta"] for chunk in chunks if "delta" in chunk]
+    print(f"   Result: {result}, deltas: {deltas}, final: {chunks[-1]['usage']}, error: {error and error.retry_after}")
+    ok = result["message"] == "Fake answer." and result["usage"]["total_tokens"] == 10 \
+        and len(deltas) == 3 and chunks[-1]["message"] == "".join(deltas) and chunks[-1]["usage"]["total_tokens"] == 10 \
+        and completions == 2 and error is not None and error.retry_after == 2
+    print("[OK] Async service correct" if ok else "[ERROR] Async service incorrect")
+    assert ok
+    return ok
+
+
+def test_async_coalescing_and_admission():
+    """Test that concurrent duplicates share one call (even if the first caller goes away) and admission waits don't block the loop"""
+    print("\n" + "="*60)
+    print("  Testing Async Coalescing and Admission")
+    print("="*60)
+
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def complete():
+        calls.append(time.perf_counter())
+        await asyncio.sleep(0.1)
+        return {"message": "shared"}
+
+    async def coalesce():
+        first = asyncio.ensure_future(coalescer.run_async("key", complete))
+        await asyncio.sleep(0.01)
+        others = [asyncio.ensure_future(coalescer.run_async("key", complete)) for _ in range(4)]
+        first.cancel()
+        return await asyncio.gather(*others)
+
+    results = asyncio.run(coalesce())
+    stats = coalescer.get_stats()
+
+    controller = AdmissionController(user_rpm=0, user_tpm=600, session_rpm=0, model_rpm=0, model_tpm=0, max_wait=1.0)
+    ticks = []
+
+    async def admit():
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.05)
+
+        ticker = asyncio.ensure_future(tick())
+        await controller.admit_async("alice", False, None, "gpt-test", 600)
+        ticket = await controller.admit_async("alice", False, None, "gpt-test", 5)
+        try:
+            await controller.admit_async("alice", False, None, "gpt-test", 600)
+            rejected = None
+        except AdmissionRejected as e:
+            rejected = e
+        ticker.cancel()
+        return ticket, rejected
+
+    ticket, rejected = asyncio.run(admit())
+
+    print(f"   Coalesced: {results}, stats: {stats}; admission waited {ticket.waited:.2f}s "
+          f"with {len(ticks)} loop ticks, rejected: {rejected}")
+    ok = len(calls) == 1 and all(r == ({"message": "shared"}, True) for r in results) \
+        and stats["calls"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0 \
+        and 0.3 < ticket.waited <= 1.0 and len(ticks) >= 5 and rejected is not None
+    print("[OK] Async coalescing and admission correct" if ok else "[ERROR] Async coalescing or admission incorrect")
+    assert ok
+    return ok
+
+
+class SlowResponseCache(ResponseCache):
+    """ResponseCache whose reads and writes block like a slow SQLite tier"""
+
+    def get(self, key):
+        time.sleep(0.2)
+        return super().get(key)
+
+    def set(self, key, value):
+        time.sleep(0.2)
+        super().set(key, value)
+
+
+def test_blocking_work_off_loop():
+    """Test that response cache reads and writes don't block the event loop, and each loop gets its own HTTP client"""
+    print("\n" + "="*60)
+    print("  Testing Blocking Work Off the Event Loop")
+    print("="*60)
+
+    ticks = []
+
+    async def scenario(fake):
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        ticker = asyncio.ensure_future(tick())
+        openai_service = make_service(fake, response_cache=SlowResponseCache(max_entries=10, ttl=60))
+        start = time.perf_counter()
+        results = await asyncio.gather(*[openai_service.send_message_async(f"Hi {i}") for i in range(4)])
+        elapsed = time.perf_counter() - start
+        ticker.cancel()
+        client = http_clients.get_async_openai_http_client()
+        await http_clients.aclose_async()
+        return results, elapsed, client
+
+    async def first_client():
+        return http_clients.get_async_openai_http_client()
+
+    with FakeOpenAI(UpstreamBehavior()) as fake:
+        results, elapsed, closed_client = asyncio.run(scenario(fake))
+        stale_client = asyncio.run(first_client())
+        new_client = asyncio.run(first_client())
+    stale_dropped = all(client is not stale_client for client in http_clients._async_clients.values())
+
+    print(f"   4 cached chats in {elapsed:.2f}s with {len(ticks)} loop ticks; client closed by aclose_async: "
+          f"{closed_client.is_closed}, new client per loop: {new_client is not stale_client}, stale dropped: {stale_dropped}")
+    ok = all(r["message"] == "Fake answer." for r in results) and elapsed < 0.8 and len(ticks) >= 10 \
+        and closed_client.is_closed and new_client is not stale_client and stale_dropped
+    print("[OK] Event loop not blocked" if ok else "[ERROR] Event loop blocked")
+    assert ok
+    return ok
+
+
+def test_asgi_endpoints():
+    """Test the async chat endpoints, errors, metrics, CORS and requests passed to the Flask app"""
+    print("\n" + "="*60)
+    print("  Testing ASGI Endpoints")
+    print("="*60)
+
+    with FakeOpenAI(UpstreamBehavior(prompt_tokens=7, completion_tokens=3, stream_chunks=3)) as fake, \
+            FakeOpenAI(UpstreamBehavior(error_rate=1.0, error_status=429, retry_after=2)) as failing:
+        with PatchedBackend(make_service(fake)) as backend, TestClient(async_api.create_asgi_app()) as client:
+            chat = client.post('/api/chat', json={"message": "Hi async", "username": "alice", "isGuest": False},
+                               headers={"Origin": "http://localhost:3000"})
+            stream = client.post('/api/chat/stream', json={"message": "Hi stream"})
+            invalid = client.post('/api/chat', content=b"not json", headers={"Content-Type": "application/json"})
+            empty = client.post('/api/chat', json={})
+            upload = client.post('/api/chat', data={"message": "Summarize"},
+                                 files={"files": ("notes.txt", b"Retries use exponential backoff.", "text/plain")})
+            health = client.get('/api/health', headers={"Origin": "http://localhost:3000"})
+            metrics_text = client.get('/api/metrics').text
+
+            backend.openai_service = make_service(failing)
+            rate_limited = client.post('/api/chat', json={"message": "Hi again"})
+
+    print(f"   Chat: {chat.status_code} {chat.json()}")
+    print(f"   Stream: {stream.status_code}, events: {stream.text.count('event: delta')} deltas, done: {'event: done' in stream.text}")
+    print(f"   Invalid: {invalid.status_code}, empty: {empty.status_code}, upload (Flask): {upload.status_code}, "
+          f"health (Flask): {health.status_code}, rate limited: {rate_limited.status_code} {rate_limited.headers.get('retry-after')}")
+    ok = chat.status_code == 200 and chat.json()["message"] == "Fake answer." and chat.json()["usage"]["total_tokens"] == 10 \
+        and chat.headers.get_list('access-control-allow-origin') == ["*"] \
+        and stream.status_code == 200 and stream.text.count('event: delta') == 3 and 'event: done' in stream.text \
+        and invalid.status_code == 400 and empty.status_code == 400 \
+        and upload.status_code == 200 and upload.json()["attachments"][0]["name"] == "notes.txt" \
+        and health.status_code == 200 and health.headers.get_list('access-control-allow-origin') == ["*"] \
+        and 'endpoint="/api/chat",method="POST",status="200"' in metrics_text \
+        and 'endpoint="/api/chat/stream",method="POST",status="200"' in metrics_text \
+        and rate_limited.status_code == 429 and rate_limited.headers.get('retry-after') == "2"
+    print("[OK] ASGI endpoints correct" if ok else "[ERROR] ASGI endpoints incorrect")
+    assert ok
+    return ok
+
+
+def test_concurrent_chats():
+    """Test that concurrent chats are all in flight upstream at once (not bounded by a thread pool)"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Async Chats")
+    print("="*60)
+
+    count = 200
+
+    async def scenario(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://asgi", timeout=60.0) as client:
+            return await asyncio.gather(*[
+                client.post('/api/chat', json={"message": f"Concurrent message {i}", "username": f"user-{i}", "isGuest": False})
+                for i in range(count)
+            ])
+
+    with FakeOpenAI(UpstreamBehavior(latency=2.0)) as fake, PatchedBackend(make_service(fake)):
+        start = time.perf_counter()
+        responses = asyncio.run(scenario(async_api.create_asgi_app()))
+        elapsed = time.perf_counter() - start
+        stats = fake.get_stats()
+
+    statuses = [r.status_code for r in responses]
+    print(f"   {count} chats in {elapsed:.1f}s, statuses: {set(statuses)}, upstream: {stats}")
+    ok = statuses == [200] * count and stats["completions"] == count and stats["max_in_flight"] == count
+    print("[OK] Concurrent chats all in flight" if ok else "[ERROR] Concurrent chats were serialized")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_async_service, test_async_coalescing_and_admission, test_blocking_work_off_loop, test_asgi_endpoints,
+                 test_concurrent_chats):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
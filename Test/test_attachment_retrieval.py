@@ -0,0 +1,152 @@
+"""
+Attachment Retrieval Test Script
+Tests BM25 search over chunks of large attachments and how it shrinks the prompt
+"""
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service import attachment_retrieval
+from service.attachment_retrieval import AttachmentRetriever, Bm25Index, chunk_offsets
+from service.attachment_store import AttachmentStore, build_attachment_message
+
+
+def make_document():
+    """A long filler document with one section about the deployment region"""
+    filler = "".join(f"Section {i}: the quarterly report covers revenue, staffing and general operations.\n" for i in range(3000))
+    needle = "The production cluster is deployed in the eu-west-2 region behind the Frankfurt failover.\n"
+    return (filler[:len(filler) // 2] + needle + filler[len(filler) // 2:]).encode('utf-8')
+
+
+def test_chunk_offsets():
+    """Test that chunks cover the file, stay within the size limit and don't split characters"""
+    print("\n" + "="*60)
+    print("  Testing Chunking")
+    print("="*60)
+
+    data = ("naïve café " * 400 + "\n" + "short line\n" * 300).encode('utf-8')
+    chunks = chunk_offsets(io.BytesIO(data), 1000)
+    contiguous = chunks[0][0] == 0 and chunks[-1][1] == len(data) and all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    try:
+        for start, end in chunks:
+            data[start:end].decode('utf-8')
+        decodable = True
+    except UnicodeDecodeError:
+        decodable = False
+
+    print(f"   Chunks: {len(chunks)}, contiguous: {contiguous}, decodable: {decodable}")
+    ok = contiguous and decodable and all(end - start <= 1000 for start, end in chunks)
+    print("[OK] Chunks correct" if ok else "[ERROR] Chunks incorrect")
+    assert ok
+    return ok
+
+
+def test_search_numpy_and_python():
+    """Test that the relevant chunk ranks first, with the same scores with and without NumPy"""
+    print("\n" + "="*60)
+    print("  Testing BM25 Search")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        path = Path(base_dir) / "doc.txt"
+        path.write_bytes(make_document())
+        index = Bm25Index(path, 2000)
+        hits = index.search("Which region is the production cluster deployed in?", 3)
+        with open(path, 'rb') as f:
+            top_text = index.read_chunk(f, hits[0][0])
+
+        numpy_module = attachment_retrieval.np
+        attachment_retrieval.np = None
+        try:
+            python_hits = Bm25Index(path, 2000).search("Which region is the production cluster deployed in?", 3)
+        finally:
+            attachment_retrieval.np = numpy_module
+
+    print(f"   NumPy: {numpy_module is not None}, hits: {hits}, pure Python hits: {python_hits}")
+    ok = "eu-west-2" in top_text and [c for c, _ in hits] == [c for c, _ in python_hits] \
+        and all(abs(a[1] - b[1]) < 1e-9 for a, b in zip(hits, python_hits))
+    print("[OK] Relevant chunk found" if ok else "[ERROR] Search incorrect")
+    assert ok
+    return ok
+
+
+def test_same_ranking_numpy_and_python():
+    """Test that NumPy (a requirement) is used and ranks every chunk exactly like the pure Python fallback, ties included"""
+    print("\n" + "="*60)
+    print("  Testing NumPy and Pure Python Rankings")
+    print("="*60)
+
+    queries = ["Which region is the production cluster deployed in?", "quarterly revenue and staffing",
+               "section 1500 operations", "frankfurt failover report", "nothing matches zzz"]
+    with tempfile.TemporaryDirectory() as base_dir:
+        path = Path(base_dir) / "doc.txt"
+        path.write_bytes(make_document())
+        index = Bm25Index(path, 1500)
+        # Small k cuts through tied scores; len(chunks) compares the whole ranking
+        searches = [(query, k) for query in queries for k in (1, 5, len(index.chunks))]
+        hits = [index.search(query, k) for query, k in searches]
+        numpy_module = attachment_retrieval.np
+        attachment_retrieval.np = None
+        try:
+            python_index = Bm25Index(path, 1500)
+            python_hits = [python_index.search(query, k) for query, k in searches]
+        finally:
+            attachment_retrieval.np = numpy_module
+
+    mismatches = [search for search, a, b in zip(searches, hits, python_hits)
+                  if [c for c, _ in a] != [c for c, _ in b] or any(abs(x[1] - y[1]) > 1e-9 for x, y in zip(a, b))]
+
+    print(f"   NumPy: {numpy_module is not None}, chunks: {len(index.chunks)}, mismatched rankings: {mismatches}")
+    ok = numpy_module is not None and not mismatches
+    print("[OK] Rankings identical" if ok else "[ERROR] Rankings differ (or NumPy is not installed)")
+    assert ok
+    return ok
+
+
+def test_retrieval_prompt():
+    """Test that a large attachment is sent as relevant excerpts and its index is cached"""
+    print("\n" + "="*60)
+    print("  Testing Retrieval Prompt")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = AttachmentStore(base_dir)
+        retriever = AttachmentRetriever(store, min_bytes=32 * 1024, top_k=4)
+        document = make_document()
+        uploaded = store.put_bytes(document, "report.txt")
+        question = "Which region is the production cluster deployed in?"
+
+        built = build_attachment_message([uploaded], question, store=store, retriever=retriever)
+        # Same content sent inline is stored under the same hash and reuses the index
+        inline = build_attachment_message([{"name": "report.txt", "content": document.decode('utf-8')}], question,
+                                          store=store, retriever=retriever)
+        stats = retriever.get_stats()
+
+    report = built["attachments"][0]
+    print(f"   Document: {len(document)} bytes, prompt: {len(built['message'])} chars, report: {report}, stats: {stats}")
+    ok = "eu-west-2" in built["message"] and len(built["message"]) * 10 < len(document) \
+        and report["chunks"] == 4 and report["truncated"] and inline["message"] == built["message"] \
+        and stats["index_builds"] == 1 and stats["index_hits"] == 1
+    print("[OK] Only relevant excerpts sent" if ok else "[ERROR] Retrieval prompt incorrect")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_chunk_offsets, test_search_numpy_and_python, test_same_ranking_numpy_and_python, test_retrieval_prompt):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
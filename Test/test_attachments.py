@@ -0,0 +1,131 @@
+"""
+Attachment Test Script
+Tests the content-addressed attachment store, budgeted prompt assembly and
+multipart uploads to /api/attachments and /api/chat (no API key needed)
+"""
+import os
+import sys
+import io
+import json
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.attachment_store import AttachmentStore, AttachmentTooLarge, build_attachment_message
+
+
+def test_store_dedup_and_limit():
+    """Test that identical uploads share one file and oversized uploads are rejected"""
+    print("\n" + "="*60)
+    print("  Testing Attachment Store")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = AttachmentStore(base_dir, max_bytes=1024 * 1024)
+        first = store.put_bytes(b"x" * 200000, "a.txt")
+        second = store.put_bytes(b"x" * 200000, "b.txt")
+        try:
+            store.put_bytes(b"y" * (1024 * 1024 + 1), "big.txt")
+            rejected = False
+        except AttachmentTooLarge:
+            rejected = True
+        files = sorted(p.name for p in Path(base_dir).iterdir())
+        stats = store.get_stats()
+
+    print(f"   Ids equal: {first['id'] == second['id']}, files: {len(files)}, stats: {stats}")
+    ok = first["id"] == second["id"] and first["size"] == 200000 and rejected \
+        and files == [first["id"]] and stats["stored"] == 1 and stats["deduplicated"] == 1 and stats["rejected"] == 1
+    print("[OK] Store deduplicates and enforces size limit" if ok else "[ERROR] Store incorrect")
+    assert ok
+    return ok
+
+
+def test_prompt_budget():
+    """Test that attachments are inlined within the character budget, stored ones read partially"""
+    print("\n" + "="*60)
+    print("  Testing Attachment Prompt Budget")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        store = AttachmentStore(base_dir)
+        big = store.put_bytes(("line of a large file\n" * 50000).encode('utf-8'), "big.log")
+        built = build_attachment_message(
+            [{"name": "small.txt", "content": "short"}, big],
+            "Summarize", store=store, max_chars=1000
+        )
+
+    report = built["attachments"]
+    print(f"   Prompt length: {len(built['message'])}, report: {report}")
+    ok = len(built["message"]) < 1300 and built["message"].endswith("Summarize") \
+        and report[0] == {"name": "small.txt", "size": 5, "chars": 5, "truncated": False} \
+        and report[1]["chars"] == 995 and report[1]["truncated"] and "truncated to the first 995" in built["message"]
+    print("[OK] Prompt kept within budget" if ok else "[ERROR] Prompt budget incorrect")
+    assert ok
+    return ok
+
+
+def test_multipart_chat_request():
+    """Test uploading files with multipart/form-data and referencing them from a chat request"""
+    print("\n" + "="*60)
+    print("  Testing Multipart Uploads")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        os.environ['ATTACHMENT_DIR'] = base_dir
+        import main
+        from flask import Flask
+
+        main.attachment_store = AttachmentStore(base_dir, max_bytes=100000)
+        app = Flask(__name__)
+        app.request_class = main.ChatRequest
+        app.register_blueprint(main.api)
+        client = app.test_client()
+
+        uploaded = client.post('/api/attachments', data={
+            "files": [(io.BytesIO(b"first file"), "one.txt"), (io.BytesIO(b"second file"), "two.txt")]
+        }, content_type='multipart/form-data')
+        too_large = client.post('/api/attachments', data={
+            "files": (io.BytesIO(b"z" * 100001), "big.txt")
+        }, content_type='multipart/form-data')
+
+        with app.test_request_context('/api/chat', method='POST', data={
+            "message": "Compare",
+            "history": json.dumps([{"role": "user", "content": "earlier"}]),
+            "cache": "false",
+            "files": (io.BytesIO(b"inline upload"), "three.txt")
+        }, content_type='multipart/form-data'):
+            chat_request, error = main.build_chat_request(main.get_chat_body())
+
+        with app.test_request_context('/api/chat', method='POST', json={
+            "message": "Again", "attached_files": [uploaded.get_json()["attachments"][0]]
+        }):
+            by_id, _ = main.build_chat_request(main.get_chat_body())
+
+    attachments = uploaded.get_json()["attachments"]
+    print(f"   Uploaded: {attachments}, too large: {too_large.status_code}")
+    ok = uploaded.status_code == 200 and [a["name"] for a in attachments] == ["one.txt", "two.txt"] \
+        and too_large.status_code == 413 and error is None \
+        and "[Attached file 1: three.txt]\n\ninline upload" in chat_request["effective_message"] \
+        and chat_request["history"] == [{"role": "user", "content": "earlier"}] and chat_request["use_cache"] is False \
+        and "first file" in by_id["effective_message"]
+    print("[OK] Multipart uploads handled" if ok else "[ERROR] Multipart uploads incorrect")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_store_dedup_and_limit, test_prompt_budget, test_multipart_chat_request):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
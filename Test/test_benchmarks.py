@@ -0,0 +1,97 @@
+"""
+Benchmarks Test Script
+Tests the request assembly micro-benchmarks: timing, a quick run of every
+benchmark, baseline files and regression detection (no API key needed)
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Test to path
+test_path = Path(__file__).parent
+sys.path.insert(0, str(test_path))
+
+from run_benchmarks import measure, run_benchmarks, compare, save_baseline, load_baseline
+
+
+def test_measure_and_compare():
+    """Test per-call timing and that only slowdowns over the threshold are regressions"""
+    print("\n" + "="*60)
+    print("  Testing Timing and Regression Detection")
+    print("="*60)
+
+    timing = measure(lambda: time.sleep(0.002), min_time=0.05, repeat=3)
+    baseline = {"steady": {"min_ms": 1.0, "median_ms": 1.0}, "slower": {"min_ms": 1.0, "median_ms": 1.0}}
+    results = {"steady": {"min_ms": 1.2, "median_ms": 1.2}, "slower": {"min_ms": 1.6, "median_ms": 1.6},
+               "new": {"min_ms": 9.0, "median_ms": 9.0}}
+    regressions = compare(results, baseline, threshold=0.25)
+
+    print(f"   Timing: {timing}, regressions: {regressions}")
+    ok = 2.0 <= timing["min_ms"] < 20 and timing["calls"] >= 3 \
+        and [r["name"] for r in regressions] == ["slower"] and regressions[0]["change"] == 0.6
+    print("[OK] Timing and comparison correct" if ok else "[ERROR] Timing or comparison incorrect")
+    assert ok
+    return ok
+
+
+def test_quick_run_and_baseline():
+    """Test that every quick benchmark runs and results round-trip through a baseline file"""
+    print("\n" + "="*60)
+    print("  Testing Quick Run and Baseline")
+    print("="*60)
+
+    results = run_benchmarks(quick=True, min_time=0.01, repeat=2, verbose=False)
+    path = Path(tempfile.mkdtemp()) / "baseline.json"
+    save_baseline(path, results)
+    loaded = load_baseline(path)
+
+    names = sorted(results)
+    print(f"   Benchmarks: {names}")
+    ok = any(n.startswith("parse_chat_request[attachment=100KB]") for n in names) \
+        and "build_messages[history=100]" in names and "session_log_write[1KB]" in names \
+        and all(r["min_ms"] > 0 for r in results.values()) and loaded == results \
+        and compare(results, loaded, threshold=0.25) == []
+    print("[OK] Quick run and baseline correct" if ok else "[ERROR] Quick run or baseline incorrect")
+    assert ok
+    return ok
+
+
+def test_regression_exit_code():
+    """Test that the runner exits with 1 when results are slower than the baseline"""
+    print("\n" + "="*60)
+    print("  Testing Regression Exit Code")
+    print("="*60)
+
+    path = Path(tempfile.mkdtemp()) / "baseline.json"
+    # A baseline no real run can match
+    save_baseline(path, {"cache_key[history=10]": {"min_ms": 1e-6, "median_ms": 1e-6, "calls": 1}})
+    completed = subprocess.run(
+        [sys.executable, str(test_path / "run_benchmarks.py"), "--quick", "--filter", "cache_key[history=10]",
+         "--min-time", "0.01", "--baseline", str(path)],
+        cwd=test_path, env={**os.environ, "PYTHONIOENCODING": "utf-8"}, capture_output=True, text=True, timeout=120
+    )
+
+    print(f"   Exit code: {completed.returncode}, output: {completed.stdout.strip().splitlines()[-1:]}")
+    ok = completed.returncode == 1 and "[REGRESSION] cache_key[history=10]" in completed.stdout
+    print("[OK] Regression reported" if ok else "[ERROR] Regression not reported")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_measure_and_compare, test_quick_run_and_baseline, test_regression_exit_code):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
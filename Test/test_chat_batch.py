@@ -0,0 +1,187 @@
+"""
+Chat Batch Test Script
+Tests /api/chat/batch against a fake OpenAI service: ordered results, per-item
+errors, streamed results, the upstream concurrency bound and rate limits on large
+batches (no API key needed)
+"""
+import os
+import sys
+import io
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+
+import main
+from flask import Flask
+from service.admission import AdmissionController
+
+
+class FakeOpenAIService:
+    """Answers after a delay (longer for earlier items) and tracks peak concurrency"""
+
+    model = "gpt-test"
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def send_message(self, message, conversation_history=None, model=None, use_cache=True):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if message == "fail":
+                raise RuntimeError("upstream error")
+            number = int(message.split()[-1])
+            time.sleep(0.02 * (10 - number % 10))
+            return {"message": f"reply to {message}", "usage": {"prompt_tokens": 3, "completion_tokens": 2,
+                                                                  "total_tokens": 5, "model": model}}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@contextmanager
+def make_client(fake, concurrency):
+    """Test client serving from the fake service on a pool of concurrency threads, without usage logging"""
+    saved = (main.get_openai_service, main.batch_executor, main.papita_usage_logger.log)
+    main.get_openai_service = lambda: fake
+    main.batch_executor = ThreadPoolExecutor(max_workers=concurrency)
+    main.papita_usage_logger.log = lambda record: None
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(main.api)
+        yield app.test_client()
+    finally:
+        main.batch_executor.shutdown(wait=False)
+        main.get_openai_service, main.batch_executor, main.papita_usage_logger.log = saved
+
+
+def test_ordered_results():
+    """Test results in request order with per-item usage and errors, within the concurrency bound"""
+    print("\n" + "="*60)
+    print("  Testing Ordered Batch Results")
+    print("="*60)
+
+    fake = FakeOpenAIService()
+    requests = [{"message": f"question {i}"} for i in range(20)] + [{"message": "fail"}, {"history": []}]
+    with make_client(fake, concurrency=4) as client:
+        start = time.perf_counter()
+        response = client.post('/api/chat/batch', json={"requests": requests, "model": "gpt-batch"})
+        elapsed = time.perf_counter() - start
+        body = response.get_json()
+
+    results = body["results"]
+    print(f"   Status: {response.status_code}, results: {len(results)}, errors: {body['errors']}, "
+          f"usage: {body['usage']}, peak concurrency: {fake.peak}, elapsed: {elapsed:.2f}s")
+    ok = response.status_code == 200 and [r["index"] for r in results] == list(range(22)) \
+        and all(r["message"] == f"reply to question {i}" for i, r in enumerate(results[:20])) \
+        and results[0]["usage"]["model"] == "gpt-batch" \
+        and results[20]["status"] == 500 and results[21]["status"] == 400 \
+        and body["errors"] == 2 and body["usage"]["total_tokens"] == 100 \
+        and fake.peak <= 4 and elapsed < 2.0
+    print("[OK] Batch results correct" if ok else "[ERROR] Batch results incorrect")
+    assert ok
+    return ok
+
+
+def test_streamed_results():
+    """Test that streamed results arrive as items finish, followed by a summary"""
+    print("\n" + "="*60)
+    print("  Testing Streamed Batch Results")
+    print("="*60)
+
+    with make_client(FakeOpenAIService(), concurrency=8) as client:
+        response = client.post('/api/chat/batch', json={
+            "requests": [{"message": f"question {i}"} for i in range(8)], "stream": True
+        })
+        data = response.get_data(as_text=True)
+    events = []
+    for block in data.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+
+    order = [data["index"] for event, data in events if event == "result"]
+    print(f"   Completion order: {order}, last event: {events[-1]}")
+    ok = sorted(order) == list(range(8)) and order != list(range(8)) \
+        and events[-1][0] == "done" and events[-1][1]["count"] == 8 and events[-1][1]["errors"] == 0
+    print("[OK] Results streamed as they finished" if ok else "[ERROR] Streamed results incorrect")
+    assert ok
+    return ok
+
+
+def test_batch_limits():
+    """Test that empty and oversized batches are rejected"""
+    print("\n" + "="*60)
+    print("  Testing Batch Limits")
+    print("="*60)
+
+    with make_client(FakeOpenAIService(), concurrency=2) as client:
+        empty = client.post('/api/chat/batch', json={"requests": []})
+        too_many = client.post('/api/chat/batch', json={"requests": [{"message": "question 1"}] * (main.BATCH_MAX_ITEMS + 1)})
+
+    print(f"   Empty: {empty.status_code}, too many: {too_many.status_code}")
+    ok = empty.status_code == 400 and too_many.status_code == 400
+    print("[OK] Batch limits enforced" if ok else "[ERROR] Batch limits not enforced")
+    assert ok
+    return ok
+
+
+def test_large_batch_rate_limited_as_one():
+    """Test that a large batch under the default rate limits is admitted as a unit and the user's next request waits for it"""
+    print("\n" + "="*60)
+    print("  Testing Large Batch Under Default Rate Limits")
+    print("="*60)
+
+    saved = main.admission_controller
+    main.admission_controller = AdmissionController()
+    try:
+        with make_client(FakeOpenAIService(), concurrency=64) as client:
+            count = 300
+            start = time.perf_counter()
+            response = client.post('/api/chat/batch', json={
+                "requests": [{"message": f"question {i}"} for i in range(count)],
+                "username": "dana", "isGuest": False, "sessionId": "batch-session"
+            })
+            elapsed = time.perf_counter() - start
+            body = response.get_json()
+            after = client.post('/api/chat', json={"message": "question 1", "username": "dana", "isGuest": False})
+            other_user = client.post('/api/chat', json={"message": "question 1", "username": "erin", "isGuest": False})
+            stats = main.admission_controller.get_stats()
+    finally:
+        main.admission_controller = saved
+
+    print(f"   Batch: {response.status_code}, errors: {body['errors']} of {body['count']} in {elapsed:.2f}s, "
+          f"next request: {after.status_code}, other user: {other_user.status_code}, admission: {stats}")
+    ok = response.status_code == 200 and body["count"] == count and body["errors"] == 0 \
+        and stats["admitted"] == count + 1 and stats["queued"] == 0 \
+        and after.status_code == 429 and other_user.status_code == 200
+    print("[OK] Large batch admitted as one unit" if ok else "[ERROR] Large batch rate limited per item")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_ordered_results, test_streamed_results, test_batch_limits, test_large_batch_rate_limited_as_one):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
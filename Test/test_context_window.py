@@ -0,0 +1,117 @@
+"""
+Context Window Test Script
+Tests history trimming to a per-model token budget
+"""
+import sys
+import io
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.context_window import ContextWindowManager
+from service import token_counter
+from service.token_counter import count_message_tokens
+
+
+def test_budget_lookup():
+    """Test per-model budget lookup by longest prefix"""
+    print("\n" + "="*60)
+    print("  Testing Context Budget Lookup")
+    print("="*60)
+
+    manager = ContextWindowManager(budgets={"gpt-test": 500}, default_budget=1000, reserve_tokens=100)
+    budgets = {
+        "gpt-test": manager.get_budget("gpt-test"),
+        "gpt-test-0613": manager.get_budget("gpt-test-0613"),
+        "gpt-4-turbo-preview": manager.get_budget("gpt-4-turbo-preview"),
+        "unknown": manager.get_budget("unknown")
+    }
+    print(f"   Budgets: {budgets}")
+
+    ok = budgets == {"gpt-test": 400, "gpt-test-0613": 400, "gpt-4-turbo-preview": 127900, "unknown": 900}
+    print("   [OK] Budgets resolved" if ok else "   [ERROR] Unexpected budgets")
+    assert ok
+    return ok
+
+
+def test_trim_history():
+    """Test that system and recent turns are kept and older turns dropped"""
+    print("\n" + "="*60)
+    print("  Testing History Trimming")
+    print("="*60)
+
+    messages = [{"role": "system", "content": "You are helpful."}]
+    for i in range(50):
+        messages.append({"role": "user", "content": f"question {i} " + "x" * 200})
+        messages.append({"role": "assistant", "content": f"answer {i} " + "y" * 200})
+    messages.append({"role": "user", "content": "latest question"})
+
+    manager = ContextWindowManager(budgets={"gpt-test": 600}, reserve_tokens=100)
+    fitted, report = manager.fit(messages, "gpt-test")
+    kept_tokens = sum(count_message_tokens(m, "gpt-test") for m in fitted)
+
+    print(f"   Kept {len(fitted)} of {len(messages)} messages")
+    print(f"   Report: {report}")
+
+    ok = (
+        fitted[0]["role"] == "system"
+        and fitted[-1]["content"] == "latest question"
+        and fitted[-2]["content"].startswith("answer 49")
+        and kept_tokens == report["prompt_tokens_estimate"] <= 500
+        and report["dropped_messages"] == len(messages) - len(fitted)
+    )
+    print("   [OK] History trimmed to budget" if ok else "   [ERROR] Unexpected trimming")
+    assert ok
+    return ok
+
+
+def test_token_estimates():
+    """Test that estimates (no tiktoken encoding) err high for code and CJK, and multimodal content is counted by its text"""
+    print("\n" + "="*60)
+    print("  Testing Token Estimates")
+    print("="*60)
+
+    code = 'def f(x):\n    return {"a": [1, 2, 3], "b": x ** 2}\n' * 20
+    cjk = "日本語のテキストはトークンが多い。" * 20
+    multimodal = {"role": "user", "content": [{"type": "text", "text": "Describe this"},
+                                              {"type": "image_url", "image_url": {"url": "https://example.com/a.png"}}]}
+
+    saved = token_counter.tiktoken
+    token_counter.tiktoken = None
+    token_counter._get_encoding.cache_clear()
+    token_counter._count_cached.cache_clear()
+    try:
+        counts = {
+            # tiktoken needs about one token per 3 characters of code and one per CJK character
+            "code": (token_counter.count_tokens(code), len(code) // 3),
+            "cjk": (token_counter.count_tokens(cjk), len(cjk)),
+            "multimodal": (count_message_tokens(multimodal), token_counter.count_tokens("Describe this") + 4)
+        }
+    finally:
+        token_counter.tiktoken = saved
+        token_counter._get_encoding.cache_clear()
+        token_counter._count_cached.cache_clear()
+
+    print(f"   Estimate, expected: {counts}")
+    ok = counts["code"][0] >= counts["code"][1] and counts["cjk"][0] >= counts["cjk"][1] \
+        and counts["multimodal"][0] == counts["multimodal"][1]
+    print("   [OK] Estimates conservative" if ok else "   [ERROR] Estimates too low")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_budget_lookup, test_trim_history, test_token_estimates):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
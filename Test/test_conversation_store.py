@@ -0,0 +1,188 @@
+"""
+Conversation Store Test Script
+Tests server-side conversation histories, bounds and idle eviction, and how
+/api/chat reports a conversation that was evicted
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+
+from flask import Flask
+from service.conversation_store import ConversationStore
+
+
+def test_history_roundtrip():
+    """Test that turns appended to a conversation come back as history"""
+    print("\n" + "="*60)
+    print("  Testing Conversation History")
+    print("="*60)
+
+    store = ConversationStore(max_messages=4)
+    conversation_id = store.create()
+    for i in range(3):
+        store.append(conversation_id, [
+            {"role": "user", "content": f"question {i}"},
+            {"role": "assistant", "content": f"answer {i}"}
+        ])
+
+    history = store.get_history(conversation_id)
+    info = store.get_info(conversation_id)
+    print(f"   History: {history}")
+    print(f"   Info: {info}")
+
+    ok = (
+        [m["content"] for m in history] == ["question 1", "answer 1", "question 2", "answer 2"]
+        and info["tokens"] == store.get_stats()["total_tokens"]
+        and store.get_history("unknown") is None
+    )
+    print("   [OK] History kept within bounds" if ok else "   [ERROR] Unexpected history")
+    assert ok
+    return ok
+
+
+def test_eviction():
+    """Test conversation count bound and idle eviction"""
+    print("\n" + "="*60)
+    print("  Testing Conversation Eviction")
+    print("="*60)
+
+    store = ConversationStore(max_conversations=2, idle_ttl=0.1)
+    for conversation_id in ("a", "b", "c"):
+        store.append(conversation_id, [{"role": "user", "content": "hi"}])
+    after_limit = store.get_stats()["conversations"]
+    oldest_gone = store.get_history("a") is None
+
+    time.sleep(0.2)
+    store.create("d")
+    stats = store.get_stats()
+    print(f"   Conversations after 3 creates (max 2): {after_limit}")
+    print(f"   Stats after idle timeout: {stats}")
+
+    ok = after_limit == 2 and oldest_gone and stats["conversations"] == 1 and stats["total_tokens"] == 0
+    print("   [OK] Conversations evicted" if ok else "   [ERROR] Eviction failed")
+    assert ok
+    return ok
+
+
+def test_evicted_conversation():
+    """Test that /api/chat flags a conversation_id whose history is gone instead of silently dropping it"""
+    print("\n" + "="*60)
+    print("  Testing Evicted Conversation Reset")
+    print("="*60)
+
+    import main
+
+    class FakeOpenAIService:
+        model = "gpt-test"
+
+        def __init__(self):
+            self.histories = []
+
+        def send_message(self, message, conversation_history=None, model=None, use_cache=True):
+            self.histories.append(conversation_history)
+            return {"message": f"reply to {message}", "usage": {"total_tokens": 0, "model": self.model}}
+
+    fake = FakeOpenAIService()
+    saved = (main.conversation_store, main.get_openai_service, main.admission_controller, main.model_router,
+             main.papita_usage_logger.log)
+    main.conversation_store = ConversationStore(max_conversations=1)
+    main.get_openai_service = lambda: fake
+    main.admission_controller = None
+    main.model_router = None
+    main.papita_usage_logger.log = lambda record: None
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(main.api)
+        client = app.test_client()
+
+        main.conversation_store.create("a")
+        first = client.post('/api/chat', json={"message": "first", "conversation_id": "a"}).get_json()
+        main.conversation_store.create("b")  # Evicts "a"
+        second = client.post('/api/chat', json={"message": "second", "conversation_id": "a"}).get_json()
+        third = client.post('/api/chat', json={"message": "third", "conversation_id": "a"}).get_json()
+    finally:
+        (main.conversation_store, main.get_openai_service, main.admission_controller, main.model_router,
+         main.papita_usage_logger.log) = saved
+
+    print(f"   Reset flags: {[r.get('conversation_reset') for r in (first, second, third)]}, "
+          f"history sizes: {[len(h) for h in fake.histories]}")
+    ok = "conversation_reset" not in first and second.get("conversation_reset") is True \
+        and "conversation_reset" not in third and [len(h) for h in fake.histories] == [0, 0, 2]
+    print("   [OK] Evicted conversation reported" if ok else "   [ERROR] Evicted conversation not reported")
+    assert ok
+    return ok
+
+def test_attachment_turn_saved_as_reference():
+    """Test that a conversation saves attachment references, not their inlined content"""
+    print("\n" + "="*60)
+    print("  Testing Attachments Saved As References")
+    print("="*60)
+
+    import main
+
+    class FakeOpenAIService:
+        model = "gpt-test"
+
+        def __init__(self):
+            self.calls = []
+
+        def send_message(self, message, conversation_history=None, model=None, use_cache=True):
+            self.calls.append((message, conversation_history))
+            return {"message": "done", "usage": {"total_tokens": 0, "model": self.model}}
+
+    fake = FakeOpenAIService()
+    saved = (main.conversation_store, main.get_openai_service, main.admission_controller, main.model_router,
+             main.papita_usage_logger.log)
+    main.conversation_store = ConversationStore()
+    main.get_openai_service = lambda: fake
+    main.admission_controller = None
+    main.model_router = None
+    main.papita_usage_logger.log = lambda record: None
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(main.api)
+        client = app.test_client()
+
+        stored = main.attachment_store.put_bytes(b"stored report " * 100, "report.txt")
+        main.conversation_store.create("c")
+        client.post('/api/chat', json={"message": "Compare", "conversation_id": "c", "attached_files": [
+            {"name": "notes.txt", "content": "inline notes " * 100}, {"name": "report.txt", "id": stored["id"]}
+        ]})
+        client.post('/api/chat', json={"message": "And now?", "conversation_id": "c"})
+    finally:
+        (main.conversation_store, main.get_openai_service, main.admission_controller, main.model_router,
+         main.papita_usage_logger.log) = saved
+
+    first_message, _ = fake.calls[0]
+    _, second_history = fake.calls[1]
+    print(f"   Saved user turn: {second_history[0]['content']!r}")
+    ok = "inline notes" in first_message and "stored report" in first_message \
+        and second_history[0] == {"role": "user",
+                                  "content": f"Compare\n\n[Attached files: notes.txt, report.txt (id {stored['id']})]"}
+    print("   [OK] Attachments saved as references" if ok else "   [ERROR] Attachment content saved in history")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_history_roundtrip, test_eviction, test_evicted_conversation, test_attachment_turn_saved_as_reference):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -59,6 +59,39 @@ def test_credential_manager():
         traceback.print_exc()
         return False
 
+def test_credential_cache():
+    """Test that Papita lookups are cached, including negative results"""
+    print("\n" + "="*60)
+    print("  Testing Credential Cache")
+    print("="*60)
+    
+    credential_manager = CredentialManager(cache_ttl=60, negative_cache_ttl=60)
+    calls = []
+    
+    def fake_fetch():
+        calls.append(1)
+        return None  # Papita down
+    
+    credential_manager._fetch_from_papita_api = fake_fetch
+    
+    for _ in range(5):
+        credential_manager.get_openai_api_key()
+    credential_manager.get_credentials_info()
+    credential_manager.validate_openai_credentials()
+    print(f"   Papita fetches for 7 lookups (negative cache): {len(calls)}")
+    
+    credential_manager._fetch_from_papita_api = lambda: calls.append(1) or "sk-from-papita"
+    api_key = credential_manager.refresh()
+    credential_manager.get_openai_api_key()
+    print(f"   Key after refresh(): {api_key[:7]}...")
+    print(f"   Total Papita fetches: {len(calls)}")
+    
+    ok = len(calls) == 2 and api_key == "sk-from-papita" and credential_manager.get_credentials_info()["credential_source"] == "papita_api"
+    print("   [OK] Credential cache working" if ok else "   [ERROR] Unexpected number of Papita fetches")
+    assert ok
+    return ok
+
 if __name__ == "__main__":
     success = test_credential_manager()
-    sys.exit(0 if success else 1)
+    cache_success = test_credential_cache()
+    sys.exit(0 if success and cache_success else 1)
@@ -0,0 +1,74 @@
+"""
+HTTP Clients Test Script
+Tests that outbound calls share one keep-alive connection pool
+"""
+import sys
+import io
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service import http_clients
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small JSON body over HTTP/1.1 keep-alive"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b'{"status": "healthy"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_connection_reuse():
+    """Test that repeated Papita calls reuse a pooled connection"""
+    print("\n" + "="*60)
+    print("  Testing Shared HTTP Client Pool")
+    print("="*60)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/api/health'
+        client = http_clients.get_papita_client()
+        for _ in range(10):
+            client.get(url)
+
+        stats = http_clients.get_pool_stats()["clients"]["papita"]
+        print(f"   Same client instance: {client is http_clients.get_papita_client()}")
+        print(f"   TCP connections used for 10 requests: {len(server.connections)}")
+        print(f"   Pool stats: {stats}")
+
+        ok = client is http_clients.get_papita_client() and len(server.connections) == 1 and stats["responses"] >= 10
+        print("   [OK] Connections reused" if ok else "   [ERROR] Connections not reused")
+        assert ok
+        return ok
+    finally:
+        http_clients.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        success = test_connection_reuse()
+    except Exception:
+        success = False
+    sys.exit(0 if success else 1)
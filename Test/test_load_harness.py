@@ -0,0 +1,120 @@
+"""
+Load Harness Test Script
+Tests the fake OpenAI/Papita servers with the real SDK and HTTP clients, and
+runs a short offline load test through run_load_test.py (no API key needed)
+"""
+import os
+import sys
+import io
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Test to path
+test_path = Path(__file__).parent
+sys.path.insert(0, str(test_path))
+
+import httpx
+import openai
+from mocks.fake_upstreams import FakeOpenAI, FakePapita, UpstreamBehavior
+from run_load_test import summarize
+
+
+def test_fake_upstreams():
+    """Test that the fakes speak the OpenAI (plain and streamed) and Papita protocols, and inject errors"""
+    print("\n" + "="*60)
+    print("  Testing Fake Upstreams")
+    print("="*60)
+
+    with FakeOpenAI(UpstreamBehavior(prompt_tokens=7, completion_tokens=3, stream_chunks=4)) as fake_openai, \
+            FakePapita() as fake_papita, \
+            FakeOpenAI(UpstreamBehavior(error_rate=1.0, error_status=429, retry_after=2)) as failing:
+        client = openai.OpenAI(api_key="sk-fake", base_url=f"{fake_openai.url}/v1", max_retries=0)
+        completion = client.chat.completions.create(model="gpt-fake", messages=[{"role": "user", "content": "Hi"}])
+        chunks = list(client.chat.completions.create(model="gpt-fake", messages=[{"role": "user", "content": "Hi"}],
+                                                     stream=True, stream_options={"include_usage": True}))
+
+        credentials = httpx.get(f"{fake_papita.url}/api/credentials/global/openai").json()
+        logged = httpx.post(f"{fake_papita.url}/api/usage/log", json={"total_tokens": 10})
+
+        try:
+            openai.OpenAI(api_key="sk-fake", base_url=f"{failing.url}/v1", max_retries=0).chat.completions.create(
+                model="gpt-fake", messages=[{"role": "user", "content": "Hi"}])
+            error = None
+        except openai.RateLimitError as e:
+            error = e
+
+        deltas = [c.choices[0].delta.content for c in chunks if c.choices]
+        print(f"   Completion usage: {completion.usage.total_tokens}, stream deltas: {len(deltas)}, "
+              f"stream usage: {chunks[-1].usage.total_tokens}, papita: {credentials}, injected: {error and error.status_code}")
+        ok = completion.choices[0].message.content and completion.usage.total_tokens == 10 \
+            and len(deltas) == 4 and chunks[-1].usage.total_tokens == 10 \
+            and credentials["credentials"]["credentials"]["api_key"] == fake_papita.api_key \
+            and logged.status_code == 200 and fake_papita.usage_records == [{"total_tokens": 10}] \
+            and error is not None and error.response.headers["retry-after"] == "2" \
+            and fake_openai.get_stats()["completions"] == 2 and failing.get_stats()["errors"] == 1
+    print("[OK] Fake upstreams correct" if ok else "[ERROR] Fake upstreams incorrect")
+    assert ok
+    return ok
+
+
+def test_summarize():
+    """Test per-endpoint throughput, error counts and percentiles"""
+    print("\n" + "="*60)
+    print("  Testing Load Report")
+    print("="*60)
+
+    samples = [("chat", 200, i / 1000) for i in range(1, 101)] + [("usage", 500, 0.5)]
+    report = summarize(samples, elapsed=2.0)
+
+    print(f"   Report: {report}")
+    ok = report["chat"]["requests"] == 100 and report["chat"]["errors"] == 0 and report["chat"]["throughput"] == 50.0 \
+        and report["chat"]["p50_ms"] == 50.0 and report["chat"]["p95_ms"] == 95.0 and report["chat"]["p99_ms"] == 99.0 \
+        and report["usage"]["errors"] == 1 and report["all"]["requests"] == 101 and report["all"]["max_ms"] == 500.0
+    print("[OK] Report correct" if ok else "[ERROR] Report incorrect")
+    assert ok
+    return ok
+
+
+def test_offline_load_run():
+    """Test a short load run end to end, offline"""
+    print("\n" + "="*60)
+    print("  Testing Offline Load Run")
+    print("="*60)
+
+    report_path = Path(tempfile.mkdtemp()) / "load.json"
+    env = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+    completed = subprocess.run(
+        [sys.executable, str(test_path / "run_load_test.py"), "--concurrency", "4", "--duration", "1",
+         "--openai-latency", "0.01", "--json", str(report_path)],
+        cwd=test_path, env=env, capture_output=True, text=True, timeout=120
+    )
+    report = json.loads(report_path.read_text(encoding='utf-8')) if report_path.exists() else {}
+    endpoints = report.get("endpoints", {})
+
+    print(f"   Exit code: {completed.returncode}, endpoints: {sorted(endpoints)}, all: {endpoints.get('all')}")
+    ok = completed.returncode == 0 and {"chat", "usage", "session/start", "all"} <= set(endpoints) \
+        and endpoints["chat"]["requests"] > 0 and endpoints["all"]["errors"] == 0 \
+        and endpoints["all"]["p50_ms"] <= endpoints["all"]["p99_ms"] \
+        and report["upstreams"]["openai"]["completions"] == endpoints["chat"]["requests"]
+    if not ok:
+        print(completed.stdout[-2000:], completed.stderr[-2000:])
+    print("[OK] Offline load run completed" if ok else "[ERROR] Offline load run failed")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_fake_upstreams, test_summarize, test_offline_load_run):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
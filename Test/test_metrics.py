@@ -0,0 +1,62 @@
+"""
+Metrics Test Script
+Tests counters and histograms in the Prometheus text exposition format
+"""
+import sys
+import io
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.metrics import MetricsRegistry
+
+
+def test_exposition_format():
+    """Test counter and cumulative histogram output"""
+    print("\n" + "="*60)
+    print("  Testing Metrics Exposition")
+    print("="*60)
+
+    registry = MetricsRegistry()
+    requests_total = registry.counter("test_requests_total", "Requests")
+    latency = registry.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    requests_total.inc(endpoint="/api/chat")
+    requests_total.inc(endpoint="/api/chat")
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="openai")
+    try:
+        with latency.time(stage="papita"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+
+    output = registry.render()
+    print(output)
+
+    ok = (
+        'test_requests_total{endpoint="/api/chat"} 2' in output
+        and 'test_latency_seconds_bucket{stage="openai",le="0.1"} 1' in output
+        and 'test_latency_seconds_bucket{stage="openai",le="1.0"} 2' in output
+        and 'test_latency_seconds_bucket{stage="openai",le="+Inf"} 3' in output
+        and 'test_latency_seconds_count{stage="openai"} 3' in output
+        and 'test_latency_seconds_count{stage="papita",status="error"} 1' in output
+    )
+    print("   [OK] Metrics rendered" if ok else "   [ERROR] Unexpected metrics output")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    try:
+        success = test_exposition_format()
+    except Exception:
+        success = False
+    sys.exit(0 if success else 1)
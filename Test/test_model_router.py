@@ -0,0 +1,246 @@
+"""
+Model Router Test Script
+Tests rule-based model routing, EWMA health tracking and failover to fallback
+models with a fake OpenAI service (no API key needed)
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('ATTACHMENT_DIR', tempfile.mkdtemp())
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-router')
+
+import httpx
+import openai
+import main
+from flask import Flask
+from service.model_router import ModelRouter
+from service.openai_service import OpenAIService
+from service.resilience import UpstreamUnavailableError, UpstreamAuthError, RetryPolicy, get_breaker
+
+RULES = [
+    {"max_prompt_tokens": 100, "model": "gpt-fast"},
+    {"attachments": True, "model": "gpt-long"},
+    {"tier": "guest", "model": "gpt-guest"}
+]
+
+
+class FakeOpenAIService:
+    """Answers with the model's name; models in failing raise their error, models in delays sleep first"""
+
+    model = "gpt-default"
+
+    def __init__(self, failing=None, delays=None):
+        self.failing = failing or {}
+        self.delays = delays or {}
+        self.calls = []
+
+    def send_message(self, message, conversation_history=None, model=None, use_cache=True, timeout=None, retry=True):
+        self.calls.append((model, timeout, retry))
+        time.sleep(self.delays.get(model, 0))
+        if model in self.failing:
+            raise self.failing[model]
+        return {"message": f"answer from {model}", "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5, "model": model}}
+
+    def stream_message(self, message, conversation_history=None, model=None, use_cache=True, timeout=None, retry=True):
+        self.calls.append((model, timeout, retry))
+        if model in self.failing:
+            raise self.failing[model]
+        yield {"delta": f"answer from {model}"}
+        yield {"message": f"answer from {model}", "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5, "model": model}}
+
+
+class TimingOutCompletions:
+    """Fake completions API where the models in timing_out time out; others answer once timeouts_before_answer have happened"""
+
+    def __init__(self, timing_out, timeouts_before_answer=0):
+        self.timing_out = timing_out
+        self.timeouts_before_answer = timeouts_before_answer
+        self.timeouts = 0
+        self.lock = threading.Lock()
+        self.answering = threading.Event()
+        if not timeouts_before_answer:
+            self.answering.set()
+
+    def create(self, model=None, **kwargs):
+        if model in self.timing_out:
+            time.sleep(0.05)
+            with self.lock:
+                self.timeouts += 1
+                if self.timeouts >= self.timeouts_before_answer:
+                    self.answering.set()
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+        self.answering.wait(2)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer from {model}"))],
+            usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        )
+
+
+def test_routing_rules():
+    """Test that requests are routed by prompt size, attachments and tier, and requested models win"""
+    print("\n" + "="*60)
+    print("  Testing Routing Rules")
+    print("="*60)
+
+    router = ModelRouter(rules=RULES, fallbacks={})
+    routes = {
+        "short": router.route("gpt-default", prompt_tokens=20)[0][0],
+        "attachment": router.route("gpt-default", prompt_tokens=5000, has_attachments=True)[0][0],
+        "guest": router.route("gpt-default", prompt_tokens=5000, tier="guest")[0][0],
+        "long": router.route("gpt-default", prompt_tokens=5000)[0][0],
+        "requested": router.route("gpt-default", requested_model="gpt-4", prompt_tokens=20)[0][0]
+    }
+
+    saved = (main.get_openai_service, main.model_router, main.papita_usage_logger.log)
+    main.get_openai_service = lambda: FakeOpenAIService()
+    main.model_router = router
+    main.papita_usage_logger.log = lambda record: None
+    try:
+        app = Flask(__name__)
+        app.register_blueprint(main.api)
+        client = app.test_client()
+        short = client.post('/api/chat', json={"message": "Hi", "username": "dave", "isGuest": False}).get_json()
+        long = client.post('/api/chat', json={"message": "word " * 500, "username": "dave", "isGuest": False}).get_json()
+    finally:
+        main.get_openai_service, main.model_router, main.papita_usage_logger.log = saved
+
+    print(f"   Routes: {routes}, /api/chat short: {short['usage']}, long: {long['usage']['model']}")
+    ok = routes == {"short": "gpt-fast", "attachment": "gpt-long", "guest": "gpt-guest", "long": "gpt-default",
+                    "requested": "gpt-4"} \
+        and short["usage"]["model"] == "gpt-fast" and short["usage"]["route"] == {"reason": "rule 0"} \
+        and long["usage"]["model"] == "gpt-default"
+    print("[OK] Requests routed by rules" if ok else "[ERROR] Routing incorrect")
+    assert ok
+    return ok
+
+
+def test_failover():
+    """Test that model-specific errors fail over to the fallback, and others don't"""
+    print("\n" + "="*60)
+    print("  Testing Failover")
+    print("="*60)
+
+    router = ModelRouter(rules=[], fallbacks={"gpt-4o": ["gpt-4o-mini"]})
+    service = FakeOpenAIService(failing={"gpt-4o": UpstreamUnavailableError("openai", "overloaded", status=503)})
+    candidates, reason = router.route("gpt-4o")
+    result = router.send_message(service, "Hi", [], candidates, reason)
+
+    stream_service = FakeOpenAIService(failing={"gpt-4o": UpstreamUnavailableError("openai", "overloaded", status=503)})
+    chunks = list(router.stream_message(stream_service, "Hi", [], candidates, reason))
+
+    # A configured attempt timeout cuts the primary short; by default it gets the normal request timeout
+    timed_service = FakeOpenAIService(failing={"gpt-4o": UpstreamUnavailableError("openai", "overloaded", status=503)})
+    ModelRouter(rules=[], fallbacks={"gpt-4o": ["gpt-4o-mini"]}, attempt_timeout=5).send_message(
+        timed_service, "Hi", [], candidates, reason)
+
+    auth_service = FakeOpenAIService(failing={"gpt-4o": UpstreamAuthError("openai", "bad key", status=401)})
+    try:
+        router.send_message(auth_service, "Hi", [], candidates, reason)
+        auth_error = None
+    except UpstreamAuthError as e:
+        auth_error = e
+
+    print(f"   Calls: {service.calls}, usage: {result['usage']}, stream: {chunks[-1]['usage']['model']}, "
+          f"auth calls: {auth_service.calls}")
+    ok = result["message"] == "answer from gpt-4o-mini" \
+        and service.calls == [("gpt-4o", None, False), ("gpt-4o-mini", None, True)] \
+        and timed_service.calls == [("gpt-4o", 5, False), ("gpt-4o-mini", None, True)] \
+        and result["usage"]["route"] == {"reason": "default", "failed_over_from": ["gpt-4o"]} \
+        and chunks[0] == {"delta": "answer from gpt-4o-mini"} and chunks[-1]["usage"]["model"] == "gpt-4o-mini" \
+        and auth_error is not None and len(auth_service.calls) == 1 and router.get_stats()["failovers"] == 2
+    print("[OK] Failover correct" if ok else "[ERROR] Failover incorrect")
+    assert ok
+    return ok
+
+
+def test_slow_model_avoided():
+    """Test that a slow model goes behind its fallback, and is probed again after the probe interval"""
+    print("\n" + "="*60)
+    print("  Testing Slow Model Avoidance")
+    print("="*60)
+
+    router = ModelRouter(rules=[], fallbacks={"gpt-4o": ["gpt-4o-mini"]}, slow_seconds=0.05, alpha=0.5, probe_interval=0.3)
+    service = FakeOpenAIService(delays={"gpt-4o": 0.1})
+    used = []
+    for _ in range(4):
+        candidates, reason = router.route("gpt-4o")
+        used.append(router.send_message(service, "Hi", [], candidates, reason)["usage"]["model"])
+    time.sleep(0.35)
+    probe = router.route("gpt-4o")[0]
+    after_probe = router.route("gpt-4o")[0]
+    stats = router.get_stats()
+
+    print(f"   Models used: {used}, after interval: {probe}, next: {after_probe}, health: {stats['models']}")
+    ok = used == ["gpt-4o", "gpt-4o-mini", "gpt-4o-mini", "gpt-4o-mini"] \
+        and probe == ["gpt-4o", "gpt-4o-mini"] and after_probe == ["gpt-4o-mini", "gpt-4o"] \
+        and stats["models"]["gpt-4o"]["degraded"] and not stats["models"]["gpt-4o-mini"]["degraded"] \
+        and stats["skipped_degraded"] == 4
+    print("[OK] Slow model avoided" if ok else "[ERROR] Slow model not avoided")
+    assert ok
+    return ok
+
+
+def test_concurrent_primary_timeouts():
+    """Test that concurrent timeouts of the primary model open only its circuit, and all requests fail over (while it opens, too)"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Primary Timeouts")
+    print("="*60)
+
+    primary, fallback = "gpt-router-primary", "gpt-router-fallback"
+    # main's credential manager: its negative cache keeps a failed Papita lookup from counting against the "papita" circuit again
+    openai_service = OpenAIService(main.credential_manager)
+    openai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=TimingOutCompletions({primary}, timeouts_before_answer=8)))
+    openai_service.retry_policy = RetryPolicy(max_retries=0)
+    router = ModelRouter(rules=[], fallbacks={primary: [fallback]})
+    results, errors = [], []
+
+    def chat(i):
+        try:
+            candidates, reason = router.route(primary)
+            results.append(router.send_message(openai_service, f"Hi {i}", [], candidates, reason, use_cache=False))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The primary's circuit is open now: later requests fail over without waiting for it
+    start = time.perf_counter()
+    chat(8)
+    elapsed = time.perf_counter() - start
+    states = {model: get_breaker(f"openai:{model}").get_status()["state"] for model in (primary, fallback)}
+
+    print(f"   Errors: {errors}, models: {[r['usage']['model'] for r in results]}, circuits: {states}, "
+          f"open-circuit request: {elapsed:.3f}s")
+    ok = not errors and len(results) == 9 and all(r["message"] == f"answer from {fallback}" for r in results) \
+        and states == {primary: "open", fallback: "closed"} and elapsed < 0.05
+    print("[OK] Primary timeouts failed over" if ok else "[ERROR] Primary timeouts not failed over")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_routing_rules, test_failover, test_slow_model_avoided, test_concurrent_primary_timeouts):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,193 @@
+"""
+Papita Usage Logger Test Script
+Tests background delivery, spooling and replay (including corrupt spool files) against a local fake Papita API
+"""
+import sys
+import io
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.papita_usage_logger import PapitaUsageLogger
+from service.http_clients import get_papita_client
+
+
+class FakePapitaHandler(BaseHTTPRequestHandler):
+    """Accepts /api/usage/log posts and records them on the server (after server.delay seconds)"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.delay)
+        self.server.received.append(json.loads(body))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"success": true}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_papita():
+    """Start a fake Papita API on a free port"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakePapitaHandler)
+    server.received = []
+    server.delay = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_background_delivery():
+    """Test that log() returns immediately and records are delivered in the background"""
+    print("\n" + "="*60)
+    print("  Testing Papita Usage Logger Delivery")
+    print("="*60)
+
+    server = start_fake_papita()
+    spool = Path(tempfile.mkdtemp()) / 'usage.jsonl'
+    usage_logger = PapitaUsageLogger(f'http://127.0.0.1:{server.server_address[1]}', batch_size=5,
+                                     flush_interval=0.1, spool_file=spool)
+    try:
+        start = time.perf_counter()
+        for i in range(12):
+            usage_logger.log({'username': 'guest', 'totalTokens': i})
+        elapsed = time.perf_counter() - start
+        usage_logger.flush()
+
+        print(f"   Enqueue time for 12 records: {elapsed * 1000:.2f} ms")
+        print(f"   Delivered: {len(server.received)}")
+        ok = len(server.received) == 12 and not spool.exists()
+        print("   [OK] All records delivered" if ok else "   [ERROR] Records missing")
+        assert ok
+        return ok
+    finally:
+        usage_logger.stop()
+        server.shutdown()
+
+
+def test_spool_and_replay():
+    """Test that records are spooled while Papita is down and replayed once it is back"""
+    print("\n" + "="*60)
+    print("  Testing Papita Usage Logger Spool/Replay")
+    print("="*60)
+
+    spool = Path(tempfile.mkdtemp()) / 'usage.jsonl'
+    # Nothing is listening on port 9 (discard) - connections are refused
+    usage_logger = PapitaUsageLogger('http://127.0.0.1:9', batch_size=3, flush_interval=0.1,
+                                     max_retries=1, spool_file=spool)
+    usage_logger.backoff_base = 0.01
+    server = start_fake_papita()
+    try:
+        for i in range(3):
+            usage_logger.log({'username': 'guest', 'totalTokens': i})
+        usage_logger.flush()
+        spooled = spool.read_text(encoding='utf-8').splitlines() if spool.exists() else []
+        print(f"   Spooled while down: {len(spooled)}")
+
+        usage_logger.api_url = f'http://127.0.0.1:{server.server_address[1]}'
+        usage_logger.spool_replay_interval = 0
+        usage_logger.log({'username': 'guest', 'totalTokens': 99})
+        usage_logger.flush()
+        time.sleep(0.3)
+
+        print(f"   Delivered after recovery: {len(server.received)}")
+        ok = len(spooled) == 3 and len(server.received) == 4 and not spool.exists()
+        print("   [OK] Spooled records replayed" if ok else "   [ERROR] Spool replay failed")
+        assert ok
+        return ok
+    finally:
+        usage_logger.stop()
+        server.shutdown()
+
+
+def test_corrupt_spool():
+    """Test that corrupt spool lines (e.g. a crash mid-write) are skipped and the worker keeps delivering"""
+    print("\n" + "="*60)
+    print("  Testing Papita Usage Logger Corrupt Spool")
+    print("="*60)
+
+    spool = Path(tempfile.mkdtemp()) / 'usage.jsonl'
+    spool.write_text('{"username": "guest", "totalTokens": 1}\n{"username": "gue\n', encoding='utf-8')
+    # Leftover from an interrupted replay, also cut off mid-line
+    spool.with_suffix('.replay').write_text('{"username": "guest", "totalTokens": 2}\nnot json', encoding='utf-8')
+    server = start_fake_papita()
+    usage_logger = PapitaUsageLogger(f'http://127.0.0.1:{server.server_address[1]}', batch_size=1,
+                                     flush_interval=0.1, spool_file=spool)
+    usage_logger.spool_replay_interval = 0
+    try:
+        usage_logger.log({'username': 'guest', 'totalTokens': 3})
+        usage_logger.flush()
+        time.sleep(0.3)
+        usage_logger.log({'username': 'guest', 'totalTokens': 4})
+        usage_logger.flush()
+
+        stats = usage_logger.get_stats()
+        tokens = sorted(record['totalTokens'] for record in server.received)
+        print(f"   Delivered: {tokens}, discarded: {stats['discarded']}, worker alive: {stats['worker_alive']}")
+        ok = tokens == [1, 2, 3, 4] and stats['discarded'] == 2 and stats['worker_alive'] \
+            and not spool.exists() and not spool.with_suffix('.replay').exists()
+        print("   [OK] Corrupt lines skipped" if ok else "   [ERROR] Corrupt spool broke delivery")
+        assert ok
+        return ok
+    finally:
+        usage_logger.stop()
+        server.shutdown()
+
+
+def test_shared_spool_replayed_once():
+    """Test that workers sharing a spool file replay each record once"""
+    print("\n" + "="*60)
+    print("  Testing Papita Usage Logger Shared Spool")
+    print("="*60)
+
+    spool = Path(tempfile.mkdtemp()) / 'usage.jsonl'
+    spool.write_text(''.join(json.dumps({'username': 'guest', 'totalTokens': i}) + '\n' for i in range(100)),
+                     encoding='utf-8')
+    server = start_fake_papita()
+    server.delay = 0.005
+    # One logger per gunicorn worker, all with the same spool file
+    first, second = [PapitaUsageLogger(f'http://127.0.0.1:{server.server_address[1]}', spool_file=spool)
+                     for _ in range(2)]
+    first.spool_replay_interval = second.spool_replay_interval = 0
+    try:
+        # The second worker spools a record and finds the spool while the first is still replaying
+        replaying = threading.Thread(target=first._maybe_replay_spool, args=(get_papita_client(),))
+        replaying.start()
+        time.sleep(0.1)
+        second._spool([{'username': 'guest', 'totalTokens': 100}])
+        second._maybe_replay_spool(get_papita_client())
+        replaying.join()
+        second._maybe_replay_spool(get_papita_client())
+
+        tokens = sorted(record['totalTokens'] for record in server.received)
+        replayed = [first.get_stats()['replayed'], second.get_stats()['replayed']]
+        print(f"   Delivered: {len(tokens)} ({len(set(tokens))} distinct), replayed per worker: {replayed}")
+        ok = tokens == list(range(101)) and replayed == [100, 1] \
+            and not spool.exists() and not spool.with_suffix('.replay').exists()
+        print("   [OK] Shared spool replayed once" if ok else "   [ERROR] Shared spool records duplicated or lost")
+        assert ok
+        return ok
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_background_delivery, test_spool_and_replay, test_corrupt_spool, test_shared_spool_replayed_once):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
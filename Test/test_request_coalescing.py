@@ -0,0 +1,134 @@
+"""
+Request Coalescing Test Script
+Tests that identical concurrent chat requests share one OpenAI call (no API key needed)
+"""
+import os
+import sys
+import io
+import time
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-coalescing')
+
+from credentials.credential_manager import CredentialManager
+from service.openai_service import OpenAIService
+from service.request_coalescer import RequestCoalescer
+from service.usage_aggregator import UsageAggregator
+
+
+class SlowCompletions:
+    """Fake completions API that takes a while to answer and counts upstream calls"""
+
+    def __init__(self, delay=0.2, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream unavailable")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {call}"))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        )
+
+
+def send_concurrently(openai_service, messages, **kwargs):
+    """Send each message from its own thread at the same time. Returns results (or exceptions) in order."""
+    results = [None] * len(messages)
+    barrier = threading.Barrier(len(messages))
+
+    def send(i):
+        barrier.wait()
+        try:
+            results[i] = openai_service.send_message(messages[i], **kwargs)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(messages))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def make_service(completions):
+    openai_service = OpenAIService(CredentialManager(), coalescer=RequestCoalescer())
+    openai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return openai_service
+
+
+def test_duplicates_share_one_call():
+    """Test that concurrent duplicates wait for one call and only that call reports tokens"""
+    print("\n" + "="*60)
+    print("  Testing Coalesced Duplicates")
+    print("="*60)
+
+    completions = SlowCompletions()
+    openai_service = make_service(completions)
+    results = send_concurrently(openai_service, ["Same question"] * 8 + ["Other question"])
+
+    aggregator = UsageAggregator()
+    for result in results:
+        aggregator.record("gpt-test", "guest", None, result["usage"])
+    stats = aggregator.snapshot()
+
+    shared = [r for r in results[:8] if r["usage"].get("coalesced")]
+    print(f"   Upstream calls: {completions.calls}, coalesced: {len(shared)}, "
+          f"coalescer: {openai_service.coalescer.get_stats()}")
+    ok = completions.calls == 2 and len(shared) == 7 \
+        and len({r["message"] for r in results[:8]}) == 1 \
+        and all(r["usage"]["total_tokens"] == 0 and r["usage"]["saved_tokens"] == 15 for r in shared) \
+        and stats["total_tokens"] == 30 and stats["request_count"] == 9 \
+        and stats["coalesced_requests"] == 7 and stats["coalesced_tokens_saved"] == 105 \
+        and openai_service.coalescer.get_stats()["in_flight"] == 0
+    print("[OK] Duplicates shared one call" if ok else "[ERROR] Coalescing incorrect")
+    assert ok
+    return ok
+
+
+def test_errors_and_bypass():
+    """Test that every waiter gets the call's error, and cache=False requests are not coalesced"""
+    print("\n" + "="*60)
+    print("  Testing Coalesced Errors and Bypass")
+    print("="*60)
+
+    failing = SlowCompletions(fail=True)
+    errors = send_concurrently(make_service(failing), ["Same question"] * 4)
+
+    completions = SlowCompletions(delay=0.05)
+    bypassed = send_concurrently(make_service(completions), ["Same question"] * 3, use_cache=False)
+
+    print(f"   Failing calls: {failing.calls}, errors: {[str(e) for e in errors]}, bypass calls: {completions.calls}")
+    ok = failing.calls == 1 and all(isinstance(e, Exception) and "upstream unavailable" in str(e) for e in errors) \
+        and completions.calls == 3 and not any(r["usage"].get("coalesced") for r in bypassed)
+    print("[OK] Errors shared and bypass respected" if ok else "[ERROR] Error or bypass handling incorrect")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_duplicates_share_one_call, test_errors_and_bypass):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,163 @@
+"""
+Resilience Test Script
+Tests typed upstream errors, retries with Retry-After and circuit breakers,
+using fake OpenAI responses (no API key needed)
+"""
+import os
+import sys
+import io
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-resilience')
+
+import httpx
+import openai
+from credentials.credential_manager import CredentialManager
+from service.openai_service import OpenAIService
+from service.resilience import (CircuitBreaker, CircuitOpenError, RetryPolicy, UpstreamAuthError,
+                                UpstreamRateLimitError, UpstreamUnavailableError)
+
+
+def status_error(error_class, status, headers=None):
+    """Build an OpenAI SDK status error as the SDK raises it"""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return error_class(f"Error code: {status}", response=response, body=None)
+
+
+class ScriptedCompletions:
+    """Fake completions API that raises the scripted errors in turn, then answers"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(time.perf_counter())
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+            usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1, total_tokens=2)
+        )
+
+
+def make_service(completions, max_retries=2, failure_threshold=5, reset_timeout=30):
+    openai_service = OpenAIService(CredentialManager())
+    openai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    openai_service.retry_policy = RetryPolicy(max_retries=max_retries, base_delay=0.01, max_delay=0.05, max_retry_after=1)
+    openai_service.breaker = CircuitBreaker("openai-test", failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+    return openai_service
+
+
+def test_retry_after_honored():
+    """Test that 429/5xx are retried, waiting at least Retry-After"""
+    print("\n" + "="*60)
+    print("  Testing Retries")
+    print("="*60)
+
+    completions = ScriptedCompletions([
+        status_error(openai.RateLimitError, 429, {"retry-after": "0.2"}),
+        status_error(openai.InternalServerError, 503)
+    ])
+    result = make_service(completions).send_message("Hi")
+    waited = completions.calls[1] - completions.calls[0]
+
+    exhausted = ScriptedCompletions([status_error(openai.InternalServerError, 500)] * 5)
+    try:
+        make_service(exhausted).send_message("Hi")
+        final_error = None
+    except Exception as e:
+        final_error = e
+
+    too_long = ScriptedCompletions([status_error(openai.RateLimitError, 429, {"retry-after": "60"})])
+    try:
+        make_service(too_long).send_message("Hi")
+        rate_error = None
+    except Exception as e:
+        rate_error = e
+
+    print(f"   Attempts: {len(completions.calls)}, waited for Retry-After: {waited:.2f}s, "
+          f"exhausted: {type(final_error).__name__} after {len(exhausted.calls)}, long Retry-After: {type(rate_error).__name__}")
+    ok = result["message"] == "ok" and len(completions.calls) == 3 and waited >= 0.2 \
+        and isinstance(final_error, UpstreamUnavailableError) and len(exhausted.calls) == 3 \
+        and isinstance(rate_error, UpstreamRateLimitError) and rate_error.retry_after == 60 and len(too_long.calls) == 1
+    print("[OK] Retries correct" if ok else "[ERROR] Retries incorrect")
+    assert ok
+    return ok
+
+
+def test_auth_error_typed():
+    """Test that an invalid key raises UpstreamAuthError without retries or tripping the circuit"""
+    print("\n" + "="*60)
+    print("  Testing Typed Auth Error")
+    print("="*60)
+
+    completions = ScriptedCompletions([status_error(openai.AuthenticationError, 401)] * 10)
+    openai_service = make_service(completions, failure_threshold=1)
+    errors = []
+    for _ in range(3):
+        try:
+            openai_service.send_message("Hi")
+        except Exception as e:
+            errors.append(e)
+
+    print(f"   Errors: {[type(e).__name__ for e in errors]}, calls: {len(completions.calls)}, "
+          f"circuit: {openai_service.breaker.state}")
+    ok = all(isinstance(e, UpstreamAuthError) for e in errors) and len(errors) == 3 \
+        and len(completions.calls) == 3 and openai_service.breaker.state == "closed"
+    print("[OK] Auth errors typed" if ok else "[ERROR] Auth error handling incorrect")
+    assert ok
+    return ok
+
+
+def test_circuit_breaker():
+    """Test that the circuit opens after repeated failures, fails fast, and closes after a good trial call"""
+    print("\n" + "="*60)
+    print("  Testing Circuit Breaker")
+    print("="*60)
+
+    completions = ScriptedCompletions([openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))] * 3)
+    openai_service = make_service(completions, max_retries=0, failure_threshold=3, reset_timeout=0.2)
+    errors = []
+    for _ in range(5):
+        try:
+            openai_service.send_message("Hi")
+        except Exception as e:
+            errors.append(e)
+    calls_while_open = len(completions.calls)
+    open_state = openai_service.breaker.state
+
+    time.sleep(0.25)
+    result = openai_service.send_message("Hi")
+    status = openai_service.breaker.get_status()
+
+    print(f"   Errors: {[type(e).__name__ for e in errors]}, calls: {calls_while_open}, "
+          f"state while open: {open_state}, after trial: {status}")
+    ok = [type(e) for e in errors] == [UpstreamUnavailableError] * 3 + [CircuitOpenError] * 2 \
+        and calls_while_open == 3 and open_state == "open" \
+        and result["message"] == "ok" and status["state"] == "closed" and status["opened"] == 1 and status["rejected"] == 2
+    print("[OK] Circuit breaker correct" if ok else "[ERROR] Circuit breaker incorrect")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_retry_after_honored, test_auth_error_typed, test_circuit_breaker):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,113 @@
+"""
+Response Cache Test Script
+Tests the completion cache (LRU, TTL, SQLite tier) and its use in OpenAIService
+"""
+import os
+import sys
+import io
+import time
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-response-cache')
+
+from credentials.credential_manager import CredentialManager
+from service.openai_service import OpenAIService
+from service.response_cache import ResponseCache, make_cache_key
+
+
+class CountingCompletions:
+    """Fake completions API that counts upstream calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"))],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        )
+
+
+def test_cache_bounds():
+    """Test LRU eviction, TTL expiry and the disk tier"""
+    print("\n" + "="*60)
+    print("  Testing Response Cache Bounds")
+    print("="*60)
+
+    db_path = Path(tempfile.mkdtemp()) / 'responses.sqlite3'
+    cache = ResponseCache(max_entries=2, ttl=60, db_path=db_path)
+    for i in range(3):
+        cache.set(make_cache_key("gpt-test", [{"role": "user", "content": str(i)}]), {"message": str(i), "usage": {}})
+    print(f"   Memory entries after 3 stores (max 2): {cache.get_stats()['entries']}")
+
+    # A fresh instance only has the disk tier
+    reopened = ResponseCache(max_entries=2, ttl=60, db_path=db_path)
+    disk_hit = reopened.get(make_cache_key("gpt-test", [{"role": "user", "content": "0"}]))
+    print(f"   Disk hit after restart: {disk_hit}")
+
+    short_lived = ResponseCache(max_entries=2, ttl=0.05)
+    short_lived.set("key", {"message": "x", "usage": {}})
+    time.sleep(0.1)
+    expired = short_lived.get("key")
+
+    # ttl=0 is kept, not replaced by the default
+    no_ttl = ResponseCache(max_entries=2, ttl=0)
+    no_ttl.set("key", {"message": "x", "usage": {}})
+
+    ok = cache.get_stats()["entries"] == 2 and disk_hit == {"message": "0", "usage": {}} and expired is None \
+        and no_ttl.ttl == 0 and no_ttl.get("key") is None
+    print("   [OK] Cache bounds respected" if ok else "   [ERROR] Cache bounds not respected")
+    assert ok
+    return ok
+
+
+def test_service_cache_hit():
+    """Test that identical requests are served from the cache with savings reported"""
+    print("\n" + "="*60)
+    print("  Testing OpenAIService Cache Hits")
+    print("="*60)
+
+    openai_service = OpenAIService(CredentialManager(), response_cache=ResponseCache(max_entries=10, ttl=60))
+    completions = CountingCompletions()
+    openai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    first = openai_service.send_message("Analyze this", [{"role": "user", "content": "hi"}])
+    second = openai_service.send_message("Analyze this", [{"role": "user", "content": "hi"}])
+    bypass = openai_service.send_message("Analyze this", [{"role": "user", "content": "hi"}], use_cache=False)
+
+    print(f"   Upstream calls: {completions.calls}")
+    print(f"   Cached usage: {second['usage']}")
+
+    ok = (
+        completions.calls == 2
+        and second["message"] == first["message"]
+        and second["usage"]["cached"] is True
+        and second["usage"]["total_tokens"] == 0
+        and second["usage"]["saved_tokens"] == 15
+        and bypass["message"] == "answer 2"
+    )
+    print("   [OK] Cache hit served without upstream call" if ok else "   [ERROR] Unexpected cache behavior")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_cache_bounds, test_service_cache_hit):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
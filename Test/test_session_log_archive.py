@@ -0,0 +1,132 @@
+"""
+Session Log Archive Test Script
+Tests compressing old session logs, payload dedup and reading across plain and archived logs
+"""
+import os
+import sys
+import io
+import json
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from session_logger import SessionLogger
+
+CRITERIA = {"backend": "Python", "folder_structure": ["Backend", "Frontend", "SessionLog", "Docs"] * 10}
+
+
+def write_day(log_dir, day, sessions):
+    """Write a day of logs: a project_init entry and a start/metric/stop per session"""
+    with open(Path(log_dir) / f"session_{day}.log", 'w', encoding='utf-8') as f:
+        f.write(json.dumps({"event": "project_init", "date": day, "project_criteria": CRITERIA}) + '\n')
+        for n in range(sessions):
+            session_id = f"session_{day}_{n}"
+            f.write(json.dumps({"event": "session_start", "session_id": session_id, "date": day}) + '\n')
+            f.write(json.dumps({"event": "metric", "session_id": session_id, "metric_name": "n", "metric_value": n}) + '\n')
+            f.write(json.dumps({"event": "session_stop", "session_id": session_id, "date": day}) + '\n')
+
+
+def test_archive_old_logs():
+    """Test that old logs are compressed, deduplicated and still readable through the index"""
+    print("\n" + "="*60)
+    print("  Testing Session Log Archiving")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        for day in ("2026-01-01", "2026-01-02", "2026-01-20"):
+            write_day(log_dir, day, sessions=2000)
+        logger = SessionLogger(log_dir)
+        logger.archiver.archive_after_days = 7
+        before = logger.get_session_events("session_2026-01-01_1500")
+
+        reports = logger.archiver.archive(today=datetime(2026, 1, 21))
+        files = sorted(p.name for p in Path(log_dir).glob("session_2026-*"))
+        after = logger.get_session_events("session_2026-01-01_1500")
+        init = logger.get_events("2026-01-02", "2026-01-02", event="project_init")
+        all_events = sum(1 for _ in logger.iter_events())
+        logger.writer.stop()
+        logger.index.close()
+
+    print(f"   Files: {files}")
+    for report in reports:
+        print(f"   {report['file']}: {report['original_bytes']} -> {report['archived_bytes']} bytes")
+    ok = files == ["session_2026-01-01.log.gz", "session_2026-01-02.log.gz", "session_2026-01-20.log"] \
+        and len(reports) == 2 and all(r["archived_bytes"] < r["original_bytes"] / 5 for r in reports) \
+        and before == after and len(after) == 3 \
+        and init[0]["project_criteria"] == CRITERIA and all_events == 3 * (1 + 3 * 2000)
+    print("[OK] Old logs archived and readable" if ok else "[ERROR] Archiving lost or changed entries")
+    assert ok
+    return ok
+
+
+def test_streaming_reader_order():
+    """Test that the streaming reader returns days in order with payloads restored"""
+    print("\n" + "="*60)
+    print("  Testing Streaming Reader")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        for day in ("2026-01-01", "2026-01-02", "2026-01-03"):
+            write_day(log_dir, day, sessions=3)
+        logger = SessionLogger(log_dir)
+        logger.archiver.archive_after_days = 1
+        logger.archiver.archive(today=datetime(2026, 1, 3))
+
+        inits = list(logger.iter_events(event="project_init"))
+        ranged = list(logger.iter_events("2026-01-02", "2026-01-03", event="session_start"))
+        logger.writer.stop()
+        logger.index.close()
+
+    print(f"   project_init days: {[e['date'] for e in inits]}, ranged starts: {len(ranged)}")
+    ok = [e["date"] for e in inits] == ["2026-01-01", "2026-01-02", "2026-01-03"] \
+        and all(e["project_criteria"] == CRITERIA for e in inits) and len(ranged) == 6
+    print("[OK] Streaming reader correct" if ok else "[ERROR] Streaming reader incorrect")
+    assert ok
+    return ok
+
+
+def test_archiving_opt_in():
+    """Test that nothing is archived unless SESSION_LOG_ARCHIVE_DAYS is set"""
+    print("\n" + "="*60)
+    print("  Testing Session Log Archiving Is Opt-In")
+    print("="*60)
+
+    saved = os.environ.pop('SESSION_LOG_ARCHIVE_DAYS', None)
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            write_day(log_dir, "2026-01-01", sessions=2)
+            logger = SessionLogger(log_dir)
+            logger.start_archiving()
+            reports = logger.archiver.archive(today=datetime(2026, 6, 1))
+            files = sorted(p.name for p in Path(log_dir).iterdir())
+            started = logger.archiver._thread is not None
+            logger.writer.stop()
+            logger.index.close()
+    finally:
+        if saved is not None:
+            os.environ['SESSION_LOG_ARCHIVE_DAYS'] = saved
+
+    print(f"   Reports: {reports}, files: {files}, archiver started: {started}")
+    ok = reports == [] and files == ["session_2026-01-01.log"] and not started
+    print("[OK] Logs left alone by default" if ok else "[ERROR] Logs archived by default")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_archive_old_logs, test_streaming_reader_order, test_archiving_opt_in):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,142 @@
+"""
+Session Log Index Test Script
+Tests the byte-offset index over session log files and indexed queries
+"""
+import sys
+import io
+import json
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.session_log_index import SessionLogIndex
+from session_logger import SessionLogger
+
+
+def write_lines(log_file, entries, partial=None):
+    """Append entries as JSON lines, optionally followed by an unfinished line"""
+    with open(log_file, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        if partial:
+            f.write(partial)
+
+
+def test_incremental_sync():
+    """Test that each sync only indexes complete lines appended since the last one"""
+    print("\n" + "="*60)
+    print("  Testing Incremental Index Sync")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = Path(log_dir) / "session_2026-01-01.log"
+        index = SessionLogIndex(log_dir)
+        write_lines(log_file, [{"event": "session_start", "session_id": "s1"}], partial='{"event": "metric", "sess')
+        first = index.sync()
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write('ion_id": "s1", "metric_name": "m"}\n')
+        write_lines(log_file, [{"event": "session_stop", "session_id": "s1"}])
+        second = index.sync()
+        third = index.sync()
+        events = [e["event"] for e in index.get_session_events("s1")]
+        index.close()
+
+    print(f"   Added per sync: {first}, {second}, {third}; events: {events}")
+    ok = (first, second, third) == (1, 2, 0) and events == ["session_start", "metric", "session_stop"]
+    print("[OK] Index updated incrementally" if ok else "[ERROR] Index sync incorrect")
+    assert ok
+    return ok
+
+
+def test_truncated_file_reindexed():
+    """Test that a file replaced by a shorter one is indexed again from the start"""
+    print("\n" + "="*60)
+    print("  Testing Reindex After Truncation")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = Path(log_dir) / "session_2026-01-01.log"
+        index = SessionLogIndex(log_dir)
+        write_lines(log_file, [{"event": "metric", "session_id": "old"}] * 5)
+        index.sync()
+        log_file.write_text(json.dumps({"event": "metric", "session_id": "new"}) + '\n', encoding='utf-8')
+        index.sync()
+        old_events = index.get_session_events("old")
+        new_events = index.get_session_events("new")
+        index.close()
+
+    print(f"   Old session events: {len(old_events)}, new session events: {len(new_events)}")
+    ok = len(old_events) == 0 and len(new_events) == 1
+    print("[OK] Replaced file reindexed" if ok else "[ERROR] Stale index entries")
+    assert ok
+    return ok
+
+
+def test_logger_queries():
+    """Test session and date-range queries through SessionLogger"""
+    print("\n" + "="*60)
+    print("  Testing Session Logger Queries")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        for day in ("2026-01-01", "2026-01-02", "2026-01-03"):
+            write_lines(Path(log_dir) / f"session_{day}.log",
+                        [{"event": "session_start", "session_id": f"s-{day}", "date": day},
+                         {"event": "metric", "session_id": f"s-{day}", "date": day}])
+        logger = SessionLogger(log_dir)
+        session_id = logger.start_session()
+        logger.log_metric(session_id, "messages", 3)
+
+        session_events = logger.get_session_events(session_id)
+        metrics_only = logger.get_session_events(session_id, event="metric")
+        in_range = logger.get_events("2026-01-02", "2026-01-03")
+        paged = logger.get_events("2026-01-01", "2026-01-03", event="metric", limit=1, offset=1)
+        logger.writer.stop()
+        logger.index.close()
+
+    print(f"   Session events: {len(session_events)}, in range: {len(in_range)}, paged: {paged}")
+    ok = [e["event"] for e in session_events] == ["session_start", "metric"] and len(metrics_only) == 1 \
+        and [e["session_id"] for e in in_range] == ["s-2026-01-02"] * 2 + ["s-2026-01-03"] * 2 \
+        and len(paged) == 1 and paged[0]["session_id"] == "s-2026-01-02"
+    print("[OK] Indexed queries correct" if ok else "[ERROR] Indexed queries incorrect")
+    assert ok
+    return ok
+
+
+def test_opened_on_first_use():
+    """Test that creating a logger (as importing main.py does) doesn't create the index database"""
+    print("\n" + "="*60)
+    print("  Testing Index Opened On First Use")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir)
+        created_files = sorted(p.name for p in Path(log_dir).iterdir())
+        events = logger.get_events()
+        opened = logger.index.db_path.exists()
+        logger.writer.stop()
+        logger.index.close()
+
+    print(f"   Files after construction: {created_files}, index created on first query: {opened}")
+    ok = created_files == [] and events == [] and opened
+    print("[OK] Index opened lazily" if ok else "[ERROR] Index opened at construction")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_incremental_sync, test_truncated_file_reindexed, test_logger_queries, test_opened_on_first_use):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,165 @@
+"""
+Session Log Writer Test Script
+Tests buffered session log writes from many threads and processes
+"""
+import sys
+import io
+import json
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.session_log_writer import SessionLogWriter
+
+# Long entries make interleaved partial writes easy to spot
+PADDING = "x" * 2000
+
+WORKER_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from service.session_log_writer import SessionLogWriter
+writer = SessionLogWriter(flush_interval=0.01)
+for i in range(300):
+    writer.write(sys.argv[2], {"event": "metric", "worker": sys.argv[3], "n": i, "padding": "x" * 2000})
+writer.stop()
+"""
+
+
+def read_entries(log_file):
+    """Parse every line of a log file, failing on any corrupted line"""
+    with open(log_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_concurrent_threads():
+    """Test that entries from many threads are all written as whole lines"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Session Log Writes (threads)")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = Path(log_dir) / "session_test.log"
+        writer = SessionLogWriter(flush_interval=0.01)
+
+        def worker(n):
+            for i in range(500):
+                writer.write(log_file, {"event": "metric", "thread": n, "n": i, "padding": PADDING})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.stop()
+        entries = read_entries(log_file)
+        stats = writer.get_stats()
+
+    print(f"   Entries: {len(entries)} in {stats['batches']} batches")
+    ok = len(entries) == 4000 and stats["written"] == 4000
+    print("[OK] All entries written intact" if ok else "[ERROR] Entries lost or corrupted")
+    assert ok
+    return ok
+
+
+def test_concurrent_processes():
+    """Test that worker processes appending to the same file don't interleave lines"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Session Log Writes (processes)")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = Path(log_dir) / "session_test.log"
+        processes = [
+            subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, str(backend_path), str(log_file), str(n)])
+            for n in range(4)
+        ]
+        for p in processes:
+            p.wait()
+        entries = read_entries(log_file)
+
+    per_worker = {w: sum(1 for e in entries if e["worker"] == w) for w in ("0", "1", "2", "3")}
+    print(f"   Entries per worker: {per_worker}")
+    ok = len(entries) == 1200 and all(count == 300 for count in per_worker.values())
+    print("[OK] Processes wrote whole lines" if ok else "[ERROR] Lines lost or interleaved")
+    assert ok
+    return ok
+
+
+def test_daily_rotation_and_full_queue():
+    """Test that entries go to their own day's file and a full queue falls back to direct writes"""
+    print("\n" + "="*60)
+    print("  Testing Rotation and Full Queue")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        day1 = Path(log_dir) / "session_2026-01-01.log"
+        day2 = Path(log_dir) / "session_2026-01-02.log"
+        writer = SessionLogWriter(flush_interval=0.01, max_queue_size=1)
+        for i in range(50):
+            writer.write(day1 if i < 25 else day2, {"event": "metric", "n": i})
+        writer.stop()
+        day1_entries = read_entries(day1)
+        day2_entries = read_entries(day2)
+        stats = writer.get_stats()
+
+    print(f"   Day 1: {len(day1_entries)}, day 2: {len(day2_entries)}, direct writes: {stats['direct_writes']}")
+    # Direct writes can land before queued ones, so only the file each entry went to is checked
+    ok = sorted(e["n"] for e in day1_entries) == list(range(25)) \
+        and sorted(e["n"] for e in day2_entries) == list(range(25, 50)) and stats["direct_writes"] > 0
+    print("[OK] Rotation and overflow handled" if ok else "[ERROR] Entries in wrong file or lost")
+    assert ok
+    return ok
+
+
+def test_worker_survives_errors():
+    """Test that a batch failing with an unexpected error is dropped and the worker keeps writing"""
+    print("\n" + "="*60)
+    print("  Testing Writer Errors")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        log_file = Path(log_dir) / "session_2026-01-01.log"
+        writer = SessionLogWriter(flush_interval=0.01)
+        append = writer._append
+        failures = [ValueError("bad entry")]
+
+        def failing_append(path, data):
+            if failures:
+                raise failures.pop()
+            append(path, data)
+
+        writer._append = failing_append
+        writer.write(log_file, {"event": "metric", "n": 1})
+        writer.flush()
+        writer.write(log_file, {"event": "metric", "n": 2})
+        flushed = writer.flush()
+        stats = writer.get_stats()
+        writer.stop()
+        entries = read_entries(log_file)
+
+    print(f"   Entries: {entries}, errors: {stats['errors']}, worker alive: {stats['worker_alive']}")
+    ok = flushed and [e["n"] for e in entries] == [2] and stats["errors"] == 1 and stats["worker_alive"]
+    print("[OK] Worker survived a failed batch" if ok else "[ERROR] Worker stopped after a failed batch")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_concurrent_threads, test_concurrent_processes, test_daily_rotation_and_full_queue,
+                 test_worker_survives_errors):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
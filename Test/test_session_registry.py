@@ -0,0 +1,172 @@
+"""
+Session Registry Test Script
+Tests concurrent sessions in SessionLogger: collision-free IDs, per-session
+durations and counters, and idle-session eviction
+"""
+import sys
+import io
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from session_logger import SessionLogger
+
+
+def close(logger):
+    logger.stop_evicting()
+    logger.writer.stop()
+    logger.index.close()
+
+
+def test_concurrent_starts_unique():
+    """Test that sessions started at the same time from many threads get distinct IDs"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Session Starts")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir)
+        ids = []
+        ids_lock = threading.Lock()
+
+        def start_many():
+            started = [logger.start_session() for _ in range(200)]
+            with ids_lock:
+                ids.extend(started)
+
+        threads = [threading.Thread(target=start_many) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        open_sessions = logger.get_open_sessions()["open_sessions"]
+        close(logger)
+
+    print(f"   Started: {len(ids)}, unique: {len(set(ids))}, open: {open_sessions}")
+    ok = len(ids) == 2000 and len(set(ids)) == 2000 and open_sessions == 2000
+    print("[OK] Session IDs are unique" if ok else "[ERROR] Session IDs collided")
+    assert ok
+    return ok
+
+
+def test_sessions_isolated():
+    """Test that stopping one session does not affect another's duration or counters"""
+    print("\n" + "="*60)
+    print("  Testing Session Isolation")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir)
+        first = logger.start_session()
+        time.sleep(0.2)
+        second = logger.start_session()
+        logger.log_metric(first, "messages", 1)
+        logger.log_metric(first, "messages", 2)
+        logger.touch_session(second)
+
+        first_stop = logger.stop_session(first)
+        second_stop = logger.stop_session(second)
+        close(logger)
+
+    print(f"   First: {first_stop['duration_seconds']}s {first_stop['counters']}, "
+          f"second: {second_stop['duration_seconds']}s {second_stop['counters']}")
+    ok = first_stop["duration_seconds"] >= 0.2 > second_stop["duration_seconds"] \
+        and first_stop["counters"] == {"events": 0, "metrics": 2} \
+        and second_stop["counters"] == {"events": 1, "metrics": 0}
+    print("[OK] Sessions tracked independently" if ok else "[ERROR] Sessions interfered")
+    assert ok
+    return ok
+
+
+def test_idle_eviction():
+    """Test that idle sessions are stopped with a synthetic session_stop and active ones kept"""
+    print("\n" + "="*60)
+    print("  Testing Idle Session Eviction")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir, idle_timeout=0.2)
+        # Only the explicit call below evicts (see test_idle_eviction_in_background)
+        logger.evict_interval = 60
+        idle = logger.start_session()
+        active = logger.start_session()
+        time.sleep(0.3)
+        logger.touch_session(active)
+        evicted = logger.evict_idle_sessions()
+        logger.flush()
+        stops = logger.get_session_events(idle, event="session_stop")
+        open_sessions = logger.get_open_sessions()["open_sessions"]
+        close(logger)
+
+    print(f"   Evicted: {evicted}, open: {open_sessions}, stop entries: {stops}")
+    ok = evicted == 1 and open_sessions == 1 and len(stops) == 1 and stops[0].get("reason") == "idle_timeout"
+    print("[OK] Idle session stopped" if ok else "[ERROR] Idle eviction incorrect")
+    assert ok
+    return ok
+
+
+def test_idle_eviction_in_background():
+    """Test that idle sessions are stopped without any further session traffic"""
+    print("\n" + "="*60)
+    print("  Testing Background Idle Session Eviction")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir, idle_timeout=0.2)
+        session_id = logger.start_session()
+        time.sleep(0.5)
+        open_sessions = logger.get_open_sessions()["open_sessions"]
+        logger.flush()
+        stops = logger.get_session_events(session_id, event="session_stop")
+        close(logger)
+
+    print(f"   Open: {open_sessions}, stop entries: {stops}")
+    ok = open_sessions == 0 and len(stops) == 1 and stops[0].get("reason") == "idle_timeout"
+    print("[OK] Idle session stopped in the background" if ok else "[ERROR] Idle session left open")
+    assert ok
+    return ok
+
+
+def test_max_open_sessions():
+    """Test that the least recently active sessions are stopped over the open-session limit"""
+    print("\n" + "="*60)
+    print("  Testing Open Session Limit")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = SessionLogger(log_dir, max_open_sessions=3)
+        ids = [logger.start_session() for _ in range(3)]
+        logger.touch_session(ids[0])
+        logger.start_session()
+        open_ids = set(logger._sessions)
+        logger.flush()
+        stops = logger.get_session_events(ids[1], event="session_stop")
+        close(logger)
+
+    print(f"   Open: {len(open_ids)}, evicted stop: {stops}")
+    ok = len(open_ids) == 3 and ids[0] in open_ids and ids[1] not in open_ids \
+        and len(stops) == 1 and stops[0].get("reason") == "evicted"
+    print("[OK] Least recently active session stopped" if ok else "[ERROR] Open session limit incorrect")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_concurrent_starts_unique, test_sessions_isolated, test_idle_eviction, test_idle_eviction_in_background,
+                 test_max_open_sessions):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,130 @@
+"""
+Startup Test Script
+Tests deferred, run-once service initialization and project_init deduplication
+"""
+import sys
+import io
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.startup import LazyService, start_all
+from session_logger import SessionLogger
+
+
+def test_lazy_service_builds_once():
+    """Test that concurrent first uses build the service once"""
+    print("\n" + "="*60)
+    print("  Testing Lazy Service Builds Once")
+    print("="*60)
+
+    builds = []
+
+    def factory():
+        builds.append(1)
+        time.sleep(0.05)
+        return object()
+
+    service = LazyService("test", factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"   Builds: {len(builds)}, distinct results: {len(set(map(id, results)))}")
+    ok = len(builds) == 1 and len(set(map(id, results))) == 1 and service.get_status()["state"] == "ready"
+    print("[OK] Service built once" if ok else "[ERROR] Service built more than once")
+    assert ok
+    return ok
+
+
+def test_lazy_service_retry():
+    """Test that a failed build is kept for retry_interval, then retried"""
+    print("\n" + "="*60)
+    print("  Testing Lazy Service Retry After Failure")
+    print("="*60)
+
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("no credentials")
+        return "service"
+
+    service = LazyService("test", factory, retry_interval=0.1)
+    first = service.get()
+    second = service.get()
+    failed_status = service.get_status()
+    time.sleep(0.15)
+    third = service.get()
+
+    print(f"   Results: {first}, {second}, {third} after {len(attempts)} attempts")
+    ok = first is None and second is None and failed_status["state"] == "failed" \
+        and failed_status["error"] == "no credentials" and third == "service" and len(attempts) == 2
+    print("[OK] Failure cached, then retried" if ok else "[ERROR] Unexpected retry behavior")
+    assert ok
+    return ok
+
+
+def test_startup_budget():
+    """Test that startup waits at most the budget and slow services finish in the background"""
+    print("\n" + "="*60)
+    print("  Testing Startup Budget")
+    print("="*60)
+
+    fast = LazyService("fast", lambda: "fast")
+    slow = LazyService("slow", lambda: time.sleep(0.5) or "slow")
+    start = time.perf_counter()
+    report = start_all([fast, slow], budget=0.1)
+    elapsed = time.perf_counter() - start
+
+    print(f"   Waited {elapsed:.3f}s, report: {report}")
+    ok = elapsed < 0.4 and report["budget_exceeded"] and report["services"]["fast"]["state"] == "ready" \
+        and report["services"]["slow"]["state"] == "pending" and slow.get() == "slow"
+    print("[OK] Startup stayed within budget" if ok else "[ERROR] Startup budget not respected")
+    assert ok
+    return ok
+
+
+def test_project_init_logged_once():
+    """Test that project_init is only logged once per day for the same criteria"""
+    print("\n" + "="*60)
+    print("  Testing project_init Deduplication")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        criteria = {"backend": "Python"}
+        written = [SessionLogger(log_dir).log_project_init(criteria) for _ in range(3)]
+        changed = SessionLogger(log_dir).log_project_init({"backend": "Python", "frontend": "React"})
+        log_file = SessionLogger(log_dir)._get_log_file_path()
+        entries = log_file.read_text(encoding='utf-8').count('"project_init"')
+
+    print(f"   Written: {written}, changed criteria written: {changed}, entries: {entries}")
+    ok = written == [True, False, False] and changed and entries == 2
+    print("[OK] project_init deduplicated" if ok else "[ERROR] project_init logged repeatedly")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_lazy_service_builds_once, test_lazy_service_retry, test_startup_budget,
+                 test_project_init_logged_once):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,83 @@
+"""
+Streaming Test Script
+Tests OpenAIService.stream_message against a fake OpenAI client (no API key needed)
+"""
+import os
+import sys
+import io
+from pathlib import Path
+from types import SimpleNamespace
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test-streaming')
+
+from credentials.credential_manager import CredentialManager
+from service.openai_service import OpenAIService
+
+
+class FakeCompletions:
+    """Returns a canned stream of chunks in the OpenAI SDK shape"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.last_kwargs = None
+
+    def create(self, **kwargs):
+        self.last_kwargs = kwargs
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], usage=None)
+            for part in self.parts
+        ]
+        usage = SimpleNamespace(prompt_tokens=5, completion_tokens=len(self.parts), total_tokens=5 + len(self.parts))
+        chunks.append(SimpleNamespace(choices=[], usage=usage))
+        return iter(chunks)
+
+
+def test_stream_message():
+    """Test streaming deltas and the final usage event"""
+    print("\n" + "="*60)
+    print("  Testing OpenAIService.stream_message")
+    print("="*60)
+
+    try:
+        openai_service = OpenAIService(CredentialManager())
+        completions = FakeCompletions(["Hel", "lo", "!"])
+        openai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        events = list(openai_service.stream_message("Hi", [{"role": "user", "content": "earlier"}], model="gpt-test"))
+        deltas = [e["delta"] for e in events if "delta" in e]
+        final = events[-1]
+
+        print(f"   Deltas: {deltas}")
+        print(f"   Final: {final}")
+
+        ok = (
+            deltas == ["Hel", "lo", "!"]
+            and final["message"] == "Hello!"
+            and final["usage"]["total_tokens"] == 8
+            and final["usage"]["model"] == "gpt-test"
+            and completions.last_kwargs["stream"] is True
+            and len(completions.last_kwargs["messages"]) == 2
+        )
+        print("   [OK] Stream matches expected output" if ok else "   [ERROR] Unexpected stream output")
+        assert ok
+        return ok
+    except Exception as e:
+        print(f"   [ERROR] {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    try:
+        success = test_stream_message()
+    except Exception:
+        success = False
+    sys.exit(0 if success else 1)
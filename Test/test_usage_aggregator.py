@@ -0,0 +1,142 @@
+"""
+Usage Aggregator Test Script
+Tests thread-safe usage counters and per-model cost estimates
+"""
+import sys
+import io
+import tempfile
+import subprocess
+import threading
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Add Backend to path
+backend_path = Path(__file__).parent.parent / "Backend"
+sys.path.insert(0, str(backend_path))
+
+from service.usage_aggregator import UsageAggregator
+
+
+def test_concurrent_updates():
+    """Test that concurrent updates are not lost"""
+    print("\n" + "="*60)
+    print("  Testing Concurrent Usage Updates")
+    print("="*60)
+
+    aggregator = UsageAggregator()
+    usage = {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+
+    def worker(n):
+        for _ in range(2000):
+            aggregator.record("gpt-3.5-turbo", f"user{n % 4}", f"session{n}", usage)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = aggregator.snapshot()
+    print(f"   Requests: {stats['request_count']}, total tokens: {stats['total_tokens']}")
+    print(f"   Users tracked: {len(stats['by_user'])}")
+
+    ok = (
+        stats["request_count"] == 16000
+        and stats["total_tokens"] == 80000
+        and sum(u["request_count"] for u in stats["by_user"].values()) == 16000
+        and aggregator.get_session_usage("session0")["request_count"] == 2000
+    )
+    print("   [OK] No updates lost" if ok else "   [ERROR] Counters inconsistent")
+    assert ok
+    return ok
+
+
+def test_mixed_model_cost():
+    """Test that each model's tokens are priced at that model's rate"""
+    print("\n" + "="*60)
+    print("  Testing Mixed-Model Cost Estimates")
+    print("="*60)
+
+    aggregator = UsageAggregator()
+    aggregator.record("gpt-4", "alice", None, {"prompt_tokens": 1000, "completion_tokens": 1000, "total_tokens": 2000})
+    aggregator.record("gpt-3.5-turbo", "bob", None, {"prompt_tokens": 1000, "completion_tokens": 1000, "total_tokens": 2000})
+
+    stats = aggregator.snapshot()
+    print(f"   Per model: { {m: s['estimated_cost_usd'] for m, s in stats['by_model'].items()} }")
+    print(f"   Total: {stats['estimated_cost_usd']}")
+
+    # gpt-4: 0.03 + 0.06, gpt-3.5-turbo: 0.0015 + 0.002
+    ok = stats["estimated_cost_usd"] == round(0.09 + 0.0035, 4) and stats["model"] == "gpt-3.5-turbo"
+    print("   [OK] Costs priced per model" if ok else "   [ERROR] Unexpected cost")
+    assert ok
+    return ok
+
+
+def test_shared_state_dir():
+    """Test that aggregators sharing a state directory (one per worker) report merged totals"""
+    print("\n" + "="*60)
+    print("  Testing Usage Merged Across Workers")
+    print("="*60)
+
+    usage = {"prompt_tokens": 600, "completion_tokens": 400, "total_tokens": 1000}
+    with tempfile.TemporaryDirectory() as state_dir:
+        worker_a = UsageAggregator(state_dir=state_dir)
+        worker_b = UsageAggregator(state_dir=state_dir)
+        worker_a.record("gpt-4", "alice", "session1", usage)
+        worker_b.record("gpt-3.5-turbo", "alice", "session1", usage)
+        worker_b.persist()
+
+        stats = worker_a.snapshot()
+        session = worker_a.get_session_usage("session1")
+
+    print(f"   Total tokens: {stats['total_tokens']}, session tokens: {session['total_tokens']}")
+    ok = stats["total_tokens"] == 2000 and set(stats["by_model"]) == {"gpt-4", "gpt-3.5-turbo"} \
+        and stats["by_user"]["alice"]["request_count"] == 2 and session["total_tokens"] == 2000
+    print("[OK] Worker stats merged" if ok else "[ERROR] Worker stats not merged")
+    assert ok
+    return ok
+
+
+def test_finished_workers_compacted():
+    """Test that state files of exited workers are folded into one file by the next worker, keeping their counts"""
+    print("\n" + "="*60)
+    print("  Testing Compaction of Finished Workers")
+    print("="*60)
+
+    worker_script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from service.usage_aggregator import UsageAggregator\n"
+        "UsageAggregator(state_dir=sys.argv[2]).record('gpt-4', 'alice', 'session1', "
+        "{'prompt_tokens': 60, 'completion_tokens': 40, 'total_tokens': 100})\n"
+    )
+    with tempfile.TemporaryDirectory() as state_dir:
+        # Recycled workers: each writes its state file at exit, and each one starting compacts the one before
+        for _ in range(3):
+            subprocess.run([sys.executable, "-c", worker_script, str(backend_path), state_dir], check=True)
+        before = sorted(p.name for p in Path(state_dir).glob("usage_*.json"))
+        worker = UsageAggregator(state_dir=state_dir)
+        worker.record("gpt-4", "bob", None, {"prompt_tokens": 6, "completion_tokens": 4, "total_tokens": 10})
+        stats = worker.snapshot()
+        after = sorted(p.name for p in Path(state_dir).glob("usage_*.json"))
+
+    print(f"   Files before: {before}, after: {after}, total tokens: {stats['total_tokens']}, "
+          f"alice: {stats['by_user']['alice']['request_count']} requests")
+    ok = len(before) == 2 and "usage_compacted.json" in before and after == sorted(["usage_compacted.json", worker._state_file.name]) \
+        and stats["total_tokens"] == 310 and stats["by_user"]["alice"]["request_count"] == 3
+    print("[OK] Finished workers compacted" if ok else "[ERROR] Finished workers not compacted")
+    assert ok
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    for test in (test_concurrent_updates, test_mixed_model_cost, test_shared_state_dir, test_finished_workers_compacted):
+        try:
+            results.append(test())
+        except Exception:
+            results.append(False)
+    sys.exit(0 if all(results) else 1)